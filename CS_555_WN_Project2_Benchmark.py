@@ -0,0 +1,687 @@
+import argparse
+import os
+import random
+import re
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+from CS_555_WN_Project2_Code import (GedcomIndex, parse_line, parse_gedcom_date, readGedcomFile,
+                                     readGedcomFileParallel, organizeFamilyData, organizeIndividualData,
+                                     GedcomTree, loadSnapshot, saveSnapshot, snapshot_path,
+                                     validate_marriage_before_death, validate__divorce_before_death,
+                                     validate_birth_before_marriage_of_parents,
+                                     validate_birth_before_death_of_parents, validate_US10_marriage_after_14,
+                                     validate_bigamy, validate_parent_age_limits, validate_fewer_than_15_siblings,
+                                     validate_US18_siblings_should_not_marry,
+                                     validate_US19_first_cousins_should_not_marry,
+                                     validate_correct_gender_for_role, validate_all, validate_all_parallel,
+                                     validate_related_spouses, FAMILY_RULES, RULES, run_rules, DATE_RULES, DateColumns,
+                                     validate_dates, paused_gc, validate_all_errors,
+                                     stream_validation, CountingSink, JsonlSink,
+                                     ValidationBudget, KinshipGraph, RelationshipCalculator,
+                                     CalendarIndex, calendar_day, parse_known_date, AgeTable, calculateAge,
+                                     PersonQuery, Q,
+                                     NameIndex, PersonMatching, candidate_pairs, find_duplicate_families,
+                                     find_duplicate_people)
+
+# Build synthetic GEDCOM files and time the parser on them.
+#
+#   python3 CS_555_WN_Project2_Benchmark.py --size-mb 1024
+
+
+def build_synthetic_file(path, size_mb, source="Gedcom-file.ged"):
+    """Write a GEDCOM file of about size_mb megabytes by repeating the records of source with fresh IDs"""
+    with open(source, 'r') as file:
+        lines = file.read().splitlines()
+
+    first_record = next(i for i, line in enumerate(lines) if line.startswith('0 @'))
+    header = '\n'.join(lines[:first_record]) + '\n'
+    body = '\n'.join(line for line in lines[first_record:] if line != '0 TRLR') + '\n'
+
+    target = size_mb * 1024 * 1024
+    written = 0
+    copy = 0
+    with open(path, 'w') as out:
+        written += out.write(header)
+        while written < target:
+            chunk = re.sub(r'@([IF])(\d+)@', lambda m: f"@{m.group(1)}{copy}_{m.group(2)}@", body)
+            written += out.write(chunk)
+            copy += 1
+        out.write('0 TRLR\n')
+
+
+def legacy_readGedcomFile(filename):
+    """The original per line parse_line loop, kept as the baseline for the benchmark"""
+    individuals = []
+    families = []
+    curr_indiv = None
+    curr_fam = None
+    birth = death = marriage = divorce = False
+
+    with open(filename, 'r') as file:
+        for line in file:
+            level, tag, valid, arguments = parse_line(line)
+
+            if level == '0':
+                if 'INDI' in line:
+                    if curr_indiv:
+                        individuals.append(curr_indiv)
+                    curr_indiv = {'ID': tag.strip().replace('@', '')}
+                elif 'FAM' in line:
+                    if curr_fam:
+                        families.append(curr_fam)
+                    curr_fam = {'ID': tag.strip().replace('@', '')}
+            elif level == '1':
+                if tag == 'NAME' and curr_indiv is not None:
+                    curr_indiv['NAME'] = arguments
+                elif tag == 'SEX' and curr_indiv is not None:
+                    curr_indiv['SEX'] = arguments
+                elif tag == 'BIRT':
+                    birth = True
+                elif tag == 'DEAT':
+                    death = True
+                elif tag == 'MARR':
+                    marriage = True
+                elif tag == 'DIV':
+                    divorce = True
+                elif tag == 'HUSB' and curr_fam is not None:
+                    curr_fam['HUSB'] = arguments.strip().replace('@', '')
+                elif tag == 'WIFE' and curr_fam is not None:
+                    curr_fam['WIFE'] = arguments.strip().replace('@', '')
+                elif tag == 'CHIL' and curr_fam is not None:
+                    curr_fam.setdefault('CHIL', []).append(arguments.strip().replace('@', ''))
+            elif level == '2' and tag == 'DATE':
+                if birth and curr_indiv is not None:
+                    curr_indiv['BIRT'] = arguments
+                    birth = False
+                elif death and curr_indiv is not None:
+                    curr_indiv['DEAT'] = arguments
+                    death = False
+                elif marriage and curr_fam is not None:
+                    curr_fam['MARR'] = arguments
+                    marriage = False
+                elif divorce and curr_fam is not None:
+                    curr_fam['DIV'] = arguments
+                    divorce = False
+
+    if curr_indiv:
+        individuals.append(curr_indiv)
+    if curr_fam:
+        families.append(curr_fam)
+
+    return individuals, families
+
+
+def time_call(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def benchmark_parser(path):
+    with open(path, 'rb') as file:
+        line_count = sum(1 for _ in file)
+
+    legacy, legacy_seconds = time_call(legacy_readGedcomFile, path)
+    current, current_seconds = time_call(readGedcomFile, path)
+
+    print(f"\nParser ({line_count:,} lines, {os.path.getsize(path) / 1024 / 1024:,.0f} MB)")
+    print(f"  parse_line loop : {legacy_seconds:8.2f} s  {line_count / legacy_seconds:14,.0f} lines/s")
+    print(f"  tokenizer       : {current_seconds:8.2f} s  {line_count / current_seconds:14,.0f} lines/s")
+    print(f"  speedup         : {legacy_seconds / current_seconds:8.2f}x")
+    print(f"  identical output: {legacy == current}")
+
+    cpus = os.cpu_count() or 1
+    workers = 2
+    while workers <= cpus:
+        parallel, parallel_seconds = time_call(readGedcomFileParallel, path, workers)
+        print(f"  {workers:2d} processes    : {parallel_seconds:8.2f} s  "
+              f"{current_seconds / parallel_seconds:5.2f}x vs 1 process, identical output: {parallel == current}")
+        workers *= 2
+    if cpus < 2:
+        print("  (only one CPU available, parallel parsing not measured)")
+
+
+def traced_size(build):
+    """Bytes still allocated by the object build() returns"""
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def benchmark_memory(path):
+    def organized_records():
+        individuals, families = readGedcomFile(path)
+        families = organizeFamilyData(families, individuals)
+        return organizeIndividualData(families, individuals), families
+
+    def organized_dicts():
+        individuals, families = organized_records()
+        return [dict(ind.items()) for ind in individuals], [dict(fam.items()) for fam in families]
+
+    # Warm up once so lasting allocations such as the interned string table are not counted
+    organized_records()
+    (individuals, families), record_bytes = traced_size(organized_records)
+    del individuals, families
+    (individuals, families), dict_bytes = traced_size(organized_dicts)
+
+    print(f"\nOrganized tree memory ({len(individuals):,} individuals, {len(families):,} families)")
+    print(f"  dict rows       : {dict_bytes / 1024 / 1024:8.1f} MB")
+    print(f"  slotted records : {record_bytes / 1024 / 1024:8.1f} MB")
+    print(f"  reduction       : {dict_bytes / record_bytes:8.2f}x")
+
+
+def benchmark_dates(path):
+    individuals, families = readGedcomFile(path)
+    dates = [record[tag] for record in individuals + families for tag in ('BIRT', 'DEAT', 'MARR', 'DIV')
+             if tag in record]
+
+    def strptime_all():
+        for text in dates:
+            datetime.strptime(text, "%d %b %Y")
+
+    def parse_all():
+        for text in dates:
+            parse_gedcom_date(text)
+
+    parse_gedcom_date.cache_clear()
+    _, strptime_seconds = time_call(strptime_all)
+    _, parse_seconds = time_call(parse_all)
+    info = parse_gedcom_date.cache_info()
+
+    print(f"\nDates ({len(dates):,} date values, {info.misses:,} distinct)")
+    print(f"  strptime        : {strptime_seconds:8.2f} s")
+    print(f"  cached parser   : {parse_seconds:8.2f} s")
+    print(f"  speedup         : {strptime_seconds / parse_seconds:8.2f}x")
+
+    parse_gedcom_date.cache_clear()
+    organizeIndividualData(organizeFamilyData(families, individuals), individuals)
+    info = parse_gedcom_date.cache_info()
+    print(f"  organize        : {info.hits + info.misses:,} date lookups, {info.misses:,} actual parses")
+
+
+def benchmark_validation(path):
+    individuals, families = readGedcomFile(path)
+    families, organize_families_seconds = time_call(organizeFamilyData, families, individuals)
+    individuals, organize_individuals_seconds = time_call(organizeIndividualData, families, individuals)
+    index, index_seconds = time_call(GedcomIndex, individuals, families)
+
+    print(f"\nValidation ({len(individuals):,} individuals, {len(families):,} families)")
+    print(f"  organize        : {organize_families_seconds + organize_individuals_seconds:8.2f} s")
+    print(f"  build index     : {index_seconds:8.2f} s")
+    total_seconds = 0
+    for label, validator in (('US05', validate_marriage_before_death), ('US06', validate__divorce_before_death),
+                             ('US10', validate_US10_marriage_after_14), ('US11', validate_bigamy),
+                             ('US18', validate_US18_siblings_should_not_marry),
+                             ('US19', validate_US19_first_cousins_should_not_marry)):
+        _, seconds = time_call(validator, families, individuals, index)
+        total_seconds += seconds
+        print(f"  {label}            : {seconds:8.2f} s")
+    for label, validator in (('US08', validate_birth_before_marriage_of_parents),
+                             ('US09', validate_birth_before_death_of_parents),
+                             ('US12', validate_parent_age_limits), ('US15', validate_fewer_than_15_siblings),
+                             ('US21', validate_correct_gender_for_role)):
+        _, seconds = time_call(validator, families, individuals)
+        total_seconds += seconds
+        print(f"  {label}            : {seconds:8.2f} s")
+    index.ancestry_cache = None
+    _, related_seconds = time_call(validate_related_spouses, families, individuals, index, 3)
+    print(f"  related, 3 deg  : {related_seconds:8.2f} s")
+    _, all_seconds = time_call(validate_all, families, individuals, index)
+    print(f"  all, one by one : {total_seconds:8.2f} s")
+    print(f"  validate_all    : {all_seconds:8.2f} s  {total_seconds / all_seconds:5.2f}x")
+    # Without US08, US09 and US12 the pass does not look up the children at all
+    spouse_rules = [rule_id for rule_id in FAMILY_RULES if 'children' not in RULES[rule_id].needs]
+    _, spouse_seconds = time_call(run_rules, spouse_rules, families, individuals, index)
+    print(f"  {len(spouse_rules)} spouse rules  : {spouse_seconds:8.2f} s")
+
+
+def benchmark_parallel_validation(path):
+    individuals, families = readGedcomFile(path)
+    families = organizeFamilyData(families, individuals)
+    individuals = organizeIndividualData(families, individuals)
+    index = GedcomIndex(individuals, families)
+
+    serial, serial_seconds = time_call(validate_all, families, individuals, index)
+    print(f"\nParallel validation ({len(families):,} families)")
+    print(f"  1 process       : {serial_seconds:8.2f} s")
+
+    cpus = os.cpu_count() or 1
+    jobs = 2
+    while jobs <= max(cpus, 2):
+        index.ancestry_cache = None
+        parallel, parallel_seconds = time_call(validate_all_parallel, families, individuals, index, None, jobs, 1)
+        print(f"  {jobs:2d} processes    : {parallel_seconds:8.2f} s  "
+              f"{serial_seconds / parallel_seconds:5.2f}x vs 1 process, identical output: {parallel == serial}")
+        jobs *= 2
+    if cpus < 2:
+        print("  (only one CPU available, the 2 process run shows the sharding overhead)")
+
+
+def benchmark_numpy_dates(path):
+    individuals, families = readGedcomFile(path)
+    families = organizeFamilyData(families, individuals)
+    individuals = organizeIndividualData(families, individuals)
+    index = GedcomIndex(individuals, families)
+
+    print(f"\nDate rules {', '.join(DATE_RULES)} ({len(individuals):,} individuals, {len(families):,} families)")
+    try:
+        with paused_gc():
+            columns, columns_seconds = time_call(DateColumns, families, index)
+    except ImportError as error:
+        print(f"  skipped: {error}")
+        return
+    python, python_seconds = time_call(validate_all_errors, families, individuals, index, DATE_RULES)
+    flagged = 0
+    started = time.perf_counter()
+    for rule in DATE_RULES:
+        flagged += len(columns.flagged_families(rule))
+    arrays_seconds = time.perf_counter() - started
+    vectorized, vectorized_seconds = time_call(validate_dates, columns, index)
+
+    print(f"  python checks   : {python_seconds:8.2f} s")
+    print(f"  load columns    : {columns_seconds:8.2f} s  (once per tree)")
+    print(f"  array compares  : {arrays_seconds:8.2f} s  {python_seconds / arrays_seconds:6.1f}x, {flagged:,} families flagged")
+    print(f"  with records    : {vectorized_seconds:8.2f} s  {python_seconds / vectorized_seconds:6.1f}x, "
+          f"{sum(map(len, vectorized.values())):,} errors, identical output: {vectorized == python}")
+
+
+def benchmark_error_sinks(path):
+    individuals, families = readGedcomFile(path)
+    families = organizeFamilyData(families, individuals)
+    individuals = organizeIndividualData(families, individuals)
+    index = GedcomIndex(individuals, families)
+
+    print(f"\nError reports ({len(families):,} families, every family rule)")
+    rows, rows_seconds = time_call(validate_all, families, individuals, index)
+    _, records_seconds = time_call(validate_all_errors, families, individuals, index)
+    counting, counting_seconds = time_call(stream_validation, CountingSink(), families, individuals, index, list(FAMILY_RULES))
+    with open(os.devnull, 'w') as devnull, JsonlSink(devnull) as jsonl:
+        _, jsonl_seconds = time_call(stream_validation, jsonl, families, individuals, index, list(FAMILY_RULES))
+    _, rows_kept = traced_size(lambda: validate_all(families, individuals, index))
+    _, counting_kept = traced_size(lambda: stream_validation(CountingSink(), families, individuals, index, list(FAMILY_RULES)))
+
+    print(f"  formatted rows  : {rows_seconds:8.2f} s  {rows_kept / 2**20:8.1f} MiB kept")
+    print(f"  error records   : {records_seconds:8.2f} s  {rows_seconds / records_seconds:5.2f}x")
+    print(f"  counting sink   : {counting_seconds:8.2f} s  {counting_kept / 2**20:8.1f} MiB kept, "
+          f"{sum(counting.counts.values()):,} errors, same counts: {counting.counts == {rule: len(found) for rule, found in rows.items() if found}}")
+    print(f"  jsonl to null   : {jsonl_seconds:8.2f} s")
+
+    # Triage runs: each rule stops at its first 200 errors, or only a tenth of the families is checked
+    for label, budget in (('max 200 errors', ValidationBudget(max_errors=200)), ('10% sample', ValidationBudget(sample=0.1))):
+        _, budget_seconds = time_call(validate_all_errors, families, individuals, index, None, 'python', budget)
+        partial = [coverage.rule for coverage in budget.coverage.values() if coverage.partial]
+        print(f"  {label:<16}: {budget_seconds:8.2f} s  {records_seconds / budget_seconds:5.2f}x, partial: {', '.join(partial) or '-'}")
+
+
+def benchmark_kinship(path):
+    individuals, families = readGedcomFile(path)
+    families = organizeFamilyData(families, individuals)
+    individuals = organizeIndividualData(families, individuals)
+    index = GedcomIndex(individuals, families)
+    report_kinship(f"Kinship graph ({len(individuals):,} individuals, {len(families):,} families)", index)
+
+
+def build_deep_index(people, generations):
+    """A GedcomIndex of people in generations layers, each couple with four children in the layer below"""
+    width = people // generations
+    individuals = [{'ID': f'I{number}'} for number in range(width * generations)]
+    families = []
+    for generation in range(generations - 1):
+        first = generation * width
+        for couple in range(width // 2):
+            families.append({'ID': f'F{first + couple}', 'Husband ID': f'I{first + couple * 2}',
+                             'Wife ID': f'I{first + couple * 2 + 1}',
+                             'Children': [f'I{first + width + (couple * 2 + offset) % width}' for offset in range(4)]})
+    return GedcomIndex(individuals, families)
+
+
+def report_kinship(title, index):
+    graph, build_seconds = time_call(KinshipGraph, index)
+    depths, depths_seconds = time_call(graph.generation_depths)
+    (labels, components), components_seconds = time_call(graph.component_labels)
+    deepest = graph.ids[max(range(len(depths)), key=depths.__getitem__)]
+    ancestors, ancestors_seconds = time_call(graph.ancestors, deepest)
+    print(f"\n{title}")
+    print(f"  build CSR       : {build_seconds:8.2f} s  {graph.nbytes() / 2**20:8.1f} MiB of arrays")
+    print(f"  generation depth: {depths_seconds:8.2f} s  deepest {max(depths)} generations")
+    print(f"  components      : {components_seconds:8.2f} s  {components:,}")
+    print(f"  ancestors       : {ancestors_seconds:8.4f} s  {len(ancestors):,} above the deepest person")
+
+
+def benchmark_relationships(path, pairs=20000):
+    individuals, families = readGedcomFile(path)
+    families = organizeFamilyData(families, individuals)
+    individuals = organizeIndividualData(families, individuals)
+    index = GedcomIndex(individuals, families)
+    calculator, prepare_seconds = time_call(RelationshipCalculator, index)
+
+    # Random pairs are nearly always strangers, so also ask about pairs from the same connected family
+    graph = calculator.graph
+    labels, count = graph.component_labels()
+    members = {}
+    for node, label in enumerate(labels):
+        members.setdefault(label, []).append(graph.ids[node])
+    families_of_people = [people for people in members.values() if len(people) > 5]
+    rng = random.Random(0)
+    print(f"\nRelationships ({len(individuals):,} individuals)")
+    print(f"  preprocess      : {prepare_seconds:8.2f} s  (graph, generation depths, components, lifting tables)")
+    for label, batch in (('random pairs', [(rng.choice(graph.ids), rng.choice(graph.ids)) for _ in range(pairs)]),
+                         ('same family', [tuple(rng.choices(rng.choice(families_of_people), k=2)) for _ in range(pairs)])):
+        found, seconds = time_call(calculator.relate_many, batch)
+        related = sum(relationship.name is not None for relationship in found)
+        print(f"  {label:<16}: {seconds:8.2f} s  {len(batch) / seconds:9,.0f} pairs/s, {related:,} related")
+
+
+def benchmark_calendar(path, windows=20, days=30):
+    individuals, families = readGedcomFile(path)
+    families = organizeFamilyData(families, individuals)
+    individuals = organizeIndividualData(families, individuals)
+    starts = [date(2024, 1, 1) + timedelta(days=365 * window // windows) for window in range(windows)]
+
+    def scan():
+        # What the listings did before: parse every birthday again for every window
+        found = 0
+        for first in starts:
+            last = first + timedelta(days=days)
+            wanted = {calendar_day(day.month, day.day) for day in (first + timedelta(days=step) for step in range(days + 1))}
+            for ind in individuals:
+                birthday = parse_known_date(ind.get('Birthday'))
+                if birthday and calendar_day(birthday.month, birthday.day) in wanted:
+                    found += 1
+        return found
+
+    def query():
+        return sum(len(calendar.upcoming_birthdays(first, first + timedelta(days=days))) for first in starts)
+
+    calendar, build_seconds = time_call(CalendarIndex, individuals, families)
+    scanned, scan_seconds = time_call(scan)
+    queried, query_seconds = time_call(query)
+    print(f"\nCalendar windows ({len(individuals):,} individuals, {windows} windows of {days} days)")
+    print(f"  build index     : {build_seconds:8.2f} s")
+    print(f"  scan every time : {scan_seconds:8.2f} s  {scanned:,} birthdays")
+    print(f"  indexed queries : {query_seconds:8.4f} s  {scan_seconds / query_seconds:8,.0f}x, same count {queried == scanned}")
+
+
+def benchmark_ages(path):
+    individuals, families = readGedcomFile(path)
+    families = organizeFamilyData(families, individuals)
+    individuals = organizeIndividualData(families, individuals)
+    day = date.today()
+
+    def clock_per_person():
+        return [calculateAge(ind.get('Birthday'), ind.get('Death')) for ind in individuals]
+
+    def one_day():
+        return [calculateAge(ind.get('Birthday'), ind.get('Death'), day) for ind in individuals]
+
+    per_person, per_person_seconds = time_call(clock_per_person)
+    fixed, fixed_seconds = time_call(one_day)
+    ages, table_seconds = time_call(AgeTable, individuals, day)
+    _, move_seconds = time_call(ages.set_day, date(day.year - 10, day.month, 1))
+    lookups = [ind.get('ID') for ind in individuals]
+    _, lookup_seconds = time_call(lambda: [ages.age(person_id) for person_id in lookups])
+    print(f"\nAges ({len(individuals):,} individuals)")
+    print(f"  today() per age : {per_person_seconds:8.2f} s")
+    print(f"  one as-of day   : {fixed_seconds:8.2f} s  {per_person_seconds / fixed_seconds:5.2f}x, same ages {per_person == fixed}")
+    print(f"  AgeTable build  : {table_seconds:8.2f} s  move to another day {move_seconds:.2f} s")
+    print(f"  cached lookups  : {lookup_seconds:8.2f} s")
+
+
+def benchmark_queries(path):
+    individuals, families = readGedcomFile(path)
+    families = organizeFamilyData(families, individuals)
+    individuals = organizeIndividualData(families, individuals)
+    index = GedcomIndex(individuals, families)
+    query = index.query()
+    scan = PersonQuery(individuals, index, indexed=False)
+
+    print(f"\nPerson queries ({len(individuals):,} individuals; first query builds the indexes it uses)")
+    for predicate in (Q.alive & (Q.age > 30) & Q.no_spouse, Q.dead, Q.married & Q.alive, Q.died_within(3650),
+                      Q.female & (Q.age >= 90), Q.spouses >= 2):
+        found, scan_seconds = time_call(scan.select, predicate)
+        _, first_seconds = time_call(query.select, predicate)
+        _, again_seconds = time_call(query.select, predicate)
+        print(f"  {predicate.label[:44]:<44}: {len(found):9,} found, scan {scan_seconds:6.3f} s, "
+              f"first {first_seconds:6.3f} s, again {again_seconds:6.3f} s ({query.explain(predicate)})")
+
+
+NAME_SYLLABLES = ('ma', 'ri', 'an', 'to', 'ne', 'ves', 'sil', 'lu', 'ci', 'fer', 'nan', 'des', 'al', 'mei', 'da', 'pin',
+                  'hei', 'ro', 'ge', 'o', 'le', 'ti', 'nu', 'go', 'mes', 'car', 'va', 'lho', 'sou', 'za')
+NAME_QUERIES = ('Rojerio Nunez', '/Nunes/', 'Mary Lucy /Fernandez/', 'Carvalho', '/Souza Pinheiro/')
+
+
+def build_named_people(people, seed=0):
+    """people records with made up two word given names and surnames, nearly all of them different"""
+    rng = random.Random(seed)
+
+    def word():
+        return ''.join(rng.choice(NAME_SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+
+    return [{'ID': f'I{number}', 'Name': f"{word()} {word()} /{word()} {word()}/"} for number in range(people)]
+
+
+def report_names(title, individuals, repeats=20):
+    names, build_seconds = time_call(NameIndex, individuals)
+    print(f"\n{title}")
+    print(f"  build index     : {build_seconds:8.2f} s  {len(names.names):,} distinct names, {len(names.words):,} words")
+    for query in NAME_QUERIES:
+        matches, search_seconds = time_call(lambda: [names.search(query) for _ in range(repeats)])
+        # What finding a name took before: a linear scan for one exact spelling of one of its words
+        word = query.replace('/', ' ').split()[-1]
+        found, scan_seconds = time_call(lambda: [ind for ind in individuals if word in ind.get('Name', '')])
+        best = matches[0][0].describe() if matches[0] else 'nothing'
+        print(f"  {query:<22}: {search_seconds / repeats * 1000:7.2f} ms ranked (best {best}), "
+              f"exact scan for {word!r} {scan_seconds * 1000:7.1f} ms, {len(found):,} found")
+
+
+def benchmark_names(path):
+    individuals, families = readGedcomFile(path)
+    families = organizeFamilyData(families, individuals)
+    individuals = organizeIndividualData(families, individuals)
+    report_names(f"Name search ({len(individuals):,} individuals)", individuals)
+
+
+
+MONTH_NAMES = ('JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC')
+
+
+def build_duplicated_people(people, copies, seed=0):
+    """
+    people made up records plus copies of random ones with a typo in one name or a birthday one day off,
+    and the {copy ID: original ID} of the copies
+    """
+    rng = random.Random(seed)
+
+    def word():
+        return ''.join(rng.choice(NAME_SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+
+    def typo(text):
+        position = rng.randrange(1, len(text))
+        change = rng.randrange(3)
+        if change == 0:
+            return text[:position] + text[position + 1:]
+        if change == 1:
+            return text[:position] + text[position] + text[position:]
+        return text[:position] + rng.choice('aeiourstnl') + text[position + 1:]
+
+    individuals = []
+    for number in range(people):
+        individuals.append({'ID': f'I{number}', 'Name': f"{word()} /{word()}/", 'Gender': rng.choice('MF'),
+                            'Birthday': f"{rng.randint(2, 27)} {rng.choice(MONTH_NAMES)} {rng.randint(1900, 2000)}"})
+    originals = {}
+    for number in range(copies):
+        original = rng.choice(individuals[:people])
+        given, surname = original['Name'].rstrip('/').split(' /')
+        day, month, year = original['Birthday'].split()
+        change = rng.randrange(3)
+        if change == 0:
+            given = typo(given)
+        elif change == 1:
+            surname = typo(surname)
+        else:
+            day = str(int(day) + rng.choice((-1, 1)))
+        copy_id = f'C{number}'
+        originals[copy_id] = original['ID']
+        individuals.append({'ID': copy_id, 'Name': f"{given} /{surname}/", 'Gender': original['Gender'],
+                            'Birthday': f"{day} {month} {year}"})
+    return individuals, originals
+
+
+def report_duplicates(title, individuals, originals=None):
+    exact, exact_seconds = time_call(find_duplicate_people, individuals)
+    fuzzy, fuzzy_seconds = time_call(find_duplicate_people, individuals, True)
+    features = list(map(PersonMatching.features, individuals))
+    pairs = candidate_pairs(list(map(PersonMatching.sort_key, features)), map(PersonMatching.block_keys, features))
+    print(f"\n{title}")
+    print(f"  exact (US23)    : {exact_seconds:8.2f} s  {len(exact):,} duplicates")
+    print(f"  fuzzy           : {fuzzy_seconds:8.2f} s  {len(fuzzy) - len(exact):,} near duplicates, "
+          f"{len(pairs):,} pairs compared instead of {len(individuals) * (len(individuals) - 1) // 2:,}")
+    if originals:
+        found = {frozenset((duplicate.kept_id, duplicate.duplicate_id)) for duplicate in fuzzy}
+        recalled = sum(frozenset(pair) in found for pair in originals.items())
+        print(f"  recall          : {recalled / len(originals):8.3f}  of {len(originals):,} injected copies, "
+              f"{len(found) - recalled:,} other pairs")
+
+
+def benchmark_duplicates(path):
+    individuals, families = readGedcomFile(path)
+    families = organizeFamilyData(families, individuals)
+    individuals = organizeIndividualData(families, individuals)
+    report_duplicates(f"Duplicate people ({len(individuals):,} individuals)", individuals)
+    exact, exact_seconds = time_call(find_duplicate_families, families)
+    fuzzy, fuzzy_seconds = time_call(find_duplicate_families, families, True)
+    print(f"\nDuplicate families ({len(families):,} families)")
+    print(f"  exact (US24)    : {exact_seconds:8.2f} s  {len(exact):,} duplicates")
+    print(f"  fuzzy           : {fuzzy_seconds:8.2f} s  {len(fuzzy) - len(exact):,} near duplicates")
+
+def benchmark_snapshot(path):
+    tree, build_seconds = time_call(GedcomTree(path).build)
+    saveSnapshot(tree)
+    _, load_seconds = time_call(loadSnapshot, path)
+
+    print(f"\nSnapshot ({os.path.getsize(snapshot_path(path)) / 1024 / 1024:,.1f} MB)")
+    print(f"  parse + organize: {build_seconds:8.2f} s")
+    print(f"  load snapshot   : {load_seconds:8.2f} s")
+    print(f"  speedup         : {build_seconds / load_seconds:8.2f}x")
+    os.remove(snapshot_path(path))
+
+
+def benchmark_reload(path):
+    with open(path, 'rb') as file:
+        data = file.read()
+    edit_path = path + '.edit'
+    with open(edit_path, 'wb') as file:
+        file.write(data)
+
+    tree, build_seconds = time_call(GedcomTree(edit_path).build)
+    # Rename one person in the middle of the file
+    position = data.index(b'1 NAME ', len(data) // 2) + len(b'1 NAME ')
+    with open(edit_path, 'wb') as file:
+        file.write(data[:position] + b'X' + data[position:])
+    (reread, removed), reload_seconds = time_call(tree.reload)
+    os.remove(edit_path)
+
+    print(f"\nIncremental reload after a one record edit ({reread} record re-read)")
+    print(f"  full parse      : {build_seconds:8.2f} s")
+    print(f"  reload          : {reload_seconds:8.2f} s")
+    print(f"  speedup         : {build_seconds / reload_seconds:8.2f}x")
+
+
+def benchmark_revalidate(path):
+    tree = GedcomTree(path).build()
+    _, validate_seconds = time_call(tree.validate)
+    fam = tree.families[len(tree.families) // 2]
+    person_id = tree.individuals[len(tree.individuals) // 2].get('ID')
+
+    edits = [('marriage date', tree.set_date, fam.get('ID'), 'MARR', '1 JAN 1900'),
+             ('death date', tree.set_date, person_id, 'DEAT', '1 JAN 1901'),
+             ('new family', tree.add_family, 'FBENCH', person_id, fam.wife_id, '1 JAN 1970'),
+             ('link child', tree.link_child, fam.get('ID'), person_id)]
+    print(f"\nRevalidation after one edit ({len(tree.families):,} families)")
+    print(f"  validate()      : {validate_seconds:8.2f} s")
+    for label, edit, *args in edits:
+        edit(*args)
+        _, revalidate_seconds = time_call(tree.revalidate)
+        print(f"  {label:16s}: {revalidate_seconds * 1000:8.2f} ms  {validate_seconds / revalidate_seconds:10,.0f}x")
+    print(f"  same findings   : {tree.results() == validate_all(tree.families, tree.individuals, tree.index)}")
+
+
+def benchmark_extended(path):
+    tree = GedcomTree(path).build()
+    people = tree.individuals[::max(1, len(tree.individuals) // 1000)]
+
+    def first_access():
+        return [person.extended('BIRT.PLAC') for person in people]
+
+    def cached_access():
+        return [person.extended('BIRT.PLAC') for person in people]
+
+    places, first_seconds = time_call(first_access)
+    _, cached_seconds = time_call(cached_access)
+
+    print(f"\nExtended fields ({len(people):,} people, {sum(place is not None for place in places):,} with a birth place)")
+    print(f"  first access    : {first_seconds:8.2f} s  (includes scanning the file for record spans)")
+    print(f"  cached access   : {cached_seconds:8.4f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the GEDCOM parser on a synthetic file")
+    parser.add_argument('--size-mb', type=int, default=100, help="size of the synthetic GEDCOM file")
+    parser.add_argument('--file', help="benchmark an existing GEDCOM file instead of a synthetic one")
+    args = parser.parse_args()
+
+    if args.file:
+        benchmark_parser(args.file)
+        benchmark_dates(args.file)
+        benchmark_validation(args.file)
+        benchmark_parallel_validation(args.file)
+        benchmark_numpy_dates(args.file)
+        benchmark_error_sinks(args.file)
+        benchmark_kinship(args.file)
+        benchmark_relationships(args.file)
+        benchmark_calendar(args.file)
+        benchmark_ages(args.file)
+        benchmark_queries(args.file)
+        benchmark_names(args.file)
+        benchmark_duplicates(args.file)
+        benchmark_snapshot(args.file)
+        benchmark_reload(args.file)
+        benchmark_revalidate(args.file)
+        benchmark_extended(args.file)
+        benchmark_memory(args.file)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'synthetic.ged')
+        build_synthetic_file(path, args.size_mb)
+        benchmark_parser(path)
+        benchmark_dates(path)
+        benchmark_validation(path)
+        benchmark_parallel_validation(path)
+        benchmark_numpy_dates(path)
+        benchmark_error_sinks(path)
+        benchmark_kinship(path)
+        report_kinship("Kinship graph (synthetic, 1,000,000 people in 25 generations)", build_deep_index(1000000, 25))
+        benchmark_relationships(path)
+        benchmark_calendar(path)
+        benchmark_ages(path)
+        benchmark_queries(path)
+        benchmark_names(path)
+        report_names("Name search (synthetic, 500,000 people with different names)", build_named_people(500000))
+        benchmark_duplicates(path)
+        report_duplicates("Duplicate people (synthetic, 200,000 people and 20,000 copies with a typo)",
+                          *build_duplicated_people(200000, 20000))
+        benchmark_snapshot(path)
+        benchmark_reload(path)
+        benchmark_revalidate(path)
+        benchmark_extended(path)
+        benchmark_memory(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,34 @@
-from datetime import datetime, timedelta
+import argparse
+import gc
+import hashlib
+import hmac
+import json
+import mmap
+import os
+import pickle
+import random
+import re
+import sys
+import time
+import unicodedata
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from heapq import heappop, heappush, nsmallest
+from itertools import accumulate, chain, repeat
+from operator import add, eq, ge, gt, is_, le, lshift, lt, ne, or_
 from prettytable import PrettyTable
 
+try:
+    import numpy
+except ImportError:  # optional, only the 'numpy' validation backend uses it
+    numpy = None
+
 # Define constants
 MAX_MOTHER_AGE_DIFF = 60
 MAX_FATHER_AGE_DIFF = 80
@@ -8,203 +36,3236 @@ MIN_MARRIAGE_AGE = 14
 MAX_AGE_YEARS = 150
 NINE_MONTHS_DAYS = 270
 TEN_YEARS_DAYS = 3650
+DATE_CACHE = 1 << 17  # parsed date strings kept, every day of about 360 years
+DUPLICATE_MIN_SCORE = 0.75  # the lowest similarity reported as a near duplicate
+DUPLICATE_WINDOW = 8  # how many neighbours each record is compared with in a large block
+DUPLICATE_NAME_CACHE = 1 << 16  # names (and surname words) whose folded words are kept between records
+PARALLEL_MIN_CHUNK_BYTES = 8 * 1024 * 1024
+PARALLEL_MIN_SHARD_FAMILIES = 10000
+NO_DAY = 0  # the day ordinal DateColumns stores for a missing or unreadable date, real ones start at 1
+# Bump when parsing or organizing changes so snapshots written by older code are rebuilt
+PARSER_VERSION = 8
+SNAPSHOT_SUFFIX = '.snapshot'
+SNAPSHOT_HEADER_BYTES = 64 * 1024
+SNAPSHOT_KEY_BYTES = 32
+# The secret that signs this user's snapshots, see snapshot_key()
+SNAPSHOT_KEY_FILE = os.path.join(os.path.expanduser('~'), '.gedcom_snapshot_key')
+DIGEST_BLOCK_BYTES = 1024 * 1024
+SCAN_WINDOW_BYTES = 64 * 1024 * 1024
+ALIVE = 'True'
+DEAD = 'False'
 
-def parse_line(line):  
-    
-    supported_tags = {
+SUPPORTED_TAGS = frozenset({
     'INDI', 'NAME', 'SEX', 'BIRT', 'DEAT', 'FAMC', 'FAMS',
     'FAM', 'MARR', 'HUSB', 'WIFE', 'CHIL', 'DIV', 'DATE',
     'HEAD', 'TRLR', 'NOTE'
-    }
-    
-    parts = line.strip().split(' ', 2)
-    level = parts[0]
-    tag = parts[1]
-    valid = 'Y' if tag in supported_tags else 'N'
-    arguments = parts[2] if len(parts) > 2 else ''
+})
+
+# Tokenizer for the lines readGedcomFile keeps. It runs over the raw bytes of the
+# file and every other line (GIVN, SURN, PLAC, OCCU, ...) is skipped inside the
+# regex engine without becoming a Python object. Groups of a match:
+#   1, 2  level 0 line: xref (without the @) and tag
+#   3, 4  level 1 NAME/SEX/HUSB/WIFE/CHIL line: tag and value
+#   5, 6  level 1 BIRT/DEAT/MARR/DIV line: tag and the level 2 DATE of its substructure
+GEDCOM_TOKEN = re.compile(
+    rb'\n(?:'
+    rb'0 (?:@([^@\r\n]*)@ )?(\w+)'
+    rb'|1 (NAME|SEX|HUSB|WIFE|CHIL)\b ?([^\r\n]*)'
+    rb'|1 (BIRT|DEAT|MARR|DIV)\b[^\r\n]*(?:\r?\n(?!0 |1 )[^\r\n]*)*?\r?\n2 DATE ([^\r\n]*)'
+    rb')'
+)
+# A level 0 line at the very start of the buffer has no newline in front of it
+GEDCOM_FIRST_LINE = re.compile(rb'(?:\xef\xbb\xbf)?0 (?:@([^@\r\n]*)@ )?(\w+)')
+# Any line of a record, for expanding the full substructure: level, xref, tag, value
+GEDCOM_LINE = re.compile(r'\s*(\d+) (?:@([^@]*)@ )?(\S+) ?(.*)')
+# The level 0 lines alone, the same lines that start a record for GEDCOM_TOKEN
+GEDCOM_RECORD_START = re.compile(rb'\n0 (?:@([^@\r\n]*)@ )?(\w+)')
+
+INDIVIDUAL_TAGS = {b'NAME': 'NAME', b'SEX': 'SEX', b'BIRT': 'BIRT', b'DEAT': 'DEAT'}
+FAMILY_TAGS = {b'HUSB': 'HUSB', b'WIFE': 'WIFE', b'MARR': 'MARR', b'DIV': 'DIV'}
+
+
+MONTHS = {name: number for number, name in enumerate(
+    ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC'], start=1)}
+
+# A parsed 'D MMM YYYY' date. Tuples compare field by field, so comparing two
+# GedcomDates compares their day ordinals
+GedcomDate = namedtuple('GedcomDate', ['ordinal', 'year', 'month', 'day'])
+
+
+def make_gedcom_date(value):
+    """Build a GedcomDate from a datetime.date"""
+    return GedcomDate(value.toordinal(), value.year, value.month, value.day)
+
+
+def format_gedcom_date(value):
+    """Format a GedcomDate the way datetime.strftime("%d %b %Y") does, e.g. '10 Oct 1995'"""
+    return date.fromordinal(value.ordinal).strftime("%d %b %Y")
+
+
+@lru_cache(maxsize=DATE_CACHE)
+def parse_gedcom_date(text):
+    """
+    Parse a GEDCOM 'D MMM YYYY' date such as '10 OCT 1995' into a GedcomDate
+    Accepts the same strings as datetime.strptime(text, "%d %b %Y") and raises the same
+    ValueError/TypeError for anything else. The last DATE_CACHE distinct results are cached,
+    so a date string repeated in a tree is only parsed once and a long run does not keep them all
+    """
+    if not isinstance(text, str):
+        raise TypeError(f"GEDCOM date must be a string, not {type(text).__name__}")
+
+    parts = text.split()
+    if len(parts) != 3:
+        raise ValueError(f"time data {text!r} does not match format '%d %b %Y'")
+
+    day, month, year = parts
+    month_number = MONTHS.get(month.upper())
+    if (month_number is None or not day.isdigit() or len(day) > 2
+            or not year.isdigit() or len(year) != 4):
+        raise ValueError(f"time data {text!r} does not match format '%d %b %Y'")
+
+    value = date(int(year), month_number, int(day))
+    return GedcomDate(value.toordinal(), value.year, month_number, value.day)
+
+
+class GedcomRecord:
+    """
+    Base class for the organized individual and family records
+    Values live in __slots__ instead of a per record dict, but they can still be read and
+    written with the table keys ('ID', 'Name', ...) so code written against dicts keeps working
+    """
+    __slots__ = ()
+    KEYS = {}
+
+    def __init__(self, *values):
+        for attribute, value in zip(self.__slots__, values):
+            setattr(self, attribute, value)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, self.KEYS[key])
+        except KeyError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        try:
+            setattr(self, self.KEYS[key], value)
+        except KeyError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        attribute = self.KEYS.get(key)
+        if attribute is None:
+            return default
+        return getattr(self, attribute)
+
+    def __contains__(self, key):
+        return key in self.KEYS
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def keys(self):
+        return self.KEYS.keys()
+
+    def values(self):
+        return [getattr(self, attribute) for attribute in self.KEYS.values()]
+
+    def items(self):
+        return list(zip(self.KEYS, self.values()))
+
+    def __getstate__(self):
+        return (*self.values(), self.source)
+
+    def __setstate__(self, state):
+        GedcomRecord.__init__(self, *state)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def structure(self):
+        """The full GEDCOM substructure of the record, parsed from the source file on first use (None without a source)"""
+        if self.source is None:
+            return None
+        return self.source.structure(self.id, self.TAG)
+
+    def extended(self, path, default=None):
+        """
+        Value of a line the tables do not keep, by dotted tag path below the record:
+        'OCCU', 'BIRT.PLAC', 'NAME.GIVN', 'NAME._MARNM', ...
+        """
+        structure = self.structure()
+        node = None if structure is None else structure.find(path)
+        return default if node is None else node.value
+
+
+class Individual(GedcomRecord):
+    """One row of the individuals table. IDs, gender and dates are interned so repeated values share one string"""
+    __slots__ = ('id', 'name', 'gender', 'birthday', 'age', 'alive', 'death', 'children', 'spouse', 'source')
+    KEYS = dict(zip(['ID', 'Name', 'Gender', 'Birthday', 'Age', 'Alive', 'Death', 'Children', 'Spouse'], __slots__))
+    TAG = b'INDI'
+
+    def __init__(self, id, name, gender, birthday, age, alive, death, children, spouse, source=None):
+        self.id = sys.intern(id)
+        self.name = name
+        self.gender = sys.intern(gender)
+        self.birthday = sys.intern(birthday)
+        self.age = age
+        # 'True' / 'False' like the table shows, both are shared constants
+        self.alive = ALIVE if alive == ALIVE else DEAD
+        self.death = sys.intern(death)
+        self.children = children
+        self.spouse = sys.intern(spouse)
+        self.source = source
+
+
+class Family(GedcomRecord):
+    """One row of the families table"""
+    __slots__ = ('id', 'married', 'divorced', 'husband_id', 'husband_name', 'wife_id', 'wife_name', 'children', 'source')
+    KEYS = dict(zip(['ID', 'Married', 'Divorced', 'Husband ID', 'Husband Name', 'Wife ID', 'Wife Name', 'Children'], __slots__))
+    TAG = b'FAM'
+
+    def __init__(self, id, married, divorced, husband_id, husband_name, wife_id, wife_name, children, source=None):
+        self.id = sys.intern(id)
+        self.married = sys.intern(married)
+        self.divorced = sys.intern(divorced)
+        self.husband_id = sys.intern(husband_id)
+        self.husband_name = husband_name
+        self.wife_id = sys.intern(wife_id)
+        self.wife_name = wife_name
+        self.children = [sys.intern(child) for child in children]
+        self.source = source
+
+
+class GedcomNode:
+    """One line of a GEDCOM record with the lines nested under it"""
+    __slots__ = ('level', 'xref', 'tag', 'value', 'children')
+
+    def __init__(self, level, xref, tag, value):
+        self.level = level
+        self.xref = xref
+        self.tag = tag
+        self.value = value
+        self.children = []
+
+    def find(self, path):
+        """The first node along a dotted tag path below this one, e.g. 'BIRT.PLAC', or None"""
+        node = self
+        for tag in path.split('.'):
+            node = next((child for child in node.children if child.tag == tag), None)
+            if node is None:
+                return None
+        return node
+
+    def find_all(self, tag):
+        return [child for child in self.children if child.tag == tag]
+
+    def __repr__(self):
+        return f"GedcomNode({self.level}, {self.tag!r}, {self.value!r}, {len(self.children)} children)"
+
+
+def parse_gedcom_structure(data):
+    """Parse the bytes of one record into a GedcomNode tree. CONT and CONC lines are joined into the value above them"""
+    root = None
+    stack = []
+    for line in data.decode('utf-8', errors='replace').lstrip('\ufeff').splitlines():
+        match = GEDCOM_LINE.match(line)
+        if match is None:
+            continue
+        level = int(match.group(1))
+        xref, tag, value = match.group(2), match.group(3), match.group(4)
+
+        while stack and stack[-1].level >= level:
+            stack.pop()
+        if tag == 'CONT' or tag == 'CONC':
+            if stack:
+                stack[-1].value += ('\n' if tag == 'CONT' else '') + value
+            continue
+
+        node = GedcomNode(level, xref, tag, value)
+        if stack:
+            stack[-1].children.append(node)
+        elif root is None:
+            root = node
+        else:
+            break  # the next record
+        stack.append(node)
+    return root
+
+
+class GedcomSource:
+    """
+    The file organized records were read from. The tables only keep a few tags, the rest of a
+    record (PLAC, GIVN, SURN, OCCU, NOTE, ...) is parsed from the file the first time it is asked for.
+    The record spans are the ones of the scan the tree was built from; a span is only read while the
+    file keeps the size and mtime of that scan and its bytes keep their digest, otherwise the file is scanned again
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.spans = None     # record key -> (start, end, digest), from remember() or one scan on first use
+        self.stat = None      # file_stat() of the file the spans were taken from
+        self.structures = {}  # record key -> GedcomNode
+
+    def remember(self, records):
+        """Keep the spans of a scan_gedcom_records result, parsed records whose digest changed are dropped"""
+        keys, starts, ends, digests = records
+        spans = {}
+        for key, start, end, digest in zip(keys, starts, ends, digests):
+            spans.setdefault(key, (start, end, digest))
+        old = self.spans or {}
+        self.structures = {key: node for key, node in self.structures.items()
+                           if key in old and key in spans and old[key][2] == spans[key][2]}
+        self.spans = spans
+        self.stat = file_stat(self.filename)
+
+    def scan(self):
+        with open_gedcom_buffer(self.filename) as buffer:
+            self.remember(scan_gedcom_records(buffer))
+
+    def structure(self, record_id, tag):
+        """The GedcomNode tree of the INDI/FAM record record_id, or None if the file does not have it"""
+        key = record_id.encode() + b' ' + tag
+        node = self.structures.get(key)
+        if node is not None:
+            return node
+
+        if self.spans is None or self.stat != file_stat(self.filename):
+            self.scan()
+        data = self.read(key)
+        if data is None and key in self.spans:
+            # The file changed since the scan without changing its size or mtime
+            self.scan()
+            data = self.read(key)
+        if data is None:
+            return None
+        node = parse_gedcom_structure(data)
+        self.structures[key] = node
+        return node
+
+    def read(self, key):
+        """The bytes of the record under key, or None if it has no span or they no longer match its digest"""
+        span = self.spans.get(key)
+        if span is None:
+            return None
+        start, end, digest = span
+        with open(self.filename, 'rb') as file:
+            file.seek(start)
+            data = file.read(end - start)
+            last = not file.read(1)
+        # The digest covers the record after its '0 ' up to the newline in front of the next one
+        if record_digests([data[2 if start else 0:len(data) if last else len(data) - 1]])[0] != digest:
+            return None
+        return data
+
+    def forget(self):
+        """Drop the spans and parsed records, for when the file has changed"""
+        self.spans = None
+        self.stat = None
+        self.structures = {}
+
+    def __getstate__(self):
+        return self.filename
+
+    def __setstate__(self, filename):
+        self.__init__(filename)
+
+
+def attachSource(source, individual_list, family_list):
+    """Point the organized records at the file they were read from so their extended fields can be expanded"""
+    for record in chain(individual_list, family_list):
+        if isinstance(record, GedcomRecord):
+            record.source = source
+
+
+class GedcomIndex:
+    """
+    ID keyed lookups over the tree, built once after parsing so the validators do not
+    scan individual_list / family_list for every person they need
+    Families are read with the table keys, so build it from organized families.
+    When an ID is repeated the first record wins, like the linear scans it replaces.
+    as_of is the day the rules and listings run for, today when None
+    """
+
+    def __init__(self, individual_list=(), family_list=(), as_of=None):
+        self.individuals = {}      # person ID -> record
+        self.families = {}         # family ID -> record
+        self.spouse_families = {}  # person ID -> families where they are husband or wife, in list order
+        self.child_families = {}   # person ID -> families where they are a child, in list order
+        self.children = {}         # family ID -> child IDs
+        self.ancestry_cache = None # Ancestry over these families, see ancestry()
+        self.kinship_cache = None  # KinshipGraph over these records, see kinship()
+        self.calendar_cache = None # CalendarIndex over these records, see calendar()
+        self.ages_cache = None     # AgeTable over these people, see ages()
+        self.query_cache = None    # PersonQuery over these people, see query()
+        self.names_cache = None    # NameIndex over these people, see names()
+        self.as_of = as_of
+
+        for ind in individual_list:
+            self.add_individual(ind)
+
+        for fam in family_list:
+            self.add_family(fam)
+
+    def add_individual(self, ind):
+        self.clear_caches()
+        self.individuals.setdefault(ind.get('ID'), ind)
+
+    def remove_individual(self, ind):
+        self.clear_caches()
+        if self.individuals.get(ind.get('ID')) is ind:
+            del self.individuals[ind.get('ID')]
+
+    def add_family(self, fam):
+        """Index fam, appending it to the spouse and child lists of its members"""
+        fam_id = fam.get('ID')
+        children = fam.get('Children', [])
+        self.clear_caches()
+        self.families.setdefault(fam_id, fam)
+        self.children.setdefault(fam_id, children)
+
+        for spouse_id in self.spouse_ids(fam):
+            self.spouse_families.setdefault(spouse_id, []).append(fam)
+
+        for child_id in children:
+            self.child_families.setdefault(child_id, []).append(fam)
+
+    def remove_family(self, fam):
+        fam_id = fam.get('ID')
+        self.clear_caches()
+        if self.families.get(fam_id) is fam:
+            del self.families[fam_id]
+            del self.children[fam_id]
+
+        for spouse_id in self.spouse_ids(fam):
+            self._discard(self.spouse_families, spouse_id, fam)
+
+        for child_id in fam.get('Children', []):
+            self._discard(self.child_families, child_id, fam)
+
+    def clear_caches(self):
+        """Drop what is derived from the records (ancestry, kinship graph, calendar, ages, query, names), it is rebuilt when next asked for"""
+        self.ancestry_cache = None
+        self.kinship_cache = None
+        self.calendar_cache = None
+        self.ages_cache = None
+        self.query_cache = None
+        self.names_cache = None
+
+    @staticmethod
+    def spouse_ids(fam):
+        husb_id = fam.get('Husband ID', 'NA')
+        wife_id = fam.get('Wife ID', 'NA')
+        if husb_id == wife_id:
+            return [husb_id] if husb_id != 'NA' else []
+        return [spouse_id for spouse_id in (husb_id, wife_id) if spouse_id != 'NA']
+
+    @staticmethod
+    def _discard(families_by_person, person_id, fam):
+        families = families_by_person.get(person_id, [])
+        for position, other in enumerate(families):
+            if other is fam:
+                del families[position]
+                break
+        if not families:
+            families_by_person.pop(person_id, None)
+
+    def person(self, person_id):
+        """The record for person_id, or None"""
+        return self.individuals.get(person_id)
+
+    def family(self, family_id):
+        """The record for family_id, or None"""
+        return self.families.get(family_id)
+
+    def families_as_spouse(self, person_id):
+        return self.spouse_families.get(person_id, [])
+
+    def families_as_child(self, person_id):
+        return self.child_families.get(person_id, [])
+
+    def family_as_child(self, person_id):
+        """The first family that lists person_id as a child, or None"""
+        families = self.child_families.get(person_id)
+        return families[0] if families else None
+
+    def children_of(self, family_id):
+        return self.children.get(family_id, [])
+
+    def ancestry(self):
+        """The Ancestry over this index. Its memoized sets are kept until a family is added or removed"""
+        if self.ancestry_cache is None:
+            self.ancestry_cache = Ancestry(self)
+        return self.ancestry_cache
+
+    def kinship(self):
+        """The KinshipGraph over this index, built once and kept until a record is added or removed"""
+        if self.kinship_cache is None:
+            self.kinship_cache = KinshipGraph(self)
+        return self.kinship_cache
+
+    def calendar(self):
+        """The CalendarIndex over the indexed people and families, built once and kept until a record changes"""
+        if self.calendar_cache is None:
+            self.calendar_cache = CalendarIndex(self.individuals.values(), self.families.values())
+        return self.calendar_cache
+
+    def today(self):
+        """The as-of day of this run as a datetime.date"""
+        return as_of_date(self.as_of)
+
+    def ages(self, as_of=None):
+        """
+        The AgeTable of the indexed people on the day as_of (default the index's as-of day), kept
+        until a record changes; asking for another day recomputes it in one pass
+        """
+        day = as_of_date(self.as_of if as_of is None else as_of)
+        if self.ages_cache is None:
+            self.ages_cache = AgeTable(self.individuals.values(), day)
+        else:
+            self.ages_cache.set_day(day)
+        return self.ages_cache
+
+    def query(self):
+        """
+        The PersonQuery over the indexed people on the index's as-of day, kept with its secondary
+        indexes until a record changes or the day moves
+        """
+        day = self.today()
+        if self.query_cache is None or self.query_cache.day != day:
+            # The calendar is shared when it is already built, the query builds its own on demand otherwise
+            self.query_cache = PersonQuery(self.individuals.values(), self, day, self.calendar_cache)
+        return self.query_cache
+
+    def names(self):
+        """The NameIndex over the indexed people, built once and kept until a record is added or removed"""
+        if self.names_cache is None:
+            self.names_cache = NameIndex(self.individuals.values())
+        return self.names_cache
+
+    def __getstate__(self):
+        # The memoized ancestor sets, the graph, the calendar, the ages, the query indexes and the name
+        # index are cheap to rebuild and would only bloat the snapshot
+        state = self.__dict__.copy()
+        state['ancestry_cache'] = None
+        state['kinship_cache'] = None
+        state['calendar_cache'] = None
+        state['ages_cache'] = None
+        state['query_cache'] = None
+        state['names_cache'] = None
+        return state
+
+
+class Ancestry:
+    """
+    Ancestor sets per person, memoized by generation, for consanguinity checks.
+    Generation 1 holds the families a person is a child of and the parents in them,
+    generation g the generation g-1 sets of those parents. Families are kept in their xref
+    form ('@F1@') so they never clash with person IDs.
+    Two people are related at degree g when their generation g sets meet: 1 for siblings
+    (the same family, or half siblings through one parent), 2 for first cousins, 3 for second cousins.
+    Only relatives of the same generation meet this way; an aunt and her nephew or cousins once
+    removed are not found, RelationshipCalculator names those
+    """
+    RELATIONS = {1: 'siblings', 2: 'first cousins', 3: 'second cousins', 4: 'third cousins'}
+    NO_ANCESTORS = frozenset()
+
+    def __init__(self, index):
+        self.index = index
+        self.generations = {}  # person ID -> [generation 1 set, generation 2 set, ...]
+
+    def parents(self, person_id):
+        return [parent_id for fam in self.index.families_as_child(person_id) for parent_id in GedcomIndex.spouse_ids(fam)]
+
+    def ancestors(self, person_id, generation):
+        """The set of families and people generation generations above person_id"""
+        generations = self.generations.get(person_id)
+        if generations is None:
+            generations = self.generations[person_id] = []
+
+        while len(generations) < generation:
+            if not generations:
+                nodes = self.NO_ANCESTORS
+                families = self.index.families_as_child(person_id)
+                if families:
+                    nodes = set()
+                    for fam in families:
+                        nodes.add(f"@{fam.get('ID')}@")
+                        nodes.update(GedcomIndex.spouse_ids(fam))
+            elif not generations[-1]:
+                nodes = generations[-1]  # no known parents, so no ancestors further up either
+            else:
+                # A parent that is their own ancestor only recurses to lower generations, so this ends
+                level = len(generations)
+                nodes = set()
+                for parent_id in self.parents(person_id):
+                    nodes.update(self.ancestors(parent_id, level))
+            generations.append(nodes)
+        return generations[generation - 1]
+
+    def relation_degree(self, person_id, other_id, max_degree=2):
+        """The closest degree up to max_degree at which the two are related (see the class), or None"""
+        if person_id == other_id or not self.ancestors(person_id, 1) or not self.ancestors(other_id, 1):
+            return None
+        for degree in range(1, max_degree + 1):
+            if not self.ancestors(person_id, degree).isdisjoint(self.ancestors(other_id, degree)):
+                return degree
+        return None
+
+    def related_within(self, person_id, other_id, degree):
+        return self.relation_degree(person_id, other_id, degree) is not None
+
+    @classmethod
+    def relation_name(cls, degree):
+        """'siblings', 'first cousins', ... for a relation_degree, '21st cousins' past the named ones"""
+        return cls.RELATIONS.get(degree, f"{ordinal(degree - 1)} cousins")
+
+
+def reverse_csr(offsets, targets):
+    """The CSR arrays of the reversed links, sources ascending within each target's slice"""
+    counts = array('i', [0]) * len(offsets)
+    for target in targets:
+        counts[target + 1] += 1
+    reversed_offsets = array('i', accumulate(counts))
+    sources = array('i', [0]) * len(targets)
+    fill = reversed_offsets[:-1]
+    for source in range(len(offsets) - 1):
+        for position in range(offsets[source], offsets[source + 1]):
+            target = targets[position]
+            sources[fill[target]] = source
+            fill[target] += 1
+    return reversed_offsets, sources
+
+
+class KinshipGraph:
+    """
+    The parent, child and spouse links of a GedcomIndex, materialized once as integer adjacency
+    arrays in CSR form. Every person is a node number (node() / ids); the parents of node i are
+    parents[parent_offsets[i]:parent_offsets[i + 1]], and the same for children and spouses.
+    People a family names but the tree does not hold get nodes after the individuals.
+    The traversals are iterative, so any depth of tree works without touching the recursion limit
+    """
+    RELATIONS = ('parents', 'children', 'spouses')
+
+    def __init__(self, index):
+        self.ids = list(index.individuals)  # node -> person ID
+        self.nodes = nodes = {person_id: node for node, person_id in enumerate(self.ids)}
+        # The spouses of every family with a spouse or a child as nodes, once per family record
+        add_node = self.add_node
+        family_spouses = {}
+        for families in chain(index.spouse_families.values(), index.child_families.values()):
+            for fam in families:
+                if id(fam) not in family_spouses:
+                    family_spouses[id(fam)] = [add_node(spouse_id) for spouse_id in GedcomIndex.spouse_ids(fam)]
+        for child_id in index.child_families:
+            if child_id not in nodes:
+                add_node(child_id)
+
+        # Each person's parents and spouses, ascending, appended in node order
+        self.parent_offsets, self.parents = array('i', [0]), array('i')
+        self.spouse_offsets, self.spouses = array('i', [0]), array('i')
+        child_families, spouse_families = index.child_families, index.spouse_families
+        add_parents, end_parents = self.parents.extend, self.parent_offsets.append
+        add_spouses, end_spouses = self.spouses.extend, self.spouse_offsets.append
+        for node, person_id in enumerate(self.ids):
+            families = child_families.get(person_id)
+            if families:
+                if len(families) == 1:
+                    add_parents(sorted(family_spouses[id(families[0])]))
+                else:
+                    add_parents(sorted({parent for fam in families for parent in family_spouses[id(fam)]}))
+            end_parents(len(self.parents))
+            families = spouse_families.get(person_id)
+            if families:
+                add_spouses(sorted({spouse for fam in families for spouse in family_spouses[id(fam)] if spouse != node}))
+            end_spouses(len(self.spouses))
+        self.child_offsets, self.children = reverse_csr(self.parent_offsets, self.parents)
+        self.adjacency = {'parents': (self.parent_offsets, self.parents), 'children': (self.child_offsets, self.children),
+                          'spouses': (self.spouse_offsets, self.spouses)}
+        self.depths = None      # see generation_depths()
+        self.components = None  # see component_labels()
+        self.lineages = None    # see lineage_tables()
+
+    def add_node(self, person_id):
+        node = self.nodes.get(person_id)
+        if node is None:
+            node = self.nodes[person_id] = len(self.ids)
+            self.ids.append(person_id)
+        return node
+
+    def node(self, person_id):
+        """The node number of person_id, a KeyError when no record or family names them"""
+        try:
+            return self.nodes[person_id]
+        except KeyError:
+            raise KeyError(f"{person_id!r} is not in the kinship graph") from None
+
+    def links(self, relation):
+        """(offsets, targets) of 'parents', 'children' or 'spouses'"""
+        if relation not in self.adjacency:
+            raise ValueError(f"unknown relation {relation!r}, choose from {', '.join(self.RELATIONS)}")
+        return self.adjacency[relation]
+
+    def related(self, person_id, relation):
+        """The IDs of person_id's parents, children or spouses"""
+        node = self.node(person_id)
+        offsets, targets = self.links(relation)
+        return [self.ids[other] for other in targets[offsets[node]:offsets[node + 1]]]
+
+    def walk(self, person_id, relations=('parents',), depth_first=False, max_depth=None):
+        """
+        Yield (person ID, depth) for everyone reachable from person_id over relations, person_id
+        itself left out. Breadth first yields the nearest first, each at their shortest depth;
+        depth first follows one line to its end before the next. Stops max_depth links away when given
+        """
+        start = self.node(person_id)
+        links = [self.links(relation) for relation in relations]
+        seen = bytearray(len(self.ids))
+        seen[start] = 1
+        pending = deque([(start, 0)])
+        take = pending.pop if depth_first else pending.popleft
+        ids = self.ids
+        while pending:
+            node, depth = take()
+            if node != start:
+                yield ids[node], depth
+            if depth == max_depth:
+                continue
+            for offsets, targets in links:
+                for position in range(offsets[node], offsets[node + 1]):
+                    other = targets[position]
+                    if not seen[other]:
+                        seen[other] = 1
+                        pending.append((other, depth + 1))
+
+    def ancestors(self, person_id, max_depth=None):
+        """{ancestor ID: generations up}, 1 for the parents, nearest first"""
+        return dict(self.walk(person_id, ('parents',), max_depth=max_depth))
+
+    def descendants(self, person_id, max_depth=None):
+        """{descendant ID: generations down}, 1 for the children, nearest first"""
+        return dict(self.walk(person_id, ('children',), max_depth=max_depth))
+
+    def generation_depths(self):
+        """
+        array of the generations above each node: 0 without known parents, otherwise one more than
+        the deepest parent. People in a parent cycle (their own ancestor) and below one get -1
+        """
+        if self.depths is None:
+            count = len(self.ids)
+            parent_offsets, child_offsets, children = self.parent_offsets, self.child_offsets, self.children
+            waiting = array('i', [parent_offsets[node + 1] - parent_offsets[node] for node in range(count)])
+            depths = array('i', [0]) * count
+            ready = [node for node in range(count) if not waiting[node]]
+            while ready:
+                node = ready.pop()
+                depth = depths[node] + 1
+                for position in range(child_offsets[node], child_offsets[node + 1]):
+                    child = children[position]
+                    if depths[child] < depth:
+                        depths[child] = depth
+                    waiting[child] -= 1
+                    if not waiting[child]:
+                        ready.append(child)
+            for node in range(count):
+                if waiting[node]:
+                    depths[node] = -1
+            self.depths = depths
+        return self.depths
+
+    def generation(self, person_id):
+        return self.generation_depths()[self.node(person_id)]
+
+    def component_labels(self):
+        """
+        (labels, count): array of the connected component of each node over parent, child and
+        spouse links, numbered from 0 in node order, and the number of components
+        """
+        if self.components is None:
+            count = len(self.ids)
+            labels = array('i', [-1]) * count
+            links = [self.links(relation) for relation in self.RELATIONS]
+            component = 0
+            for root in range(count):
+                if labels[root] >= 0:
+                    continue
+                labels[root] = component
+                stack = [root]
+                while stack:
+                    node = stack.pop()
+                    for offsets, targets in links:
+                        for position in range(offsets[node], offsets[node + 1]):
+                            other = targets[position]
+                            if labels[other] < 0:
+                                labels[other] = component
+                                stack.append(other)
+                component += 1
+            self.components = labels, component
+        return self.components
+
+    def component(self, person_id):
+        """The IDs of everyone connected to person_id by any chain of links, person_id included"""
+        labels, count = self.component_labels()
+        label = labels[self.node(person_id)]
+        return [self.ids[node] for node in range(len(self.ids)) if labels[node] == label]
+
+    def lineage_tables(self):
+        """
+        Binary lifting tables along two lineages, the first and the last parent of everyone:
+        [(line depths, jumps)] where jumps[k][node] is the ancestor 2**k generations up that
+        lineage (-1 past its top) and line depths counts the generations above each node on it.
+        People in a parent cycle start a lineage of their own
+        """
+        if self.lineages is None:
+            count = len(self.ids)
+            depths = self.generation_depths()
+            order = sorted(range(count), key=depths.__getitem__)  # parents before their children
+            offsets, parents = self.parent_offsets, self.parents
+            self.lineages = []
+            for pick in (0, -1):
+                step = array('i', [-1]) * count
+                for node in range(count):
+                    if offsets[node + 1] > offsets[node] and depths[node] >= 0:
+                        step[node] = parents[offsets[node] if pick == 0 else offsets[node + 1] - 1]
+                line_depths = array('i', [0]) * count
+                for node in order:
+                    if step[node] >= 0:
+                        line_depths[node] = line_depths[step[node]] + 1
+                jumps = [step]
+                for level in range(1, max(max(line_depths, default=0).bit_length(), 1)):
+                    previous = jumps[-1]
+                    jumps.append(array('i', [previous[up] if up >= 0 else -1 for up in previous]))
+                self.lineages.append((line_depths, jumps))
+        return self.lineages
+
+    def nbytes(self):
+        """Bytes held by the adjacency arrays"""
+        return sum(links.itemsize * len(links) for links in (
+            self.parent_offsets, self.parents, self.child_offsets, self.children, self.spouse_offsets, self.spouses))
+
+
+def ordinal(number):
+    """1st, 2nd, 3rd, 4th, ... 11th, 12th, 13th, ... 21st"""
+    suffix = 'th' if 10 <= number % 100 <= 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(number % 10, 'th')
+    return f"{number}{suffix}"
+
+
+# (male, female, unknown) words for each kind of relative
+RELATIVE_WORDS = {
+    'parent': ('father', 'mother', 'parent'),
+    'child': ('son', 'daughter', 'child'),
+    'sibling': ('brother', 'sister', 'sibling'),
+    'aunt': ('uncle', 'aunt', 'aunt/uncle'),
+    'niece': ('nephew', 'niece', 'niece/nephew'),
+    'spouse': ('husband', 'wife', 'spouse'),
+}
+
+
+def relative_word(kind, gender):
+    return RELATIVE_WORDS[kind][{'M': 0, 'F': 1}.get(gender, 2)]
+
+
+def greats(count):
+    """The 'great-' prefix for count generations past grand-, '3x great-' from three on"""
+    return 'great-' * count if count < 3 else f"{count}x great-"
+
+
+def relationship_name(up, down, gender='NA', half=False):
+    """
+    What someone is to another person when their closest common ancestor is up generations above
+    them and down generations above the other: relationship_name(1, 3, 'F') is 'great-aunt',
+    relationship_name(3, 4) '2nd cousin once removed'. gender ('M' or 'F') picks the word for
+    parents, children, siblings, aunts and nieces; half marks the collateral ones as half relatives
+    """
+    if up == 0 and down == 0:
+        return 'self'
+    if up == 0:
+        word = relative_word('parent', gender)
+        return word if down == 1 else f"{greats(down - 2)}grand{word}"
+    if down == 0:
+        word = relative_word('child', gender)
+        return word if up == 1 else f"{greats(up - 2)}grand{word}"
+    prefix = 'half-' if half else ''
+    if up == 1 and down == 1:
+        return prefix + relative_word('sibling', gender)
+    if up == 1:
+        return f"{greats(down - 2)}{prefix}{relative_word('aunt', gender)}"
+    if down == 1:
+        return f"{greats(up - 2)}{prefix}{relative_word('niece', gender)}"
+    removed = abs(up - down)
+    name = f"{prefix}{ordinal(min(up, down) - 1)} cousin"
+    if removed:
+        name += ' ' + {1: 'once', 2: 'twice'}.get(removed, f"{removed} times") + ' removed'
+    return name
+
+
+class Relationship(namedtuple('Relationship', ['person_id', 'other_id', 'name', 'up', 'down', 'common_ancestors'])):
+    """
+    How person_id is related to other_id: name ('2nd cousin once removed', 'great-aunt', 'wife', ...
+    or None when they are not related), the generations up from each of them to their closest
+    common ancestors, and those ancestors' IDs. Spouses who are not blood relatives have up and down None
+    """
+    __slots__ = ()
+
+    def describe(self):
+        if self.name is None:
+            return f"{self.person_id} and {self.other_id} are not related"
+        if self.name == 'self':
+            return f"{self.person_id} and {self.other_id} are the same person"
+        return f"{self.person_id} is {self.other_id}'s {self.name}"
+
+
+class RelationshipCalculator:
+    """
+    Answers "how is A related to B?" over a KinshipGraph. Preprocessing builds binary lifting
+    tables along two lineages, each person's first and last parent (KinshipGraph.lineage_tables),
+    so the lowest common ancestor on a lineage takes O(log depth) steps. That ancestor bounds how far
+    up the closest common ancestors can be; the exact ones are then found by searching the full
+    pedigree only that far up from both people, which also covers pedigree collapse and relatives
+    through the other parents. People in different components are unrelated without any search
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.graph = index.kinship()
+        self.lineages = self.graph.lineage_tables()
+
+    def lineage_bound(self, node, other):
+        """The fewest generations up from both to a common ancestor on one of the lineages, or None"""
+        bound = None
+        for line_depths, jumps in self.lineages:
+            first, second = (node, other) if line_depths[node] >= line_depths[other] else (other, node)
+            lift = line_depths[first] - line_depths[second]
+            level = 0
+            while lift:
+                if lift & 1:
+                    first = jumps[level][first]
+                lift >>= 1
+                level += 1
+            if first != second:
+                for level in range(len(jumps) - 1, -1, -1):
+                    up_first, up_second = jumps[level][first], jumps[level][second]
+                    if up_first != up_second:
+                        first, second = up_first, up_second
+                first, second = jumps[0][first], jumps[0][second]
+            if first == second and first >= 0:
+                steps = line_depths[node] + line_depths[other] - 2 * line_depths[first]
+                if bound is None or steps < bound:
+                    bound = steps
+        return bound
+
+    def ancestor_distances(self, node, limit=None):
+        """{node: generations up} for node and its ancestors at most limit generations up"""
+        offsets, parents = self.graph.parent_offsets, self.graph.parents
+        distances = {node: 0}
+        frontier = [node]
+        depth = 0
+        while frontier and depth != limit:
+            depth += 1
+            upper = []
+            for child in frontier:
+                for position in range(offsets[child], offsets[child + 1]):
+                    parent = parents[position]
+                    if parent not in distances:
+                        distances[parent] = depth
+                        upper.append(parent)
+            frontier = upper
+        return distances
+
+    def relate(self, person_id, other_id, cache=None):
+        """The Relationship of person_id to other_id (a KeyError when either is not in the tree)"""
+        graph = self.graph
+        node, other = graph.node(person_id), graph.node(other_id)
+        if node == other:
+            return Relationship(person_id, other_id, 'self', 0, 0, (person_id,))
+        labels, count = graph.component_labels()
+        if labels[node] == labels[other]:
+            bound = self.lineage_bound(node, other)
+            if cache is None:
+                up_node, up_other = self.ancestor_distances(node, bound), self.ancestor_distances(other, bound)
+            else:
+                up_node, up_other = self.cached_distances(cache, node, bound), self.cached_distances(cache, other, bound)
+            if len(up_other) < len(up_node):
+                common = [(up_node[ancestor] + up, abs(up_node[ancestor] - up), up_node[ancestor], ancestor)
+                          for ancestor, up in up_other.items() if ancestor in up_node]
+            else:
+                common = [(up + up_other[ancestor], abs(up - up_other[ancestor]), up, ancestor)
+                          for ancestor, up in up_node.items() if ancestor in up_other]
+            if common:
+                total, spread, up, ancestor = min(common)
+                closest = sorted(ancestor for ancestor_total, ancestor_spread, ancestor_up, ancestor in common
+                                 if (ancestor_total, ancestor_up) == (total, up))
+                # One common ancestor who has a partner in the tree: the two lines come down through different partners
+                half = len(closest) == 1 and graph.spouse_offsets[closest[0] + 1] > graph.spouse_offsets[closest[0]]
+                name = relationship_name(up, total - up, self.gender(person_id), half)
+                return Relationship(person_id, other_id, name, up, total - up, tuple(graph.ids[ancestor] for ancestor in closest))
+        if other in graph.spouses[graph.spouse_offsets[node]:graph.spouse_offsets[node + 1]]:
+            return Relationship(person_id, other_id, relative_word('spouse', self.gender(person_id)), None, None, ())
+        return Relationship(person_id, other_id, None, None, None, ())
+
+    def cached_distances(self, cache, node, limit):
+        distances = cache.get((node, limit))
+        if distances is None:
+            distances = cache[node, limit] = self.ancestor_distances(node, limit)
+        return distances
+
+    def relate_many(self, pairs):
+        """
+        relate() for each (person ID, other ID) pair, in order. The ancestor searches are shared
+        between the pairs, so asking how one person is related to many others searches their side once
+        """
+        cache = {}
+        return [self.relate(person_id, other_id, cache) for person_id, other_id in pairs]
+
+    def gender(self, person_id):
+        person = self.index.person(person_id)
+        return person.get('Gender', 'NA') if person is not None else 'NA'
+
+
+# First calendar day of each month in a leap year, see calendar_day
+MONTH_STARTS = tuple(accumulate((0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30)))
+LEAP_DAY = 60  # calendar_day(2, 29)
+LEAP_DAY_RULES = ('skip', 'feb28', 'mar1')
+
+
+def calendar_day(month, day):
+    """The day of (month, day) in a leap year: 1 JAN is 1, 29 FEB is 60, 31 DEC is 366"""
+    return MONTH_STARTS[month - 1] + day
+
+
+def is_leap_year(year):
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+def same_records(records, others):
+    """Whether two lists hold the very same records in the same order, so positions into one index the other"""
+    return len(records) == len(others) and all(map(is_, records, others))
+
+
+class CalendarIndex:
+    """
+    Birthdays and wedding anniversaries sorted by calendar day, births and deaths sorted by date,
+    each as an array of keys and an array of the records' positions in the lists the index was built
+    from. A window of days is then two binary searches and a scan of only the records in it.
+    Build it once from the organized records (or use GedcomIndex.calendar()) and query it as often as needed
+    """
+
+    def __init__(self, individual_list=(), family_list=()):
+        self.individuals = list(individual_list)
+        self.families = list(family_list)
+        self.birthdays, self.births = self.sorted_dates(self.individuals, 'Birthday')
+        self.anniversaries, _ = self.sorted_dates(self.families, 'Married')
+        _, self.deaths = self.sorted_dates(self.individuals, 'Death')
+        self.person_positions = {}  # person ID -> position of their first record
+        for position, ind in enumerate(self.individuals):
+            self.person_positions.setdefault(ind.get('ID'), position)
+
+    def covers(self, individual_list, family_list=None):
+        """
+        Whether the index was built from exactly these records (and families), so its positions
+        index them; not once a list has lost records the index still has, or repeats an ID
+        """
+        return same_records(self.individuals, individual_list) and (family_list is None or same_records(self.families, family_list))
+
+    @staticmethod
+    def sorted_dates(records, key):
+        """
+        For the records with a readable key date, (keys, positions) sorted by calendar day and
+        (keys, positions) sorted by day ordinal, keys ascending
+        """
+        days = []
+        ordinals = []
+        for position, record in enumerate(records):
+            parsed = parse_known_date(record.get(key, 'NA'))
+            if parsed is not None:
+                days.append((calendar_day(parsed.month, parsed.day), position))
+                ordinals.append((parsed.ordinal, position))
+        return tuple((array('i', [key for key, position in entries]), array('i', [position for key, position in entries]))
+                     for entries in (sorted(days), sorted(ordinals)))
+
+    def occurrences(self, dates, first, last, leap_day='skip'):
+        """
+        [(date, position)] in date order for every day of dates (birthdays or anniversaries) that
+        falls from first to last, both included, across any number of new years. leap_day says
+        when 29 FEB falls in the other years: 'skip' it, or keep it on 'feb28' or on 'mar1'
+        """
+        if leap_day not in LEAP_DAY_RULES:
+            raise ValueError(f"unknown leap day rule {leap_day!r}, choose from {', '.join(LEAP_DAY_RULES)}")
+        found = []
+        start = first
+        while start <= last:
+            end = min(last, date(start.year, 12, 31))
+            found.extend(self.year_occurrences(dates, start, end, leap_day))
+            start = date(start.year + 1, 1, 1)
+        return found
+
+    @staticmethod
+    def year_occurrences(dates, start, end, leap_day):
+        """occurrences from start to end within one year"""
+        keys, positions = dates
+        year_before = date(start.year, 1, 1).toordinal() - 1
+        low = bisect_left(keys, calendar_day(start.month, start.day))
+        high = bisect_right(keys, calendar_day(end.month, end.day))
+        if is_leap_year(start.year):
+            return [(date.fromordinal(year_before + keys[entry]), positions[entry]) for entry in range(low, high)]
+
+        # Without 29 FEB every later day is one earlier in the year, and the 29 FEB run of keys moves or drops
+        leap_low, leap_high = bisect_left(keys, LEAP_DAY), bisect_right(keys, LEAP_DAY)
+        entries = list(range(low, min(high, leap_low)))
+        moved = {'feb28': LEAP_DAY - 1, 'mar1': LEAP_DAY + 1}.get(leap_day)
+        if moved is not None and calendar_day(start.month, start.day) <= moved <= calendar_day(end.month, end.day):
+            entries.extend(range(leap_low, leap_high))
+        entries.extend(range(max(low, leap_high), high))
+        found = []
+        for entry in entries:
+            key = keys[entry]
+            if key == LEAP_DAY:
+                key = moved
+            found.append((date.fromordinal(year_before + key - (key > LEAP_DAY)), positions[entry]))
+        return found
+
+    @staticmethod
+    def between(dates, first, last=None):
+        """The positions of the births or deaths from the day ordinal first to last (open ended when None), in date order"""
+        keys, positions = dates
+        high = len(keys) if last is None else bisect_right(keys, last)
+        return positions[bisect_left(keys, first):high].tolist()
+
+    def upcoming_birthdays(self, first, last, leap_day='skip'):
+        """[(date, person)] for the birthdays from first to last, in date order"""
+        return [(day, self.individuals[position]) for day, position in self.occurrences(self.birthdays, first, last, leap_day)]
+
+    def upcoming_anniversaries(self, first, last, leap_day='skip'):
+        """[(date, family)] for the wedding anniversaries from first to last, in date order"""
+        return [(day, self.families[position]) for day, position in self.occurrences(self.anniversaries, first, last, leap_day)]
+
+    def born_between(self, first, last=None):
+        """The people born from the date first to last (open ended when None), in birth order"""
+        return [self.individuals[position] for position in self.between(self.births, first.toordinal(), last and last.toordinal())]
+
+    def died_between(self, first, last=None):
+        """The people who died from the date first to last (open ended when None), in order of death"""
+        return [self.individuals[position] for position in self.between(self.deaths, first.toordinal(), last and last.toordinal())]
+
+
+class AgeTable:
+    """
+    The age and whether they were alive of every person of a list on one day, computed for all of
+    them in one pass and kept by position, so a run asks for an age as often as it likes without
+    parsing dates or reading the clock again. set_day() recomputes the whole table for another day.
+    Ages are at death for the dead and -1 for anyone without a readable birthday, born after the day
+    or dead with an unreadable death date
+    """
+
+    def __init__(self, individual_list=(), as_of=None):
+        self.individuals = list(individual_list)
+        self.positions = {}  # person ID -> position of their first record
+        for position, ind in enumerate(self.individuals):
+            self.positions.setdefault(ind.get('ID'), position)
+        self.day = None
+        self.ages = array('i')
+        self.alive = bytearray()
+        self.set_day(as_of)
+
+    def set_day(self, as_of=None):
+        """Recompute every age for the day as_of (default today); returns False when it already was that day"""
+        day = as_of_date(as_of)
+        if day == self.day:
+            return False
+        found = [age_and_alive(ind, day) for ind in self.individuals]
+        self.day = day
+        self.ages = array('i', [age for age, alive in found])
+        self.alive = bytearray(alive for age, alive in found)
+        return True
+
+    def age(self, person_id):
+        """The person's age on the day, -1 when unknown; a KeyError names an unknown person"""
+        return self.ages[self.positions[person_id]]
+
+    def is_alive(self, person_id):
+        """Whether the person was alive on the day; a KeyError names an unknown person"""
+        return bool(self.alive[self.positions[person_id]])
+
+    def living(self):
+        """The people alive on the day, in list order"""
+        return [ind for ind, alive in zip(self.individuals, self.alive) if alive]
+
+
+class PersonQuery:
+    """
+    Ad-hoc queries over a list of people, as of one day: select(Q.alive & (Q.age > 30) & Q.no_spouse)
+    returns the matching records in list order. Predicates that can name their candidates use a
+    secondary index instead of a scan: who is alive, column values such as gender ('Gender' == 'M'),
+    birth and death dates (the CalendarIndex), ages as a range of birth dates and the number of
+    spouses. Each index is built the first time a query needs it and kept for the next ones.
+    With indexed=False nothing is built and every query is one scan, the cheaper choice for a
+    query asked only once. index (a GedcomIndex) is needed for the number of spouses
+    """
+
+    def __init__(self, individual_list=(), index=None, as_of=None, calendar=None, ages=None, indexed=True):
+        self.individuals = list(individual_list)
+        self.index = index
+        self.indexed = indexed
+        self.day = as_of_date(index.as_of if as_of is None and index is not None else as_of)
+        # A calendar or age table built from other records would give positions into the wrong list
+        self.calendar_cache = calendar if calendar is not None and calendar.covers(self.individuals) else None
+        self.ages_cache = ages if ages is not None and same_records(ages.individuals, self.individuals) else None
+        self.living_cache = None
+        self.column_cache = {}          # column key -> {value: positions}
+        self.spouse_cache = None
+
+    def calendar(self):
+        if self.calendar_cache is None:
+            self.calendar_cache = CalendarIndex(self.individuals)
+        return self.calendar_cache
+
+    def ages(self):
+        if self.ages_cache is None:
+            self.ages_cache = AgeTable(self.individuals, self.day)
+        return self.ages_cache
+
+    def living(self):
+        """Positions of the people alive on the day, ascending"""
+        if self.living_cache is None:
+            self.living_cache = array('i', [position for position, alive in enumerate(self.ages().alive) if alive])
+        return self.living_cache
+
+    def column(self, key):
+        """{value: positions} of a record column such as 'Gender' or 'Spouse'"""
+        buckets = self.column_cache.get(key)
+        if buckets is None:
+            buckets = {}
+            for position, ind in enumerate(self.individuals):
+                buckets.setdefault(ind.get(key), array('i')).append(position)
+            self.column_cache[key] = buckets
+        return buckets
+
+    def spouse_count(self, person_id):
+        """Number of families where the person is married to a known spouse"""
+        if self.index is None:
+            return 0
+        return sum(len(GedcomIndex.spouse_ids(fam)) == 2 for fam in self.index.families_as_spouse(person_id))
+
+    def spouse_counts(self):
+        """(count of each position, {count: positions}) of spouse_count()"""
+        if self.spouse_cache is None:
+            spouse_families = self.index.spouse_families if self.index is not None else {}
+            spouse_ids = GedcomIndex.spouse_ids
+            # Each family with two different known spouses counts once for each of them
+            couples = {}
+            for families in spouse_families.values():
+                for fam in families:
+                    if id(fam) not in couples:
+                        couples[id(fam)] = len(spouse_ids(fam)) == 2
+            counts = array('i', [sum(couples[id(fam)] for fam in spouse_families.get(ind.get('ID'), ()))
+                                 for ind in self.individuals])
+            buckets = {}
+            for position, count in enumerate(counts):
+                buckets.setdefault(count, array('i')).append(position)
+            self.spouse_cache = (counts, buckets)
+        return self.spouse_cache
+
+    def candidates(self, predicate):
+        """(positions, description) of the people predicate may match, all of them when it has no index"""
+        planned = predicate.plan(self) if self.indexed else None
+        if planned is None:
+            return range(len(self.individuals)), f"scan of {len(self.individuals)} people"
+        return planned
+
+    def positions(self, predicate):
+        positions, description = self.candidates(predicate)
+        return list(filter(predicate.bind(self), positions if isinstance(positions, range) else sorted(positions)))
+
+    def select(self, predicate):
+        """The people matching predicate, in list order"""
+        return [self.individuals[position] for position in self.positions(predicate)]
+
+    def count(self, predicate):
+        return len(self.positions(predicate))
+
+    def explain(self, predicate):
+        """How select(predicate) finds its candidates, e.g. 'index alive (12,040 people)'"""
+        return self.candidates(predicate)[1]
+
+
+class Predicate:
+    """
+    A condition on the people of a PersonQuery, combined with & (and), | (or) and ~ (not).
+    bind(query) returns the test of one position for that query; plan(query), when given,
+    returns (positions, description) for a superset of the people it matches, or None when
+    only a scan will do. Comparisons bind looser than & and |, so write Q.alive & (Q.age > 30)
+    """
+    __slots__ = ('bind', 'plan', 'label')
+
+    def __init__(self, bind, plan=None, label='?'):
+        self.bind = bind
+        self.plan = plan or (lambda query: None)
+        self.label = label
+
+    def __and__(self, other):
+        def bind(query):
+            first, second = self.bind(query), other.bind(query)
+            return lambda position: first(position) and second(position)
+
+        def plan(query):
+            # Every part is tested again, so the smallest candidate set of any part will do
+            planned = [candidates for candidates in (self.plan(query), other.plan(query)) if candidates is not None]
+            return min(planned, key=lambda candidates: len(candidates[0]), default=None)
+        return Predicate(bind, plan, f"({self.label} & {other.label})")
+
+    def __or__(self, other):
+        def bind(query):
+            first, second = self.bind(query), other.bind(query)
+            return lambda position: first(position) or second(position)
+
+        def plan(query):
+            first, second = self.plan(query), other.plan(query)
+            if first is None or second is None:
+                return None
+            return set(first[0]).union(second[0]), f"{first[1]} | {second[1]}"
+        return Predicate(bind, plan, f"({self.label} | {other.label})")
+
+    def __invert__(self):
+        def bind(query):
+            test = self.bind(query)
+            return lambda position: not test(position)
+        return Predicate(bind, None, f"~{self.label}")
+
+    def __repr__(self):
+        return f"Predicate({self.label})"
+
+
+class Field:
+    """
+    A value of the people of a PersonQuery, compared with ==, !=, <, <=, > or >= into a Predicate.
+    bind(query) returns the value of one position for that query, None when unknown, and an
+    unknown value matches no comparison. A Field of a record column has its key instead of bind.
+    convert turns the operand into a value (a date string into a GedcomDate, ...).
+    plan(query, operator, operand), when given, returns (positions, description) for a superset
+    of the people the comparison matches, or None when only a scan will do
+    """
+    __slots__ = ('name', 'bind', 'plan', 'convert', 'key')
+
+    def __init__(self, name, bind=None, plan=None, convert=None, key=None):
+        self.name = name
+        self.bind = bind
+        self.plan = plan or (lambda query, operator, operand: None)
+        self.convert = convert
+        self.key = key
+
+    def compare(self, operator, symbol, operand):
+        label = f"({self.name} {symbol} {operand!r})"
+        if self.convert is not None:
+            operand = self.convert(operand)
+
+        def bind(query):
+            if self.key is not None:
+                # Read the column straight from the records, the test runs once per person scanned
+                individuals = query.individuals
+                key = self.key
+
+                def test(position):
+                    found = individuals[position].get(key)
+                    return found is not None and operator(found, operand)
+                return test
+            value = self.bind(query)
+
+            def test(position):
+                found = value(position)
+                return found is not None and operator(found, operand)
+            return test
+        return Predicate(bind, lambda query: self.plan(query, symbol, operand), label)
+
+    def __eq__(self, operand):
+        return self.compare(eq, '==', operand)
+
+    def __ne__(self, operand):
+        return self.compare(ne, '!=', operand)
+
+    def __lt__(self, operand):
+        return self.compare(lt, '<', operand)
+
+    def __le__(self, operand):
+        return self.compare(le, '<=', operand)
+
+    def __gt__(self, operand):
+        return self.compare(gt, '>', operand)
+
+    def __ge__(self, operand):
+        return self.compare(ge, '>=', operand)
+
+    __hash__ = None
+
+
+def column_field(key):
+    """A record column as a Field, e.g. Q.column('Gender') == 'F'; == uses an index of the column's values"""
+    def plan(query, symbol, operand):
+        if symbol != '==':
+            return None
+        positions = query.column(key).get(operand, ())
+        return positions, f"index {key} == {operand!r} ({len(positions):,} people)"
+    return Field(key, plan=plan, key=key)
+
+
+def date_range(query, name, dates, first, last):
+    """(positions, description) of the people whose date (births or deaths) is from day ordinal first to last, either open when None"""
+    keys, positions = getattr(query.calendar(), dates)
+    low = 0 if first is None else bisect_left(keys, first)
+    high = len(keys) if last is None else bisect_right(keys, last)
+    return positions[low:high], f"index {name} ({high - low:,} people)"
+
+
+def date_field(name, key, dates):
+    """
+    The date of a record column (key 'Birthday' or 'Death') as a Field compared with dates, backed
+    by the CalendarIndex's sorted day ordinals (dates 'births' or 'deaths')
+    """
+    def bind(query):
+        individuals = query.individuals
+        return lambda position: parse_known_date(individuals[position].get(key, 'NA'))
+
+    def plan(query, symbol, operand):
+        if symbol == '!=':
+            return None
+        first, last = {'==': (operand.ordinal, operand.ordinal), '<': (None, operand.ordinal - 1),
+                       '<=': (None, operand.ordinal), '>': (operand.ordinal + 1, None),
+                       '>=': (operand.ordinal, None)}[symbol]
+        return date_range(query, name, dates, first, last)
+
+    return Field(name, bind, plan, lambda operand: make_gedcom_date(as_of_date(operand)))
+
+
+def years_before(day, years):
+    """The day `years` years before day, 28 FEB for 29 FEB in a year without it"""
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)
+
+
+def age_bind(query):
+    if not query.indexed:
+        individuals = query.individuals
+        day = query.day
+
+        def value(position):
+            found = age_and_alive(individuals[position], day)[0]
+            return found if found >= 0 else None
+        return value
+    ages = query.ages().ages
+    return lambda position: ages[position] if ages[position] >= 0 else None
+
+
+def age_plan(query, symbol, operand):
+    # Whoever is at least n years old on the day (at death for the dead, which is younger) was born n years before it
+    if not isinstance(operand, int) or symbol not in ('>', '>='):
+        return None
+    years = operand + 1 if symbol == '>' else operand
+    if years <= 0:
+        return None
+    return date_range(query, 'born', 'births', None, years_before(query.day, years).toordinal())
+
+
+def spouses_bind(query):
+    if not query.indexed:
+        individuals = query.individuals
+        return lambda position: query.spouse_count(individuals[position].get('ID'))
+    return query.spouse_counts()[0].__getitem__
+
+
+def spouses_plan(query, symbol, operand):
+    if not isinstance(operand, int):
+        return None
+    counts, buckets = query.spouse_counts()
+    operator = {'==': eq, '!=': ne, '<': lt, '<=': le, '>': gt, '>=': ge}[symbol]
+    matching = [positions for count, positions in buckets.items() if operator(count, operand)]
+    return set(chain.from_iterable(matching)), f"index spouses {symbol} {operand} ({sum(map(len, matching)):,} people)"
+
+
+def alive_bind(query):
+    if not query.indexed:
+        individuals = query.individuals
+        day = query.day
+        return lambda position: alive_on(individuals[position], day)
+    return query.ages().alive.__getitem__
+
+
+def alive_plan(query):
+    living = query.living()
+    return living, f"index alive ({len(living):,} people)"
+
+
+def dead_bind(query):
+    # Has a death record, is not alive on the day (died by then, or on an unreadable date) and was not
+    # born after it; an unreadable birthday does not count against it, as the Alive column did not
+    individuals = query.individuals
+    alive = alive_bind(query)
+    ordinal = query.day.toordinal()
+
+    def test(position):
+        ind = individuals[position]
+        if ind.get('Alive') != DEAD or alive(position):
+            return False
+        born = parse_known_date(ind.get('Birthday', 'NA'))
+        return born is None or born.ordinal <= ordinal
+    return test
+
+
+def dead_plan(query):
+    with_death = query.column('Alive').get(DEAD, ())
+    return with_death, f"index Alive == 'False' ({len(with_death):,} people)"
+
+
+def within_days(name, key, dates, days):
+    """Predicate: the date of key (births or deaths) is in the `days` days up to the query's day, both ends included"""
+    def bind(query):
+        individuals = query.individuals
+        last = query.day.toordinal()
+        first = last - days
+
+        def test(position):
+            found = parse_known_date(individuals[position].get(key, 'NA'))
+            return found is not None and first <= found.ordinal <= last
+        return test
+
+    def plan(query):
+        last = query.day.toordinal()
+        return date_range(query, name, dates, last - days, last)
+
+    return Predicate(bind, plan, f"{name}_within(days={days})")
+
+
+class Q:
+    """
+    The fields and predicates of PersonQuery.select(), e.g. Q.alive & (Q.age > 30) & Q.no_spouse.
+    Ages and who is alive are as of the query's day
+    """
+    age = Field('age', age_bind, age_plan)
+    born = date_field('born', 'Birthday', 'births')
+    died = date_field('died', 'Death', 'deaths')
+    spouses = Field('spouses', spouses_bind, spouses_plan)
+    alive = Predicate(alive_bind, alive_plan, 'alive')
+    dead = Predicate(dead_bind, dead_plan, 'dead')
+    gender = column_field('Gender')
+    male = gender == 'M'
+    female = gender == 'F'
+    no_spouse = column_field('Spouse') == 'NA'
+    married = column_field('Spouse') != 'NA'
+    column = staticmethod(column_field)
+
+    @staticmethod
+    def born_within(days):
+        """Predicate: born in the `days` days up to the query's day (born_within(0) is born that day)"""
+        return within_days('born', 'Birthday', 'births', days)
+
+    @staticmethod
+    def died_within(days):
+        """Predicate: died in the `days` days up to the query's day"""
+        return within_days('died', 'Death', 'deaths', days)
+
+    @staticmethod
+    def where(function, label=None):
+        """Predicate from function(record) for anything the fields do not cover; it is always a scan"""
+        def bind(query):
+            individuals = query.individuals
+            return lambda position: function(individuals[position])
+        return Predicate(bind, None, label or getattr(function, '__name__', 'where'))
+
+
+# Letters NFKD does not split into a base letter and an accent
+NAME_FOLDS = str.maketrans({'ß': 'ss', 'æ': 'ae', 'œ': 'oe', 'ø': 'o', 'ł': 'l', 'đ': 'd', 'ð': 'd', 'þ': 'th', 'ı': 'i'})
+SOUNDEX_CODES = {letter: str(code) for code, letters in enumerate(('BFPV', 'CGJKQSXZ', 'DT', 'L', 'MN', 'R'), 1)
+                 for letter in letters}
+METAPHONE_VOWELS = frozenset('AEIOUY')
+NAME_WORD = re.compile(r'[^\W\d_]+')
+
+
+def split_name(name):
+    """
+    (given names, surname) of a GEDCOM name such as 'Rogerio /Neves Da Silveira Nunes/'. A suffix
+    after the surname ('John /Smith/ Jr.') stays with the given names, a name without slashes is all given names
+    """
+    if not isinstance(name, str) or name == 'NA':
+        return '', ''
+    given, slash, rest = name.partition('/')
+    if not slash:
+        return ' '.join(name.split()), ''
+    surname, _, suffix = rest.partition('/')
+    return ' '.join(f"{given} {suffix}".split()), ' '.join(surname.split())
+
+
+def fold_name(text, keep=''):
+    """
+    text lower cased without accents or punctuation, e.g. 'Conceição' -> 'conceicao'; every run of
+    anything but letters becomes one space. The lower case letters in keep are left as they are
+    """
+    text = text.lower().translate(NAME_FOLDS)
+    if not text.isascii():
+        text = ''.join(letter if letter in keep else
+                       ''.join(part for part in unicodedata.normalize('NFKD', letter) if not unicodedata.combining(part))
+                       for letter in text)
+    return ' '.join(NAME_WORD.findall(text))
+
+
+def soundex(word):
+    """The American Soundex code of a word, e.g. 'R163' for both Robert and Rupert; '' when it has no letters"""
+    letters = fold_name(word).replace(' ', '').upper()
+    if not letters:
+        return ''
+    code = letters[0]
+    previous = SOUNDEX_CODES.get(code, '')
+    for letter in letters[1:]:
+        digit = SOUNDEX_CODES.get(letter, '')
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # H and W do not separate two letters with the same code, vowels do
+        if letter not in 'HW':
+            previous = digit
+    return code.ljust(4, '0')
+
+
+def double_metaphone(word):
+    """
+    The (primary, alternate) Double Metaphone codes of a word after Lawrence Philips' rules, at most
+    4 letters each, e.g. ('XMT', 'SMT') for Schmidt; the alternate is the primary when the word has one
+    reading. Accents are folded first, except that Ç and Ñ are read as S and N
+    """
+    # The padding lets the rules look past the end of the word the way the original does
+    letters = fold_name(word, keep='çñ').replace(' ', '').upper()
+    length = len(letters)
+    last = length - 1
+    letters += '     '
+    primary = []
+    alternate = []
+
+    def add(main, other=None):
+        primary.append(main)
+        alternate.append(main if other is None else other)
+
+    def char(position):
+        return letters[position] if position >= 0 else ''
+
+    def at(position, *options):
+        return position >= 0 and letters.startswith(options, position)
+
+    def vowel(position):
+        return char(position) in METAPHONE_VOWELS
+
+    slavo_germanic = 'W' in letters or 'K' in letters or 'CZ' in letters
+    current = 0
+    if at(0, 'GN', 'KN', 'PN', 'WR', 'PS'):
+        current += 1
+    if char(0) == 'X':
+        add('S')
+        current += 1
+
+    while current < length:
+        letter = letters[current]
+        step = 1
+        if letter in METAPHONE_VOWELS:
+            if current == 0:
+                add('A')
+        elif letter == 'B':
+            add('P')
+            step = 2 if char(current + 1) == 'B' else 1
+        elif letter == 'Ç':
+            add('S')
+        elif letter == 'C':
+            if (current > 1 and not vowel(current - 2) and at(current - 1, 'ACH') and char(current + 2) != 'I'
+                    and (char(current + 2) != 'E' or at(current - 2, 'BACHER', 'MACHER'))):
+                add('K')
+                step = 2
+            elif current == 0 and at(current, 'CAESAR'):
+                add('S')
+                step = 2
+            elif at(current, 'CHIA'):
+                add('K')
+                step = 2
+            elif at(current, 'CH'):
+                if current > 0 and at(current, 'CHAE'):
+                    add('K', 'X')
+                elif (current == 0 and (at(current + 1, 'HARAC', 'HARIS') or at(current + 1, 'HOR', 'HYM', 'HIA', 'HEM'))
+                      and not at(0, 'CHORE')):
+                    add('K')
+                elif (at(0, 'VAN ', 'VON ', 'SCH') or at(current - 2, 'ORCHES', 'ARCHIT', 'ORCHID') or at(current + 2, 'T', 'S')
+                      or ((at(current - 1, 'A', 'O', 'U', 'E') or current == 0)
+                          and at(current + 2, 'L', 'R', 'N', 'M', 'B', 'H', 'F', 'V', 'W', ' '))):
+                    add('K')
+                elif current == 0:
+                    add('X')
+                elif at(0, 'MC'):
+                    add('K')
+                else:
+                    add('X', 'K')
+                step = 2
+            elif at(current, 'CZ') and not at(current - 2, 'WICZ'):
+                add('S', 'X')
+                step = 2
+            elif at(current + 1, 'CIA'):
+                add('X')
+                step = 3
+            elif at(current, 'CC') and not (current == 1 and char(0) == 'M'):
+                if at(current + 2, 'I', 'E', 'H') and not at(current + 2, 'HU'):
+                    if (current == 1 and char(0) == 'A') or at(current - 1, 'UCCEE', 'UCCES'):
+                        add('KS')
+                    else:
+                        add('X')
+                    step = 3
+                else:
+                    add('K')
+                    step = 2
+            elif at(current, 'CK', 'CG', 'CQ'):
+                add('K')
+                step = 2
+            elif at(current, 'CI', 'CE', 'CY'):
+                if at(current, 'CIO', 'CIE', 'CIA'):
+                    add('S', 'X')
+                else:
+                    add('S')
+                step = 2
+            else:
+                add('K')
+                if at(current + 1, ' C', ' Q', ' G'):
+                    step = 3
+                elif at(current + 1, 'C', 'K', 'Q') and not at(current + 1, 'CE', 'CI'):
+                    step = 2
+        elif letter == 'D':
+            if at(current, 'DG'):
+                if at(current + 2, 'I', 'E', 'Y'):
+                    add('J')
+                    step = 3
+                else:
+                    add('TK')
+                    step = 2
+            else:
+                add('T')
+                step = 2 if at(current, 'DT', 'DD') else 1
+        elif letter == 'F':
+            add('F')
+            step = 2 if char(current + 1) == 'F' else 1
+        elif letter == 'G':
+            step = 2
+            if char(current + 1) == 'H':
+                if current > 0 and not vowel(current - 1):
+                    add('K')
+                elif current == 0:
+                    add('J' if char(current + 2) == 'I' else 'K')
+                # Parker's rule: silent in 'hugh', 'bough' and 'broughton'
+                elif not ((current > 1 and at(current - 2, 'B', 'H', 'D')) or (current > 2 and at(current - 3, 'B', 'H', 'D'))
+                          or (current > 3 and at(current - 4, 'B', 'H'))):
+                    if current > 2 and char(current - 1) == 'U' and at(current - 3, 'C', 'G', 'L', 'R', 'T'):
+                        add('F')
+                    elif char(current - 1) != 'I':
+                        add('K')
+            elif char(current + 1) == 'N':
+                if current == 1 and vowel(0) and not slavo_germanic:
+                    add('KN', 'N')
+                elif not at(current + 2, 'EY') and not slavo_germanic:
+                    add('N', 'KN')
+                else:
+                    add('KN')
+            elif at(current + 1, 'LI') and not slavo_germanic:
+                add('KL', 'L')
+            elif current == 0 and (char(current + 1) == 'Y'
+                                   or at(current + 1, 'ES', 'EP', 'EB', 'EL', 'EY', 'IB', 'IL', 'IN', 'IE', 'EI', 'ER')):
+                add('K', 'J')
+            elif ((at(current + 1, 'ER') or char(current + 1) == 'Y') and not at(0, 'DANGER', 'RANGER', 'MANGER')
+                  and not at(current - 1, 'E', 'I') and not at(current - 1, 'RGY', 'OGY')):
+                add('K', 'J')
+            elif at(current + 1, 'E', 'I', 'Y') or at(current - 1, 'AGGI', 'OGGI'):
+                if at(0, 'VAN ', 'VON ', 'SCH') or at(current + 1, 'ET'):
+                    add('K')
+                elif at(current + 1, 'IER '):
+                    add('J')
+                else:
+                    add('J', 'K')
+            else:
+                add('K')
+                step = 2 if char(current + 1) == 'G' else 1
+        elif letter == 'H':
+            # Kept only first or between vowels, and before a vowel
+            if (current == 0 or vowel(current - 1)) and vowel(current + 1):
+                add('H')
+                step = 2
+        elif letter == 'J':
+            if at(current, 'JOSE') or at(0, 'SAN '):
+                if (current == 0 and char(current + 4) == ' ') or at(0, 'SAN '):
+                    add('H')
+                else:
+                    add('J', 'H')
+            else:
+                if current == 0:
+                    add('J', 'A')
+                elif vowel(current - 1) and not slavo_germanic and char(current + 1) in ('A', 'O'):
+                    add('J', 'H')
+                elif current == last:
+                    add('J', '')
+                elif not at(current + 1, 'L', 'T', 'K', 'S', 'N', 'M', 'B', 'Z') and not at(current - 1, 'S', 'K', 'L'):
+                    add('J')
+                step = 2 if char(current + 1) == 'J' else 1
+        elif letter == 'K':
+            add('K')
+            step = 2 if char(current + 1) == 'K' else 1
+        elif letter == 'L':
+            if char(current + 1) == 'L':
+                # Spanish, e.g. 'cabrillo' and 'gallegos'
+                if ((current == length - 3 and at(current - 1, 'ILLO', 'ILLA', 'ALLE'))
+                        or ((at(last - 1, 'AS', 'OS') or at(last, 'A', 'O')) and at(current - 1, 'ALLE'))):
+                    add('L', '')
+                else:
+                    add('L')
+                step = 2
+            else:
+                add('L')
+        elif letter == 'M':
+            add('M')
+            if (at(current - 1, 'UMB') and (current + 1 == last or at(current + 2, 'ER'))) or char(current + 1) == 'M':
+                step = 2
+        elif letter in ('N', 'Ñ'):
+            add('N')
+            step = 2 if char(current + 1) == 'N' else 1
+        elif letter == 'P':
+            if char(current + 1) == 'H':
+                add('F')
+                step = 2
+            else:
+                add('P')
+                step = 2 if at(current + 1, 'P', 'B') else 1
+        elif letter == 'Q':
+            add('K')
+            step = 2 if char(current + 1) == 'Q' else 1
+        elif letter == 'R':
+            # French, e.g. 'rogier' but not 'hochmeier'
+            if current == last and not slavo_germanic and at(current - 2, 'IE') and not at(current - 4, 'ME', 'MA'):
+                add('', 'R')
+            else:
+                add('R')
+            step = 2 if char(current + 1) == 'R' else 1
+        elif letter == 'S':
+            if at(current - 1, 'ISL', 'YSL'):
+                pass
+            elif current == 0 and at(current, 'SUGAR'):
+                add('X', 'S')
+            elif at(current, 'SH'):
+                add('S' if at(current + 1, 'HEIM', 'HOEK', 'HOLM', 'HOLZ') else 'X')
+                step = 2
+            elif at(current, 'SIO', 'SIA', 'SIAN'):
+                if slavo_germanic:
+                    add('S')
+                else:
+                    add('S', 'X')
+                step = 3
+            elif (current == 0 and at(current + 1, 'M', 'N', 'L', 'W')) or at(current + 1, 'Z'):
+                # 'smith' matches 'schmidt' and 'snider' 'schneider'
+                add('S', 'X')
+                step = 2 if at(current + 1, 'Z') else 1
+            elif at(current, 'SC'):
+                if char(current + 2) == 'H':
+                    if at(current + 3, 'ER', 'EN'):
+                        add('X', 'SK')
+                    elif at(current + 3, 'OO', 'UY', 'ED', 'EM'):
+                        add('SK')
+                    elif current == 0 and not vowel(3) and char(3) != 'W':
+                        add('X', 'S')
+                    else:
+                        add('X')
+                elif at(current + 2, 'I', 'E', 'Y'):
+                    add('S')
+                else:
+                    add('SK')
+                step = 3
+            else:
+                # French, e.g. 'resnais' and 'artois'
+                if current == last and at(current - 2, 'AI', 'OI'):
+                    add('', 'S')
+                else:
+                    add('S')
+                step = 2 if at(current + 1, 'S', 'Z') else 1
+        elif letter == 'T':
+            if at(current, 'TION', 'TIA', 'TCH'):
+                add('X')
+                step = 3
+            elif at(current, 'TH', 'TTH'):
+                if at(current + 2, 'OM', 'AM') or at(0, 'VAN ', 'VON ', 'SCH'):
+                    add('T')
+                else:
+                    add('0', 'T')
+                step = 2
+            else:
+                add('T')
+                step = 2 if at(current + 1, 'T', 'D') else 1
+        elif letter == 'V':
+            add('F')
+            step = 2 if char(current + 1) == 'V' else 1
+        elif letter == 'W':
+            if at(current, 'WR'):
+                add('R')
+                step = 2
+            else:
+                if current == 0 and (vowel(current + 1) or at(current, 'WH')):
+                    # Wasserman matches Vasserman
+                    if vowel(current + 1):
+                        add('A', 'F')
+                    else:
+                        add('A')
+                if ((current == last and vowel(current - 1)) or at(current - 1, 'EWSKI', 'EWSKY', 'OWSKI', 'OWSKY')
+                        or at(0, 'SCH')):
+                    add('', 'F')
+                elif at(current, 'WICZ', 'WITZ'):
+                    add('TS', 'FX')
+                    step = 4
+        elif letter == 'X':
+            # French, e.g. 'breaux'
+            if not (current == last and (at(current - 3, 'IAU', 'EAU') or at(current - 2, 'AU', 'OU'))):
+                add('KS')
+            step = 2 if at(current + 1, 'C', 'X') else 1
+        elif letter == 'Z':
+            if char(current + 1) == 'H':
+                add('J')
+                step = 2
+            else:
+                if at(current + 1, 'ZO', 'ZI', 'ZA') or (slavo_germanic and current > 0 and char(current - 1) != 'T'):
+                    add('S', 'TS')
+                else:
+                    add('S')
+                step = 2 if char(current + 1) == 'Z' else 1
+        current += step
+
+    return ''.join(primary)[:4], ''.join(alternate)[:4]
+
+
+@lru_cache(maxsize=None)
+def word_codes(word):
+    """The phonetic codes of a folded word: its Soundex code and both Double Metaphone codes"""
+    return frozenset(code for code in (soundex(word), *double_metaphone(word)) if code)
+
+
+@lru_cache(maxsize=None)
+def word_trigrams(word):
+    """The trigrams of a folded word padded as '  word ', so that its start weighs more than its end"""
+    padded = f"  {word} "
+    return frozenset(padded[start:start + 3] for start in range(len(padded) - 2))
+
+
+class NameMatch(namedtuple('NameMatch', ['person_id', 'name', 'score', 'position'])):
+    """One result of NameIndex.search: the person, their name as written, a score from 0 to 1 and their position in the list"""
+    __slots__ = ()
+
+    def describe(self):
+        return f"{self.person_id} {self.name} ({self.score:.2f})"
+
+
+class NameIndex:
+    """
+    Fuzzy and phonetic lookups of people by name. Names are split into given names and surname
+    (split_name) and folded (fold_name); each distinct word is indexed once by its trigrams and by its
+    Soundex and Double Metaphone codes, and each distinct name is kept as the word numbers of its two
+    parts with its people in CSR form, so the index grows with the number of different words and
+    names rather than of people. search() scores only the words that share enough trigrams or a code
+    with a query word, and the names that use them. Build it once (or use GedcomIndex.names())
+    """
+    GIVEN, SURNAME = 0, 1
+    # Words sharing less than this part of a query word's trigrams, and none of its codes, are not scored,
+    # and the names of words less similar than WORD_FLOOR to a query word are not scored for it
+    MIN_SHARED = 0.3
+    WORD_FLOOR = 0.5
+
+    def __init__(self, individual_list=()):
+        self.individuals = list(individual_list)
+        self.words = []             # word number -> folded word
+        self.word_numbers = {}      # folded word -> word number
+        self.spellings = {}         # word as written -> word numbers of its folded form
+        self.trigram_index = {}     # trigram -> word numbers, ascending
+        self.code_index = {}        # phonetic code -> word numbers, ascending
+        self.names = []             # name number -> (given word numbers, surname word numbers)
+        self.word_names = ({}, {})  # GIVEN and SURNAME: word number -> numbers of the names using it there
+        written = {}                # name as written -> name number
+        numbers = {}                # (given word numbers, surname word numbers) -> name number
+        name_of = array('i')        # position -> name number
+        for ind in self.individuals:
+            name = ind.get('Name')
+            number = written.get(name)
+            if number is None:
+                given, surname = split_name(name)
+                parts = (self.folded_words(given), self.folded_words(surname))
+                number = numbers.get(parts)
+                if number is None:
+                    number = numbers[parts] = len(self.names)
+                    self.names.append(parts)
+                    for word_names, words in zip(self.word_names, parts):
+                        for word in dict.fromkeys(words):
+                            word_names.setdefault(word, array('i')).append(number)
+                written[name] = number
+            name_of.append(number)
+
+        # The people with name n are name_positions[name_offsets[n]:name_offsets[n + 1]], in list order
+        counts = array('i', [0]) * (len(self.names) + 1)
+        for number in name_of:
+            counts[number + 1] += 1
+        self.name_offsets = array('i', accumulate(counts))
+        self.name_positions = array('i', [0]) * len(name_of)
+        fill = self.name_offsets[:-1]
+        for position, number in enumerate(name_of):
+            self.name_positions[fill[number]] = position
+            fill[number] += 1
+
+    def word_number(self, word):
+        """The number of a folded word, indexing it the first time it is seen"""
+        number = self.word_numbers.get(word)
+        if number is None:
+            number = self.word_numbers[word] = len(self.words)
+            self.words.append(word)
+            for trigram in word_trigrams(word):
+                self.trigram_index.setdefault(trigram, array('i')).append(number)
+            for code in word_codes(word):
+                self.code_index.setdefault(code, array('i')).append(number)
+        return number
+
+    def folded_words(self, text):
+        """The word numbers of the folded words of text, folding each word as written only once"""
+        numbers = ()
+        for spelling in text.split():
+            found = self.spellings.get(spelling)
+            if found is None:
+                found = self.spellings[spelling] = tuple(map(self.word_number, fold_name(spelling).split()))
+            numbers += found
+        return numbers
+
+    def positions(self, number):
+        """The list positions of the people with name number"""
+        return self.name_positions[self.name_offsets[number]:self.name_offsets[number + 1]]
+
+    def similar_words(self, word):
+        """
+        {word number: similarity} of the indexed words like a folded query word. The similarity runs
+        from 0 to 1: half the share of the query word's trigrams found in the word, 0.3 the share of
+        the word's trigrams found in the query word and 0.2 when the two share a phonetic code
+        """
+        trigrams = word_trigrams(word)
+        codes = word_codes(word)
+        shared = Counter()
+        for trigram in trigrams:
+            shared.update(self.trigram_index.get(trigram, ()))
+        needed = max(1, self.MIN_SHARED * len(trigrams))
+        found = {number for number, count in shared.items() if count >= needed}
+        for code in codes:
+            found.update(self.code_index.get(code, ()))
+        similar = {}
+        for number in found:
+            other = self.words[number]
+            count = shared.get(number, 0)
+            similar[number] = (0.5 * count / len(trigrams) + 0.3 * count / len(word_trigrams(other))
+                               + 0.2 * (not codes.isdisjoint(word_codes(other))))
+        return similar
+
+    def part_scores(self, words, side=None):
+        """
+        {name number: score} for folded query words against the given names (GIVEN), the surnames
+        (SURNAME) or whole names (None): 0.8 the average over the query words of the best similarity
+        to a word of the name (at least WORD_FLOOR), and 0.2 for using as many words as the name, less for fewer
+        """
+        sides = (self.GIVEN, self.SURNAME) if side is None else (side,)
+        totals = {}
+        for word in words:
+            best = {}
+            similar = [(similarity, number) for number, similarity in self.similar_words(word).items()
+                       if similarity >= self.WORD_FLOOR]
+            # Updating from the least to the most similar word leaves each name its best one
+            for similarity, number in sorted(similar):
+                for part in sides:
+                    best.update(dict.fromkeys(self.word_names[part].get(number, ()), similarity))
+            if not totals:
+                totals = best
+                continue
+            for number, similarity in best.items():
+                totals[number] = totals.get(number, 0.0) + similarity
+        names = self.names
+        count = len(words)
+        if side is None:
+            return {number: 0.8 * total / count + 0.2 * min(1.0, count / (len(names[number][0]) + len(names[number][1])))
+                    for number, total in totals.items()}
+        return {number: 0.8 * total / count + 0.2 * min(1.0, count / len(names[number][side]))
+                for number, total in totals.items()}
+
+    def search(self, query, limit=10, min_score=0.4):
+        """
+        [NameMatch] of the people whose names are most like query, best first, at most limit of them
+        (all when limit is None) and none below min_score; people with the same name come together
+        in list order. A query written the GEDCOM way ('Rogerio /Nunes/' or '/Nunes/') matches its
+        given names and surname each against the same part of the names, any other query whole names
+        """
+        given, surname = (fold_name(part).split() for part in split_name(query))
+        if '/' in query:
+            parts = [(words, side) for side, words in ((self.GIVEN, given), (self.SURNAME, surname)) if words]
+        else:
+            parts = [(given, None)] if given else []
+        if not parts:
+            return []
+
+        totals = {}
+        for words, side in parts:
+            for number, score in self.part_scores(words, side).items():
+                totals[number] = totals.get(number, 0.0) + score
+        scored = [(-total / len(parts), self.name_positions[self.name_offsets[number]], number)
+                  for number, total in totals.items() if total / len(parts) >= min_score]
+        ranked = sorted(scored) if limit is None else nsmallest(limit, scored)
+
+        matches = []
+        for negated, first, number in ranked:
+            positions = self.positions(number)
+            if limit is not None:
+                positions = positions[:limit - len(matches)]
+            for position in positions:
+                ind = self.individuals[position]
+                matches.append(NameMatch(ind.get('ID'), ind.get('Name'), round(-negated, 4), position))
+        return matches
+
+
+def parse_line(line):
+
+    parts = line.strip().split(' ', 2)
+    level = parts[0]
+    tag = parts[1]
+    valid = 'Y' if tag in SUPPORTED_TAGS else 'N'
+    arguments = parts[2] if len(parts) > 2 else ''
+
+    return level, tag, valid, arguments
+
+
+def as_of_date(value=None):
+    """
+    The day a run is computed for, as a datetime.date: today when value is None, else the day of
+    a date, datetime or GedcomDate, or of a 'YYYY-MM-DD' or 'D MMM YYYY' string
+    """
+    if value is None:
+        return date.today()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, GedcomDate):
+        return date.fromordinal(value.ordinal)
+    if isinstance(value, str):
+        try:
+            return date.fromisoformat(value.strip())
+        except ValueError:
+            return date.fromordinal(parse_gedcom_date(value.strip()).ordinal)
+    raise TypeError(f"as-of date must be a date or a string, not {type(value).__name__}")
+
+
+def age_on(born, day):
+    """Whole years from born to day, both GedcomDates or datetime.dates"""
+    return day.year - born.year - ((day.month, day.day) < (born.month, born.day))
+
+
+def age_and_alive(ind, day):
+    """
+    (age, alive) of ind on day (a GedcomDate or datetime.date): whether they were alive then (see
+    alive_on), and their age then, or at death for the dead. The age is -1 without a readable
+    birthday, when born after day or when dead on an unreadable date
+    """
+    born = parse_known_date(ind.get('Birthday', 'NA'))
+    ordinal = day.toordinal()
+    if born is not None and born.ordinal > ordinal:
+        return -1, False
+    if ind.get('Alive') != DEAD:
+        return (age_on(born, day) if born is not None else -1), True
+    died = parse_known_date(ind.get('Death', 'NA'))
+    if died is not None and died.ordinal > ordinal:
+        return (age_on(born, day) if born is not None else -1), True
+    return (age_on(born, died) if born is not None and died is not None else -1), False
+
+
+def alive_on(ind, day):
+    """
+    Whether ind was born on or before day and had not died by then. A date that cannot be read
+    leaves the record's Alive flag as it is: without a readable birthday the living are alive and
+    the dead dead, and the dead with an unreadable death date died by any day
+    """
+    born = parse_known_date(ind.get('Birthday', 'NA'))
+    if born is not None and born.ordinal > day.toordinal():
+        return False
+    if ind.get('Alive') != DEAD:
+        return True
+    died = parse_known_date(ind.get('Death', 'NA'))
+    return died is not None and died.ordinal > day.toordinal()
+
+
+def is_bday_in_past(bday_str, as_of=None):
+    birthday = parse_gedcom_date(bday_str)
+    
+    # A birthday of today is already in the past once the day has started
+    if birthday.ordinal <= as_of_date(as_of).toordinal():
+        return True
+    else:
+        return False
+
+def start_gedcom_record(xref, tag):
+    """Start a new record for a level 0 line, returns (None, None) if it is not an INDI/FAM record"""
+    if tag == b'INDI':
+        return 'INDI', {'ID': (xref or b'').decode()}
+    if tag == b'FAM':
+        return 'FAM', {'ID': (xref or b'').decode()}
+    return None, None
+
+
+def iter_gedcom_buffer_records(buffer, start=0, end=None):
+    """
+    Yield ('INDI', record) or ('FAM', record) for the records in buffer[start:end]
+    buffer holds the raw bytes of a GEDCOM file and start must be the beginning of a line.
+    Only the values that are kept are decoded
+    """
+    if end is None:
+        end = len(buffer)
+
+    record_type = None
+    record = None
+
+    if start == 0:
+        first = GEDCOM_FIRST_LINE.match(buffer, 0, end)
+        if first is not None:
+            record_type, record = start_gedcom_record(first.group(1), first.group(2))
+        pos = 0
+    else:
+        # Let the tokenizer see the newline that ends the previous line
+        pos = start - 1
+
+    for match in GEDCOM_TOKEN.finditer(buffer, pos, end):
+        xref, level0_tag, tag, value, event, date = match.groups()
+
+        if level0_tag is not None:
+            # Any level 0 line ends the record that is currently open
+            if record is not None:
+                yield record_type, record
+            record_type, record = start_gedcom_record(xref, level0_tag)
+        elif record is None:
+            continue
+        elif record_type == 'INDI':
+            if tag is not None:
+                key = INDIVIDUAL_TAGS.get(tag)
+                if key is not None:
+                    record[key] = value.decode().rstrip()
+            else:
+                key = INDIVIDUAL_TAGS.get(event)
+                if key is not None:
+                    record[key] = date.decode().rstrip()
+        elif tag is not None:
+            if tag == b'CHIL':
+                record.setdefault('CHIL', []).append(value.strip().replace(b'@', b'').decode())
+            else:
+                key = FAMILY_TAGS.get(tag)
+                if key is not None:
+                    record[key] = value.strip().replace(b'@', b'').decode()
+        else:
+            key = FAMILY_TAGS.get(event)
+            if key is not None:
+                record[key] = date.decode().rstrip()
+
+    if record is not None:
+        yield record_type, record
+
+
+@contextmanager
+def open_gedcom_buffer(filename):
+    """Map a GEDCOM file read only. An empty file cannot be mapped and gives b''"""
+    with open(filename, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield buffer
+
+
+def iter_gedcom_records(filename):
+    """
+    Stream the INDI and FAM records of a GEDCOM file
+    Yields ('INDI', record) or ('FAM', record) as soon as the next level 0 line
+    closes the record, so callers can process a file without holding it all in memory
+    """
+    with open_gedcom_buffer(filename) as buffer:
+        yield from iter_gedcom_buffer_records(buffer)
+
+
+def collectRecords(records):
+    """Split a stream of (record type, record) pairs into the individual and family lists"""
+    individuals = []
+    families = []
+
+    for record_type, record in records:
+        if record_type == 'INDI':
+            individuals.append(record)
+        else:
+            families.append(record)
+
+    return individuals, families
+
+
+def readGedcomFile(filename):
+    return collectRecords(iter_gedcom_records(filename))
+
+
+def split_at_records(buffer, chunks):
+    """Split buffer into at most `chunks` (start, end) byte ranges that each begin at a level 0 line"""
+    size = len(buffer)
+    starts = [0]
+
+    for i in range(1, chunks):
+        pos = buffer.find(b'\n0 ', size * i // chunks)
+        if pos < 0:
+            break
+        if pos + 1 > starts[-1]:
+            starts.append(pos + 1)
+
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def readGedcomRange(filename, start, end):
+    """Parse the records in one byte range of a GEDCOM file (runs inside a worker process)"""
+    with open(filename, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return collectRecords(iter_gedcom_buffer_records(buffer, start, end))
+
+
+def readGedcomFileParallel(filename, workers=None, min_chunk_bytes=PARALLEL_MIN_CHUNK_BYTES):
+    """
+    Parse a GEDCOM file with a pool of worker processes
+    The file is split into byte ranges at level 0 lines, each range is parsed in its own
+    process and the results are merged back in file order, so the output is the same as readGedcomFile
+    """
+    workers = workers or os.cpu_count() or 1
+    size = os.path.getsize(filename)
+    chunks = min(workers, size // max(min_chunk_bytes, 1))
+
+    if chunks < 2:
+        return readGedcomFile(filename)
+
+    with open(filename, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            ranges = split_at_records(buffer, chunks)
+
+    individuals = []
+    families = []
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as executor:
+        parts = executor.map(readGedcomRange,
+                             [filename] * len(ranges),
+                             [start for start, end in ranges],
+                             [end for start, end in ranges])
+        for chunk_individuals, chunk_families in parts:
+            individuals.extend(chunk_individuals)
+            families.extend(chunk_families)
+
+    return individuals, families
+
+    
+def personName(ind):
+    """Name of a parsed or organized individual record, 'NA' if there is none"""
+    if ind is None:
+        return 'NA'
+    if isinstance(ind, Individual):
+        return ind.name
+    return ind.get('NAME', 'NA')
+
+
+def organizeFamily(fam, index):
+    """Build the Family row for one parsed family record, looking the spouse names up in index"""
+    fam_id = fam.get('ID', 'NA')
+    married=fam.get('MARR', 'NA')
+    divorced=fam.get('DIV', 'NA')
+    husb_id=fam.get('HUSB', 'NA')
+    wife_id=fam.get('WIFE', 'NA')
+    children=fam.get('CHIL', [])
+    #find spouse names 
+    husb_name = 'NA'
+    wife_name = 'NA'
+
+    if husb_id != 'NA':
+        husb_name = personName(index.person(husb_id))
+
+    if wife_id != 'NA':
+        wife_name = personName(index.person(wife_id))
+
+    return Family(fam_id, married, divorced, husb_id, husb_name, wife_id, wife_name, children)
+
+
+def organizeFamilyData(family_list, individual_list, index=None):
+    #Reorganize family data to match order and add spouse names for families:
+    if index is None:
+        index = GedcomIndex(individual_list)
+
+    for position, fam in enumerate(family_list):
+        #replace the parsed record with a family row in table order
+        family_list[position] = organizeFamily(fam, index)
+    
+    return family_list
+
+
+def calculateAge(birthday_str, death_str, as_of=None):
+    """Age at death, or on the day as_of (default today) for the living; 0 when a date cannot be read"""
+    try:
+        birthday = parse_gedcom_date(birthday_str)
+        if death_str == 'NA':
+           death = as_of_date(as_of)
+        else:
+            death = parse_gedcom_date(death_str)
+    except (ValueError, TypeError):
+        return 0
+    
+    return age_on(birthday, death)
+    
+    
+
+
+def findFamilyData(individual_id, family_list_data, index=None):
+    spouse = 'NA'
+    children = []
+
+    if index is None:
+        index = GedcomIndex(family_list=family_list_data)
+    
+    for fam in index.families_as_spouse(individual_id):
+        if fam.get('Husband ID') == individual_id or fam.get('Wife ID') == individual_id:
+            children = 'NA' if 'Children' not in fam else fam.get('Children', [])
+
+            if fam.get('Husband ID') == individual_id:
+                spouse = fam.get('Wife ID', 'NA')
+            elif fam.get('Wife ID') == individual_id:
+                spouse = fam.get('Husband ID', 'NA')
+
+            break
+
+    return spouse, children
+
+def organizeIndividual(ind, family_list, index=None, as_of=None):
+    """
+    Build the Individual row for one parsed record with their age on the day as_of (default today),
+    or return the record unchanged while its birthday is after that day
+    """
+    as_of = as_of_date(as_of)
+    ind_id = ind.get('ID', 'NA')
+    name = ind.get('NAME', 'NA')
+    gender = ind.get('SEX', 'NA')
+    bday = ind.get('BIRT', 'NA')
+    bday_copy = bday
+    if not is_bday_in_past(bday_copy, as_of):
+        return ind
+
+    death = ind.get('DEAT', 'NA')
+    death_copy = death
+    age = calculateAge(bday_copy, death_copy, as_of)
+    alive = DEAD if 'DEAT' in ind else ALIVE
+
+    spouse, children = findFamilyData(ind_id, family_list, index)
+
+    return Individual(ind_id, name, gender, bday, age, alive, death, children, spouse)
+
+def organizeIndividualData(family_list, individual_list, index=None, as_of=None):
+    #sort individuals by ID 
+
+    individual_list.sort(key=lambda x: x.get('ID', ''))
+    if index is None:
+        index = GedcomIndex(family_list=family_list)
+    # Every age is taken on the same day, even when the run crosses midnight
+    as_of = as_of_date(as_of)
+
+    #reorganize individual data to match order of table
+    for position, ind in enumerate(individual_list):
+        individual_list[position] = organizeIndividual(ind, family_list, index, as_of)
+    
+    return individual_list
+
+def refreshAges(individual_list, family_list, index, as_of=None):
+    """
+    Recompute every age for the day as_of (default today) and organize records whose birthday
+    has passed by then. Records born after that day are not turned back into parsed records
+    """
+    as_of = as_of_date(as_of)
+    for position, ind in enumerate(individual_list):
+        if isinstance(ind, Individual):
+            ind.age = calculateAge(ind.birthday, ind.death, as_of)
+            continue
+
+        organized = organizeIndividual(ind, family_list, index, as_of)
+        if organized is not ind:
+            individual_list[position] = organized
+            if index.individuals.get(organized.id) is ind:
+                index.individuals[organized.id] = organized
+                index.clear_caches()
+
+    return individual_list
+
+def file_digest(filename):
+    """sha256 of the file contents, read in blocks so large files are never held in memory"""
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        for block in iter(lambda: file.read(DIGEST_BLOCK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def file_stat(filename):
+    """(size, mtime) of filename, enough to tell it was rewritten"""
+    stat = os.stat(filename)
+    return stat.st_size, stat.st_mtime_ns
+
+def snapshot_path(filename):
+    return filename + SNAPSHOT_SUFFIX
+
+def buildGedcomTree(filename, as_of=None):
+    """Parse and organize filename with ages on the day as_of (default today), returning (individuals, families, index)"""
+    individuals, families = readGedcomFile(filename)
+    families = organizeFamilyData(families, individuals)
+    individuals = organizeIndividualData(families, individuals, as_of=as_of)
+    attachSource(GedcomSource(filename), individuals, families)
+    return individuals, families, GedcomIndex(individuals, families, as_of)
+
+def record_digests(parts):
+    """64 bit digests of record bytes, crc32 and adler32 side by side"""
+    return list(map(or_, map(lshift, map(zlib.crc32, parts), repeat(32)), map(zlib.adler32, parts)))
+
+def scan_gedcom_records(buffer):
+    """
+    Return (keys, starts, ends, digests) for the INDI and FAM records in buffer, as parallel lists in file order
+    A key is b'<xref> <tag>' of the level 0 line, the digest covers the record after its '0 '
+    up to the newline in front of the next record. The buffer is split on level 0 lines in
+    windows and the per record work runs in C (bytes.split, findall, map)
+    """
+    keys, starts, ends, digests = [], [], [], []
+    for window_start, window_end in split_at_records(buffer, max(1, len(buffer) // SCAN_WINDOW_BYTES)):
+        if window_start == 0:
+            first = GEDCOM_FIRST_LINE.match(buffer, 0, window_end)
+            heads = [(first.group(1) or b'', first.group(2)) if first is not None else (b'', b'')]
+            chunk_start = 0
+        else:
+            # The chunk starts with the newline in front of the window, its first part is empty
+            heads = [(b'', b'')]
+            chunk_start = window_start - 1
+        heads += GEDCOM_RECORD_START.findall(buffer, chunk_start, window_end)
+        # Like every other record the last one of a window ends before the newline in front of the next
+        chunk_end = window_end - 1 if window_end < len(buffer) else window_end
+        parts = buffer[chunk_start:chunk_end].split(b'\n0 ')
+        if len(parts) != len(heads):
+            # A '0 ' line that does not start a record for the tokenizer
+            return scan_gedcom_records_by_line(buffer)
+
+        # Part n starts 3 bytes ('\n0 ') after part n - 1 ends, its record 2 bytes earlier at the '0'
+        part_starts = list(accumulate(chain([chunk_start - 2], map(add, map(len, parts), repeat(3)))))
+        part_starts[0] = chunk_start
+        part_starts[-1] = window_end
+        kept = [number for number, (xref, tag) in enumerate(heads) if tag == b'INDI' or tag == b'FAM']
+
+        keys += map(b' '.join, map(heads.__getitem__, kept))
+        starts += map(part_starts.__getitem__, kept)
+        ends += map(part_starts.__getitem__, [number + 1 for number in kept])
+        digests += record_digests(list(map(parts.__getitem__, kept)))
+    return keys, starts, ends, digests
+
+def scan_gedcom_records_by_line(buffer):
+    """scan_gedcom_records for buffers with level 0 lines the tokenizer does not treat as records"""
+    heads = []
+    first = GEDCOM_FIRST_LINE.match(buffer)
+    if first is not None:
+        heads.append((first.group(1) or b'', first.group(2), 0))
+    for match in GEDCOM_RECORD_START.finditer(buffer):
+        heads.append((match.group(1) or b'', match.group(2), match.start() + 1))
+
+    keys, starts, ends, contents = [], [], [], []
+    next_starts = [start for xref, tag, start in heads[1:]] + [len(buffer)]
+    for (xref, tag, start), end in zip(heads, next_starts):
+        if tag == b'INDI' or tag == b'FAM':
+            keys.append(xref + b' ' + tag)
+            starts.append(start)
+            ends.append(end)
+            contents.append(buffer[start + 2 if start else 0:end - 1 if end < len(buffer) else end])
+    return keys, starts, ends, record_digests(contents)
+
+def split_record_key(key):
+    """(record ID, tag) for a key from scan_gedcom_records"""
+    xref, _, tag = key.rpartition(b' ')
+    return xref.decode(), tag
+
+def checkedDate(value):
+    """value if it is 'NA' or a date parse_gedcom_date accepts, otherwise the ValueError it raises"""
+    if value != 'NA':
+        parse_gedcom_date(value)
+    return value
+
+
+def parsedIndividual(ind):
+    """The parsed record (as readGedcomFile returns it) an organized individual row is built from"""
+    if not isinstance(ind, Individual):
+        return dict(ind)
+    raw = {'ID': ind.id}
+    for key, value in (('NAME', ind.name), ('SEX', ind.gender), ('BIRT', ind.birthday), ('DEAT', ind.death)):
+        if value != 'NA':
+            raw[key] = value
+    return raw
+
+
+def sorted_id_position(individual_list, person_id, after=False):
+    """
+    Where person_id goes in individual_list, which is sorted by ID: before the records with that ID,
+    or after them. bisect_left / bisect_right on the IDs, whose key= needs Python 3.10
+    """
+    low, high = 0, len(individual_list)
+    while low < high:
+        middle = (low + high) // 2
+        middle_id = individual_list[middle].get('ID', '')
+        if middle_id < person_id or (after and middle_id == person_id):
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def insert_sorted_individual(individual_list, ind):
+    """Insert ind into individual_list, which is sorted by ID, after the records with the same ID"""
+    individual_list.insert(sorted_id_position(individual_list, ind.get('ID', ''), after=True), ind)
+
+
+def remove_sorted_individual(individual_list, ind):
+    """Remove ind from individual_list, which is sorted by ID"""
+    position = sorted_id_position(individual_list, ind.get('ID', ''))
+    while individual_list[position] is not ind:
+        position += 1
+    del individual_list[position]
+
+class GedcomTree:
+    """
+    The organized individuals, families and index of a GEDCOM file together with the key and
+    digest of every INDI/FAM record they came from, so reload() only has to tokenize and
+    organize the records that were added or changed since the last read. Ages are taken on the
+    day as_of, which follows today when None (index.as_of holds it)
+    """
+
+    def __init__(self, filename, as_of=None):
+        self.filename = filename
+        self.individuals = []
+        self.families = []
+        self.index = GedcomIndex(as_of=as_of)
+        self.source = GedcomSource(filename)
+        self.keys = []                  # record keys in file order, None when an xref is repeated
+        self.digests = array('Q')       # digest of each record, same order as keys
+        self.day = self.index.today().toordinal()  # day the ages were computed
+        self.edited = False             # changed through the editing methods since it was read
+        self.dirty_people = set()       # IDs touched by edits since the last validate() / revalidate()
+        self.dirty_families = set()
+        self.reparented = set()         # people whose parents changed in those edits
+        self.found = None               # {rule: {family ID (person ID for US11): ValidationErrors}} once validate() ran
+
+    def build(self):
+        """Parse and organize the whole file"""
+        with open_gedcom_buffer(self.filename) as buffer:
+            self.build_from(buffer, scan_gedcom_records(buffer))
+        return self
+
+    def build_from(self, buffer, records):
+        individuals, families = collectRecords(iter_gedcom_buffer_records(buffer))
+        as_of = self.index.as_of
+        day = as_of_date(as_of)
+        # Fill the existing lists so callers holding them see a full re-parse as well
+        self.families[:] = organizeFamilyData(families, individuals)
+        self.individuals[:] = organizeIndividualData(self.families, individuals, as_of=day)
+        self.index = GedcomIndex(self.individuals, self.families, as_of)
+        self.source.forget()
+        self.source.remember(records)
+        attachSource(self.source, self.individuals, self.families)
+        keys, starts, ends, digests = records
+        if len(set(keys)) == len(keys):
+            self.keys = keys
+            self.digests = array('Q', digests)
+        else:
+            # The index keeps only the first record of a repeated ID, so such files are always parsed in full
+            self.keys = None
+            self.digests = array('Q')
+        self.day = day.toordinal()
+        self.edited = False
+        self.dirty_people.clear()
+        self.dirty_families.clear()
+        self.reparented.clear()
+        self.found = None
+
+    def reload(self):
+        """
+        Re-read the file and patch the tree in place with the records that were added,
+        changed or removed since the last read. Returns (records re-read, records removed)
+        """
+        with open_gedcom_buffer(self.filename) as buffer:
+            records = scan_gedcom_records(buffer)
+            keys, starts, ends, digests = records
+            if self.keys is None:
+                self.build_from(buffer, records)
+                return len(keys), 0
+
+            if keys == self.keys:
+                changed = [number for number, (digest, old_digest) in enumerate(zip(digests, self.digests))
+                           if digest != old_digest]
+                removed = []
+            else:
+                previous = dict(zip(self.keys, self.digests))
+                changed = []
+                kept = []
+                for number, key in enumerate(keys):
+                    old_digest = previous.pop(key, None)
+                    if old_digest is not None:
+                        kept.append(key)
+                    if old_digest != digests[number]:
+                        changed.append(number)
+                removed = list(previous)
+
+                moved = kept != [key for key in self.keys if key not in previous]
+                if moved or len(set(keys)) != len(keys):
+                    # Records that moved change which family comes first for a person, parse in full
+                    self.build_from(buffer, records)
+                    return len(keys), 0
+
+            new_records = []
+            for number in changed:
+                new_records.extend(iter_gedcom_buffer_records(buffer, starts[number], ends[number]))
+
+        self.patch(keys, [keys[number] for number in changed] + removed, new_records)
+        self.source.remember(records)
+        if changed or removed:
+            self.found = None
+        self.keys = keys
+        self.digests = array('Q', digests)
+        self.refresh()
+        return len(changed), len(removed)
+
+    def patch(self, keys, stale_keys, new_records):
+        """Swap the records under stale_keys for new_records, keys is the new file order"""
+        index = self.index
+        affected = set()  # people whose spouse and children columns have to be looked up again
+        renamed = set()   # people whose name may have changed in the family rows
+        families_changed = False
+
+        # Take the old version of every changed or removed record out of the tree
+        for key in stale_keys:
+            record_id, tag = split_record_key(key)
+            if tag == b'INDI':
+                ind = index.person(record_id)
+                if ind is not None:
+                    index.remove_individual(ind)
+                    remove_sorted_individual(self.individuals, ind)
+                    renamed.add(record_id)
+            else:
+                fam = index.family(record_id)
+                if fam is not None:
+                    index.remove_family(fam)
+                    affected.update(index.spouse_ids(fam))
+                    affected.update(fam.children)
+                    families_changed = True
+
+        # New individuals go into the index as parsed records first so family rows can read their names
+        new_individuals = [record for record_type, record in new_records if record_type == 'INDI']
+        for ind in new_individuals:
+            index.add_individual(ind)
+            renamed.add(ind.get('ID'))
+
+        for record_type, record in new_records:
+            if record_type == 'FAM':
+                fam = organizeFamily(record, index)
+                fam.source = self.source
+                index.add_family(fam)
+                affected.update(index.spouse_ids(fam))
+                affected.update(fam.children)
+                families_changed = True
+
+        if families_changed:
+            self.families[:] = [index.families[split_record_key(key)[0]] for key in keys if key.endswith(b' FAM')]
+            # Spouse and child family lists follow the file order, like a full build
+            position = {id(fam): number for number, fam in enumerate(self.families)}
+            for person_id in affected | renamed:
+                for families in (index.spouse_families.get(person_id), index.child_families.get(person_id)):
+                    if families and len(families) > 1:
+                        families.sort(key=lambda fam: position[id(fam)])
+
+        for ind in new_individuals:
+            organized = organizeIndividual(ind, self.families, index, date.fromordinal(self.day))
+            if isinstance(organized, Individual):
+                organized.source = self.source
+            if index.individuals.get(organized.get('ID')) is ind:
+                index.individuals[organized.get('ID')] = organized
+            insert_sorted_individual(self.individuals, organized)
+
+        for person_id in renamed:
+            for fam in index.families_as_spouse(person_id):
+                fam.husband_name = personName(index.person(fam.husband_id)) if fam.husband_id != 'NA' else 'NA'
+                fam.wife_name = personName(index.person(fam.wife_id)) if fam.wife_id != 'NA' else 'NA'
+
+        for person_id in affected - renamed:
+            ind = index.person(person_id)
+            if isinstance(ind, Individual):
+                spouse, children = findFamilyData(person_id, self.families, index)
+                ind.spouse = sys.intern(spouse)
+                ind.children = children
+
+    def refresh(self, as_of=None):
+        """
+        Move the tree to the day as_of when given (None keeps its as-of day, or today when it follows
+        today) and recompute every age in one pass when they were computed for another day
+        """
+        if as_of is not None:
+            self.index.as_of = as_of
+        day = self.index.today()
+        if self.day != day.toordinal():
+            refreshAges(self.individuals, self.families, self.index, day)
+            # People organized just now because their birthday has passed
+            attachSource(self.source, self.individuals, ())
+            self.day = day.toordinal()
+
+    # Editing. Edits change the tree in memory only: the file is not written, reload() parses
+    # the file again in full, and an edited tree is not saved as the file's snapshot.
+    # Each edit records the people and families it touched for revalidate()
+
+    def add_person(self, person_id, birthday, name='NA', gender='NA', death='NA'):
+        """Add a person; like every individual read from a file they need a birthday"""
+        if self.index.person(person_id) is not None:
+            raise ValueError(f"individual {person_id} already exists")
+        if birthday == 'NA':
+            raise ValueError(f"individual {person_id} needs a birthday")
+        raw = {'ID': person_id}
+        for key, value in (('NAME', name), ('SEX', gender), ('BIRT', checkedDate(birthday)), ('DEAT', checkedDate(death))):
+            if value != 'NA':
+                raw[key] = value
+        self.place_person(raw)
+        self.mark_dirty(people=[person_id])
+
+    def remove_person(self, person_id):
+        """Take the person out; families that name them keep the ID, as when an INDI record is deleted from the file"""
+        ind = self.person_record(person_id)
+        self.index.remove_individual(ind)
+        remove_sorted_individual(self.individuals, ind)
+        self.rename_in_families(person_id)
+        self.mark_dirty(people=[person_id])
+
+    def add_family(self, family_id, husband_id='NA', wife_id='NA', married='NA', divorced='NA', children=()):
+        """Add a family after the existing ones, where a FAM record appended to the file would go"""
+        if self.index.family(family_id) is not None:
+            raise ValueError(f"family {family_id} already exists")
+        raw = {'ID': family_id}
+        for key, value in (('HUSB', husband_id), ('WIFE', wife_id), ('MARR', checkedDate(married)), ('DIV', checkedDate(divorced))):
+            if value != 'NA':
+                raw[key] = value
+        if children:
+            raw['CHIL'] = list(children)
+
+        fam = organizeFamily(raw, self.index)
+        self.families.append(fam)
+        self.index.add_family(fam)
+        members = self.index.spouse_ids(fam) + fam.children
+        self.refresh_family_columns(members)
+        self.mark_dirty(people=members, families=[family_id], reparented=fam.children)
+
+    def remove_family(self, family_id):
+        fam = self.family_record(family_id)
+        self.index.remove_family(fam)
+        self.families.remove(fam)
+        members = self.index.spouse_ids(fam) + fam.children
+        self.refresh_family_columns(members)
+        self.mark_dirty(people=members, families=[family_id], reparented=fam.children)
+
+    def set_date(self, record_id, tag, value):
+        """Set BIRT or DEAT of a person, MARR or DIV of a family, to a 'D MMM YYYY' date or to 'NA' / None to clear it"""
+        value = checkedDate('NA' if value is None else value)
+        if tag == 'BIRT' and value == 'NA':
+            raise ValueError(f"the birthday of {record_id} cannot be cleared")
+        if tag in ('BIRT', 'DEAT'):
+            old = self.person_record(record_id)
+            raw = parsedIndividual(old)
+            if value == 'NA':
+                raw.pop(tag, None)
+            else:
+                raw[tag] = value
+            self.place_person(raw, old)
+            self.mark_dirty(people=[record_id])
+        elif tag in ('MARR', 'DIV'):
+            fam = self.family_record(record_id)
+            fam['Married' if tag == 'MARR' else 'Divorced'] = sys.intern(value)
+            self.index.clear_caches()
+            self.mark_dirty(people=self.index.spouse_ids(fam), families=[record_id])
+        else:
+            raise ValueError(f"set_date sets BIRT, DEAT, MARR or DIV, not {tag}")
+
+    def link_child(self, family_id, child_id):
+        """Add child_id to the children of the family"""
+        fam = self.family_record(family_id)
+        if child_id in fam.children:
+            return
+        # The index shares this list with the family row
+        fam.children.append(sys.intern(child_id))
+        families = self.index.child_families.setdefault(child_id, [])
+        at = len(families)
+        if at:
+            # Keep the child's families in tree order, the first one is their family as a child
+            position = self.families.index(fam)
+            while at and self.families.index(families[at - 1]) > position:
+                at -= 1
+        families.insert(at, fam)
+        self.index.clear_caches()
+
+        members = self.index.spouse_ids(fam) + [child_id]
+        self.refresh_family_columns(members)
+        self.mark_dirty(people=members, families=[family_id], reparented=[child_id])
+
+    def person_record(self, person_id):
+        ind = self.index.person(person_id)
+        if ind is None:
+            raise KeyError(f"no individual {person_id}")
+        return ind
+
+    def family_record(self, family_id):
+        fam = self.index.family(family_id)
+        if fam is None:
+            raise KeyError(f"no family {family_id}")
+        return fam
+
+    def place_person(self, raw, old=None):
+        """Organize a parsed individual and put it in the tree, in place of old"""
+        organized = organizeIndividual(raw, self.families, self.index, date.fromordinal(self.day))
+        if old is not None:
+            if isinstance(organized, Individual):
+                organized.source = getattr(old, 'source', None)
+            self.index.remove_individual(old)
+            remove_sorted_individual(self.individuals, old)
+        self.index.add_individual(organized)
+        insert_sorted_individual(self.individuals, organized)
+        self.rename_in_families(raw['ID'])
+
+    def rename_in_families(self, person_id):
+        for fam in self.index.families_as_spouse(person_id):
+            fam.husband_name = personName(self.index.person(fam.husband_id)) if fam.husband_id != 'NA' else 'NA'
+            fam.wife_name = personName(self.index.person(fam.wife_id)) if fam.wife_id != 'NA' else 'NA'
+
+    def refresh_family_columns(self, person_ids):
+        """Look the spouse and children columns of these people up again"""
+        for person_id in person_ids:
+            ind = self.index.person(person_id)
+            if isinstance(ind, Individual):
+                spouse, children = findFamilyData(person_id, self.families, self.index)
+                ind.spouse = sys.intern(spouse)
+                ind.children = children
+
+    def mark_dirty(self, people=(), families=(), reparented=()):
+        """Record what an edit touched. reparented are people whose parents changed, which moves their descendants' ancestors"""
+        self.dirty_people.update(people)
+        self.dirty_families.update(families)
+        self.reparented.update(reparented)
+        self.edited = True
+        self.keys = None  # the tree no longer matches the file, so reload() parses it in full
+
+    # Validation that keeps its findings per family (per person for US11), so after edits only
+    # the rules whose inputs were touched run again
+
+    def validate(self):
+        """Run every family rule on the whole tree and keep the findings. Returns results()"""
+        self.found = {rule: {} for rule in FAMILY_RULES}
+        self.dirty_people.clear()
+        self.dirty_families.clear()
+        self.reparented.clear()
+        people = {}
+        with paused_gc():
+            for fam in self.families:
+                self.check_family(fam, people)
+            self.check_bigamy([person_id for person_id, families in self.index.spouse_families.items() if len(families) > 1]
+                              + [fam.husband_id for fam in self.families if fam.husband_id == fam.wife_id != 'NA'], people)
+        return self.results()
+
+    def revalidate(self):
+        """
+        Check again what the edits since the last validate() or revalidate() can have changed:
+        the family rules on the families of dirty people and on dirty families, US18 and US19 on the
+        couples descending from re-parented people, and US11 for everyone married in those families.
+        Returns {rule: errors} for the records checked; results() has the whole updated result
+        """
+        if self.found is None:
+            return self.validate()
+        index = self.index
+
+        family_ids = set(self.dirty_families)
+        for person_id in self.dirty_people:
+            family_ids.update(fam.get('ID') for fam in index.families_as_spouse(person_id))
+            family_ids.update(fam.get('ID') for fam in index.families_as_child(person_id))
+        for person_id in self.descendants(self.reparented):
+            family_ids.update(fam.get('ID') for fam in index.families_as_spouse(person_id))
+
+        spouses = set(self.dirty_people)
+        people = {}
+        checked = {rule: [] for rule in FAMILY_RULES}
+        for family_id in sorted(family_ids):
+            fam = index.family(family_id)
+            if fam is None:
+                for found in self.found.values():
+                    found.pop(family_id, None)
+                continue
+            spouses.update(index.spouse_ids(fam))
+            for rule, errors in self.check_family(fam, people).items():
+                checked[rule].extend(errors)
+
+        for person_id, errors in sorted(self.check_bigamy(spouses, people).items()):
+            checked['US11'].extend(errors)
+
+        self.dirty_people.clear()
+        self.dirty_families.clear()
+        self.reparented.clear()
+        return error_rows(checked)
+
+    def check_family(self, fam, people):
+        """Run the per family rules on fam and store what they find. Returns {rule: errors}"""
+        context = FamilyContext(fam, self.index, people)
+        family_id = fam.get('ID')
+        found = {}
+        for rule, check in FAMILY_RULES.items():
+            if rule == 'US11':
+                continue
+            errors = []
+            check(context, self.index, errors)
+            found[rule] = errors
+            if errors:
+                self.found[rule][family_id] = errors
+            else:
+                self.found[rule].pop(family_id, None)
+        return found
+
+    def check_bigamy(self, person_ids, people):
+        """Run US11 for these people over all their marriages and store what it finds. Returns {person ID: errors}"""
+        found = {}
+        for person_id in person_ids:
+            marriages = {}
+            for fam in self.index.families_as_spouse(person_id):
+                collect_marriages(FamilyContext(fam, self.index, people), self.index, marriages)
+            errors = find_bigamy({person_id: marriages.get(person_id, [])}, self.index)
+            found[person_id] = errors
+            if errors:
+                self.found['US11'][person_id] = errors
+            else:
+                self.found['US11'].pop(person_id, None)
+        return found
+
+    def descendants(self, person_ids):
+        """person_ids and everyone descending from them"""
+        seen = set(person_ids)
+        pending = list(seen)
+        while pending:
+            for fam in self.index.families_as_spouse(pending.pop()):
+                for child_id in fam.get('Children', []):
+                    if child_id not in seen:
+                        seen.add(child_id)
+                        pending.append(child_id)
+        return seen
+
+    def results(self):
+        """The kept findings as {rule: errors}, in the order validate_all reports them"""
+        if self.found is None:
+            return self.validate()
+        results = {rule: [] for rule in FAMILY_RULES}
+        bigamists = self.found['US11']
+        seen = set()
+        for fam in self.families:
+            family_id = fam.get('ID')
+            for rule, found in self.found.items():
+                if rule != 'US11' and family_id in found:
+                    results[rule].extend(found[family_id])
+            # validate_all meets a person's marriages in family order and reports them at the first one
+            if bigamists and parse_known_date(fam.married) is not None and (fam.divorced == 'NA' or parse_known_date(fam.divorced) is not None):
+                for person_id in (fam.husband_id, fam.wife_id):
+                    if person_id in bigamists and person_id not in seen:
+                        seen.add(person_id)
+                        results['US11'].extend(bigamists[person_id])
+        return error_rows(results)
+
+def snapshot_key():
+    """
+    The secret that signs this user's snapshots: SNAPSHOT_KEY_BYTES random bytes kept in
+    SNAPSHOT_KEY_FILE, readable by the user only and made on first use. A snapshot holds a
+    pickle, and unpickling can run any code, so only snapshots signed with it are unpickled.
+    Raises OSError when there is no usable key
+    """
+    try:
+        with open(SNAPSHOT_KEY_FILE, 'rb') as file:
+            key = file.read()
+    except FileNotFoundError:
+        key = os.urandom(SNAPSHOT_KEY_BYTES)
+        try:
+            descriptor = os.open(SNAPSHOT_KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            return snapshot_key()  # another run made it first
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(key)
+    if len(key) != SNAPSHOT_KEY_BYTES:
+        raise OSError(f"{SNAPSHOT_KEY_FILE}: not a snapshot key")
+    return key
 
-    return level, tag, valid, arguments
+class MacWriter:
+    """A file for pickle.dump that also feeds everything written to it to an hmac"""
 
+    def __init__(self, file, mac):
+        self.file = file
+        self.mac = mac
 
-def is_bday_in_past(bday_str):
-    bday_str = datetime.strptime(bday_str, "%d %b %Y")
-    today_date_str = datetime.today()
-    
-    if bday_str < today_date_str:
-        return True
-    else:
-        return False
+    def write(self, data):
+        self.mac.update(data)
+        return self.file.write(data)
 
-def readGedcomFile(filename):
-    
-    individuals = []
-    families = []
+def saveSnapshot(tree, digest=None):
+    """
+    Pickle tree next to its GEDCOM file, after a one line JSON header (parser version, source
+    digest, record counts) so the snapshot can be checked without loading the whole tree, and
+    a line with the hmac of the header and the pickle under this user's snapshot_key()
+    """
+    if tree.edited:
+        raise ValueError(f"{tree.filename}: the tree has been edited and no longer matches the file")
+    header = {
+        'version': PARSER_VERSION,
+        'digest': digest or file_digest(tree.filename),
+        'individuals': len(tree.individuals),
+        'families': len(tree.families),
+    }
+    header_line = json.dumps(header).encode() + b'\n'
+    mac = hmac.new(snapshot_key(), header_line, hashlib.sha256)
+    path = snapshot_path(tree.filename)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(header_line)
+        # The hmac is only known once the tree is written, its line is filled in after
+        file.write(b'0' * mac.digest_size * 2 + b'\n')
+        pickle.dump(tree, MacWriter(file, mac), pickle.HIGHEST_PROTOCOL)
+        file.seek(len(header_line))
+        file.write(mac.hexdigest().encode())
+    os.replace(temp_path, path)
+    return path
 
-    curr_indiv = None
-    curr_fam = None
-    birth = False
-    death = False
-    marriage = False
-    divorce = False
-    #start
-    with open(filename, 'r') as file:
-        for line in file:
-            level, tag, valid, arguments = parse_line(line)
-
-            if level == '0':
-                if 'INDI' in line:
-                    if curr_indiv:
-                        individuals.append(curr_indiv)
-                    curr_indiv = {'ID': tag.strip().replace('@', '')}
-                elif 'FAM' in line:
-                    if curr_fam:
-                        families.append(curr_fam)
-                    curr_fam = {'ID': tag.strip().replace('@', '')}
-            elif level == '1':
-                if tag == 'NAME' and curr_indiv is not None:
-                    curr_indiv['NAME'] = arguments
-                elif tag == 'SEX' and curr_indiv is not None:
-                    curr_indiv['SEX'] = arguments
-                elif tag == 'BIRT':
-                    birth = True
-                elif tag == 'DEAT':
-                    death = True
-                elif tag == 'MARR':
-                    marriage = True
-                elif tag == 'DIV':
-                    divorce = True
-                elif tag == 'HUSB' and curr_fam is not None:
-                    curr_fam['HUSB'] = arguments.strip().replace('@', '')
-                elif tag == 'WIFE' and curr_fam is not None:
-                    curr_fam['WIFE'] = arguments.strip().replace('@', '')
-                elif tag == 'CHIL' and curr_fam is not None:
-                    curr_fam.setdefault('CHIL', []).append(arguments.strip().replace('@', ''))
-            elif level == '2' and tag == 'DATE':
-                if birth and curr_indiv is not None:
-                    curr_indiv['BIRT'] = arguments
-                    birth = False
-                elif death and curr_indiv is not None:
-                    curr_indiv['DEAT'] = arguments
-                    death = False
-                elif marriage and curr_fam is not None:
-                    curr_fam['MARR'] = arguments
-                    marriage = False
-                elif divorce and curr_fam is not None:
-                    curr_fam['DIV'] = arguments
-                    divorce = False
-
-        if curr_indiv:
-            individuals.append(curr_indiv)
-        if curr_fam:
-            families.append(curr_fam)
-        
-    return individuals, families
-    
-    
-def organizeFamilyData(family_list, individual_list):
-    #Reorganize family data to match order and add spouse names for families:
-    for fam in family_list:
-        fam_id = fam.get('ID', 'NA')
-        married=fam.get('MARR', 'NA')
-        divorced=fam.get('DIV', 'NA')
-        husb_id=fam.get('HUSB', 'NA')
-        wife_id=fam.get('WIFE', 'NA')
-        children=fam.get('CHIL', [])
-        #find spouse names 
-        husb_name = 'NA'
-        wife_name = 'NA'
-
-        if husb_id != 'NA':
-            for ind in individual_list:
-                if ind.get('ID') == husb_id:
-                    husb_name = ind.get('NAME', 'NA')
-                    break
-
-        if wife_id != 'NA':
-            for ind in individual_list:
-                if ind.get('ID') == wife_id:
-                    wife_name = ind.get('NAME', 'NA')
-                    break
-
-        #reorganize family in desired order
-        fam.clear()
-        fam['ID'] = fam_id
-        fam['Married'] = married
-        fam['Divorced'] = divorced
-        fam['Husband ID'] = husb_id
-        fam['Husband Name'] = husb_name
-        fam['Wife ID'] = wife_id
-        fam['Wife Name'] = wife_name
-        fam['Children'] = children
-    
-    return family_list
+@contextmanager
+def paused_gc():
+    """Turn the cyclic garbage collector off for a block that allocates many objects that stay alive"""
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if gc_was_enabled:
+            gc.enable()
 
+def parse_snapshot_header(line):
+    """The header of a snapshot from its first line, or None when it is not one"""
+    try:
+        header = json.loads(line)
+    except ValueError:
+        return None
+    return header if isinstance(header, dict) else None
 
-def calculateAge(birthday_str, death_str):
+def readSnapshotHeader(filename):
+    """The header of the snapshot next to filename, or None if there is no readable snapshot"""
     try:
-        birthday = datetime.strptime(birthday_str,"%d %b %Y")
-        if death_str == 'NA':
-           death = datetime.today() 
-        else:
-            death = datetime.strptime(death_str,"%d %b %Y")  
-    except (ValueError, TypeError):
-        return 0
-    
-    return death.year - birthday.year - ((death.month,death.day) < (birthday.month, birthday.day))
-    
-    
+        with open(snapshot_path(filename), 'rb') as file:
+            return parse_snapshot_header(file.readline(SNAPSHOT_HEADER_BYTES))
+    except OSError:
+        return None
 
+def readSnapshotFile(filename):
+    """
+    (header, pickle bytes) of the snapshot next to filename, or None if there is no readable
+    snapshot. The bytes are None unless the snapshot is for this parser version and its hmac
+    matches under this user's snapshot_key(). Nothing is unpickled here
+    """
+    try:
+        with open(snapshot_path(filename), 'rb') as file:
+            header_line = file.readline(SNAPSHOT_HEADER_BYTES)
+            header = parse_snapshot_header(header_line)
+            if header is None or header.get('version') != PARSER_VERSION:
+                return None if header is None else (header, None)
+            signature = file.readline(SNAPSHOT_HEADER_BYTES).rstrip(b'\n')
+            # Held in memory, so the bytes unpickled are the bytes checked
+            body = file.read()
+        key = snapshot_key()
+    except OSError:
+        return None
+    expected = hmac.new(key, header_line + body, hashlib.sha256).hexdigest().encode()
+    return header, body if hmac.compare_digest(signature, expected) else None
 
-def findFamilyData(individual_id, family_list_data):
-    spouse = 'NA'
-    children = []
-    
-    for fam in family_list_data:
-        if fam.get('Husband ID') == individual_id or fam.get('Wife ID') == individual_id:
-            children = 'NA' if 'Children' not in fam else fam.get('Children', [])
+def checkSnapshot(filename, digest=None):
+    """Return (up_to_date, reason) for the snapshot next to filename"""
+    header = readSnapshotHeader(filename)
+    if header is None:
+        return False, "no snapshot"
+    if header.get('version') != PARSER_VERSION:
+        return False, f"written by parser version {header.get('version')}, current version is {PARSER_VERSION}"
+    if header.get('digest') != (digest or file_digest(filename)):
+        return False, "source file has changed"
+    snapshot = readSnapshotFile(filename)
+    if snapshot is None or snapshot[1] is None:
+        return False, "not signed with this user's snapshot key"
+    return True, f"up to date ({header['individuals']} individuals, {header['families']} families)"
 
-            if fam.get('Husband ID') == individual_id:
-                spouse = fam.get('Wife ID', 'NA')
-            elif fam.get('Wife ID') == individual_id:
-                spouse = fam.get('Husband ID', 'NA')
+def readSnapshot(filename):
+    """
+    (header, GedcomTree) from the snapshot next to filename, or None if there is none written by
+    this parser version and signed with this user's snapshot key
+    """
+    snapshot = readSnapshotFile(filename)
+    if snapshot is None or snapshot[1] is None:
+        return None
+    header, body = snapshot
+    # Unpickling creates millions of objects and would trigger the cyclic collector over and over
+    try:
+        with paused_gc():
+            tree = pickle.loads(body)
+    except (EOFError, pickle.UnpicklingError, AttributeError, TypeError, ValueError):
+        return None
 
-            break
+    tree.filename = filename
+    tree.source.filename = filename
+    # The as-of day belongs to the run that wrote the snapshot, the loading run picks its own
+    tree.index.as_of = None
+    return header, tree
 
-    return spouse, children
+def loadSnapshot(filename, digest=None, as_of=None):
+    """
+    The (individuals, families, index) stored next to filename with ages on the day as_of (default
+    today), or None if the snapshot is missing or stale
+    """
+    snapshot = readSnapshot(filename)
+    if snapshot is None:
+        return None
+    header, tree = snapshot
+    if header.get('digest') != (digest or file_digest(filename)):
+        return None
 
-def organizeIndividualData(family_list, individual_list):
-    #sort individuals by ID 
+    tree.refresh(as_of)
+    return tree.individuals, tree.families, tree.index
 
-    individual_list.sort(key=lambda x: x.get('ID', ''))
+def loadGedcomTree(filename, use_snapshot=True, rebuild=False, as_of=None):
+    """
+    Return the organized (individuals, families, index) for filename, with ages on the day
+    as_of (default today) and the index's as-of day set to it.
+    Loads the snapshot next to the file when it matches the file contents and parser
+    version. When the file was edited only the changed records are parsed again and the
+    snapshot is updated, without a snapshot the whole file is parsed and one is written
+    """
+    if not use_snapshot:
+        return buildGedcomTree(filename, as_of)
 
-    #reorganize individual data to match order of table
-    for ind in individual_list:
-        ind_id = ind.get('ID', 'NA')
-        name = ind.get('NAME', 'NA')
-        gender = ind.get('SEX', 'NA')
-        bday = ind.get('BIRT', 'NA')
-        bday_copy = bday
-        if is_bday_in_past(bday_copy):
-            
-            death = ind.get('DEAT', 'NA')
-            death_copy = death
-            age = calculateAge(bday_copy, death_copy)
-            alive = 'False' if 'DEAT' in ind else 'True'
-        
-            spouse, children = findFamilyData(ind_id, family_list)
-          
-            ind.clear()
-            ind['ID'] = ind_id
-            ind['Name'] = name
-            ind['Gender'] = gender
-            ind['Birthday'] = bday
-            ind['Age'] = age
-            ind['Alive'] = alive
-            ind['Death'] = death
-            ind['Children'] = children
-            ind['Spouse'] = spouse
-    
-    return individual_list
+    digest = file_digest(filename)
+    snapshot = None if rebuild else readSnapshot(filename)
+    if snapshot is None:
+        tree = GedcomTree(filename, as_of).build()
+    else:
+        header, tree = snapshot
+        if header.get('digest') == digest:
+            tree.refresh(as_of)
+            return tree.individuals, tree.families, tree.index
+        tree.index.as_of = as_of
+        tree.reload()
+
+    try:
+        saveSnapshot(tree, digest)
+    except OSError:
+        pass  # e.g. a read only directory, run without a snapshot
+    return tree.individuals, tree.families, tree.index
 
 def createTable(family_list, individual_list):
     #start
@@ -271,523 +3332,845 @@ def createTable(family_list, individual_list):
     print("\nFamilies:")
     print(fam_table)
 
-def verifyAge(individual_list):
+def verifyAge(individual_list, as_of=None):
     for ind in individual_list:
-        if ind['Age'] < 0:
+        # Records born after the as-of day are not organized and have no age yet
+        if ind.get('Age', 0) < 0:
             print("Error: " + ind['Name'] + " died before they were born")
             individual_list.remove(ind)
     
-    validate__death(individual_list)
-
-def list_deceased(individual_list):
-    """List all deceased individuals"""
-    deceasedList = []
-    
-    for ind in individual_list:
-        if ind.get('Alive') == 'False':
-            deceasedList.append(ind)
+    for error in validate__death(individual_list, as_of):
+        print(error)
 
-    return deceasedList
+def list_deceased(individual_list, as_of=None):
+    """US29: List all individuals who died by as_of (default today)"""
+    return PersonQuery(individual_list, as_of=as_of, indexed=False).select(Q.dead)
 
-def list_orphans(individual_list, family_list):
-    orphaned_list = []
+def list_orphans(individual_list, family_list, index=None, as_of=None):
+    """
+    US33: People in no family whose recorded_age on as_of (default the index's as-of day) is under 18,
+    negative ages included; records without an age on that day are left out
+    """
+    if index is None:
+        index = GedcomIndex(individual_list, family_list)
+    day = as_of_date(index.as_of if as_of is None else as_of)
 
-    for ind in individual_list:
-        person_id = ind.get('ID')
-        person_age = ind.get('Age')
-        has_family = False 
-        if person_age  < 18:
-            for fam in family_list:
+    def in_no_family(ind):
+        return not (index.families_as_spouse(ind.get('ID')) or index.families_as_child(ind.get('ID')))
 
-                if ( person_id == fam.get('Husband ID') or person_id == fam.get('Wife ID') or person_id in fam.get('Children', [])):
-                    has_family = True
-                    break  
+    def under_18(ind):
+        age = recorded_age(ind, day)
+        return age is not None and age < 18
 
-            if not has_family:
-                orphaned_list.append(ind)
+    return PersonQuery(individual_list, index, day, indexed=False).select(Q.where(in_no_family) & Q.where(under_18))
 
-    return orphaned_list
+def recorded_age(ind, day):
+    """
+    The 'Age' the individual table shows for ind on day (a datetime.date), which the listings compare:
+    calculateAge's, so negative for someone who died before they were born and 0 for unreadable
+    dates. None for a record that has no age on that day, born after it or not organized
+    """
+    birthday = ind.get('Birthday')
+    if birthday is None:
+        return None
+    born = parse_known_date(birthday)
+    if born is not None and born.ordinal > day.toordinal():
+        return None
+    return calculateAge(birthday, ind.get('Death', 'NA'), day)
 
-def list_younger_spouse(family_list, individual_list):
+def list_younger_spouse(family_list, individual_list, index=None, as_of=None):
+    """
+    US34: The families where one spouse is younger than the other on as_of (default the index's
+    as-of day), by their recorded_age, negative ages included
+    """
     younger_spouses = []
+    if index is None:
+        index = GedcomIndex(individual_list, family_list)
+    day = as_of_date(index.as_of if as_of is None else as_of)
+
     for fam in family_list:
         husb_id = fam.get('Husband ID', 'NA')
         wife_id = fam.get('Wife ID', 'NA')
-        husb_age = None
-        wife_age = None
-        
-        for ind in individual_list:
-            if ind.get('ID') == husb_id:
-                husb_age = ind.get('Age', None)
-            elif ind.get('ID') == wife_id:
-                wife_age = ind.get('Age', None)
+        husband = index.person(husb_id)
+        wife = index.person(wife_id) if wife_id != husb_id else None
+        husb_age = None if husband is None else recorded_age(husband, day)
+        wife_age = None if wife is None else recorded_age(wife, day)
         
         if husb_age is not None and wife_age is not None:
             if husb_age < wife_age:
-                msg = f"Family {fam.get('ID')}: Husband {husb_id} is younger than Wife {wife_id}"
                 younger_spouses.append((fam.get('ID'), husb_id, wife_id, "Husband younger"))
             elif wife_age < husb_age:
-                msg = f"Family {fam.get('ID')}: Wife {wife_id} is younger than Husband {husb_id}"
                 younger_spouses.append((fam.get('ID'), wife_id, husb_id, "Wife younger"))
 
     return younger_spouses
 
-def list_recent_births(individual_list):
-    recent_births_list = []
-    today = datetime.today()
-    thirty_days_ago = today - timedelta(days=30)
+def list_recent_births(individual_list, calendar=None, as_of=None):
+    """
+    US35: The people born in the 30 days up to as_of (default today), in list order. calendar is
+    a CalendarIndex over individual_list to look them up in; individual_list is scanned without it
+    or when the calendar was built from other records (see CalendarIndex.covers)
+    """
+    indexed = calendar is not None and calendar.covers(individual_list)
+    return PersonQuery(individual_list, as_of=as_of, calendar=calendar, indexed=indexed).select(Q.born_within(29))
 
-    for ind in individual_list:
-        birth_date_str = ind.get('Birthday')
-        if birth_date_str:
-            try:
-                birth_date = datetime.strptime(birth_date_str, "%d %b %Y")
-                if thirty_days_ago <= birth_date <= today:
-                    recent_births_list.append(ind)
-            except ValueError:
-                pass
-    
-    return recent_births_list
 
+def list_living_married(individual_list, as_of=None):
+    """US30: List all individuals alive on as_of (default today) who have a spouse"""
+    return PersonQuery(individual_list, as_of=as_of, indexed=False).select(Q.married & Q.alive)
 
-def list_living_married(individual_list):
-    """List all living married individuals"""
-    living_married_list = []
+def list_recent_deaths(individual_list, days=TEN_YEARS_DAYS, calendar=None, as_of=None):
+    """
+    US36: List all deaths in the 10 years (or days) up to as_of, in list order
+    (calendar and as_of as in list_recent_births)
+    """
+    indexed = calendar is not None and calendar.covers(individual_list)
+    return PersonQuery(individual_list, as_of=as_of, calendar=calendar, indexed=indexed).select(Q.died_within(days))
 
-    for ind in individual_list:
-        if ind.get('Alive') == 'True' and ind.get('Spouse') != 'NA':
-            living_married_list.append(ind)
-            
-    return living_married_list
+def days_until_birthday(birth_date, today):
+    """
+    Whole days from now until the next birthday of birth_date, counted the way
+    (next_birthday - datetime.today()).days counts them: tomorrow is 0 days away, today is -1
+    Raises ValueError when the birthday does not exist in that year (29 FEB)
+    """
+    # Construct the birthday date for this year
+    next_birthday = date(today.year, birth_date.month, birth_date.day)
+    # If this year's birthday already passed, use next year
+    if next_birthday < today:
+        next_birthday = date(today.year + 1, birth_date.month, birth_date.day)
+    return (next_birthday - today).days - 1
 
-def list_recent_deaths(individual_list, days=TEN_YEARS_DAYS):
-    """US36: List all deaths that occurred within the last 10 years"""
-    recent_deaths_list = []
-    today = datetime.today()
+def list_upcoming_birthdays(individual_list, days=30, calendar=None, as_of=None):
+    """
+    US38: List the people alive on as_of whose birthdays occur in the next `days` days, in list
+    order (calendar and as_of as in list_recent_births). A birthday on as_of is not upcoming,
+    one `days` + 1 days away still is, and 29 FEB birthdays are skipped in other years
+    """
+    if calendar is None or not calendar.covers(individual_list):
+        calendar = CalendarIndex(individual_list)
+    today = as_of_date(as_of)
+    found = calendar.occurrences(calendar.birthdays, today + timedelta(days=1), today + timedelta(days=days + 1))
+    upcoming = [calendar.individuals[position] for position in sorted({position for day, position in found})]
+    return [ind for ind in upcoming if alive_on(ind, today)]
 
-    for ind in individual_list:
-        death_date_str = ind.get('Death', 'NA')
-        if death_date_str != 'NA':
-            try:
-                death_date = datetime.strptime(death_date_str, "%d %b %Y")
-                days_since_death = (today - death_date).days
-
-                if days_since_death <= days:
-                    recent_deaths_list.append(ind)
-            except ValueError:
-                pass
-    
-    return recent_deaths_list
+# Row keys shared by several kinds of error
+SPOUSE_ERROR_KEYS = ('Family ID', 'Husband ID', 'Husband Name', 'Wife ID', 'Wife Name')
+BIGAMY_ERROR_KEYS = ('Person ID', 'Person Name', 'Role', 'First Family ID', 'First Marriage Date',
+                     'Second Family ID', 'Second Marriage Date')
 
-def list_upcoming_birthdays(individual_list, days=30):
-    """US38: List all living people whose birthdays occur in the next `days` days"""
-    today = datetime.today()
-    upcoming_list = []
-    
-    for ind in individual_list:
-        if ind.get('Alive') != 'True':
-            continue
-        bday_str = ind.get('Birthday', 'NA')
-        if bday_str == 'NA':
-            continue
-        try:
-            birth_date = datetime.strptime(bday_str, "%d %b %Y")
-            # Construct the birthday date for this year
-            next_birthday = birth_date.replace(year=today.year)
-            # If this year's birthday already passed, use next year
-            if next_birthday < today.replace(hour=0, minute=0, second=0, microsecond=0):
-                next_birthday = next_birthday.replace(year=today.year + 1)
-            delta_days = (next_birthday - today).days
-            if 0 <= delta_days <= days:
-                upcoming_list.append(ind)
-        except ValueError:
-            continue
-    
-    return upcoming_list
+# kind -> (rule, row keys, message). Errors of a kind with row keys are reported as a
+# {key: arg, ..., 'Error': message} row, the others as the message alone; {n} is the n-th arg
+ERROR_FORMATS = {
+    'US02': ('US02', None, "ERROR: Individual {0} ({1}) was born ({2}) after marriage ({3})"),
+    'US05': ('US05', ('Family ID', 'Spouse ID', 'Spouse Name', 'Role', 'Marriage Date', 'Death Date'),
+             'Marriage date must be before death date'),
+    'US06': ('US06', ('Family ID', 'Spouse ID', 'Spouse Name', 'Role', 'Divorce Date', 'Death Date'),
+             'Divorce date must be before death date'),
+    'US07-dead': ('US07', ('Name', 'Birth Date', 'Death Date'), 'Death happened after more than 150 years'),
+    'US07-alive': ('US07', ('Name', 'Birth Date', 'Current Date'), 'Individual is more than 150 years old'),
+    'US08-marriage': ('US08', None, "ERROR: US08: Child {0} ({1}) born {2} before parents' marriage {3} in family {4}"),
+    'US08-divorce': ('US08', None, "ERROR: US08: Child {0} ({1}) born {2} more than 9 months after parents' divorce {3} in family {4}"),
+    'US09-mother': ('US09', None, "ERROR: US09: Child {0} ({1}) born {2} after mother's death {3} in family {4}"),
+    'US09-father': ('US09', None, "ERROR: US09: Child {0} ({1}) born {2} more than 9 months after father's death {3} in family {4}"),
+    'US10': ('US10', ('Family ID', 'Spouse ID', 'Spouse Name', 'Role', 'Birth Date', 'Marriage Date', 'Age at Marriage'),
+             'Marriage occurred before spouse was 14 years old'),
+    'US11-ongoing': ('US11', BIGAMY_ERROR_KEYS, 'Bigamy - married while still married to another spouse'),
+    'US11-ended': ('US11', BIGAMY_ERROR_KEYS + ('First End Date',), 'Bigamy - married before previous marriage ended'),
+    'US12-mother': ('US12', ('Family ID', 'Mother ID', 'Mother Name', 'Child ID', 'Child Name', 'Mother Birthday',
+                             'Child Birthday', 'Age Difference'),
+                    f"US12: Mother {{2}} is {{7}} years older than her child {{4}} (should be less than {MAX_MOTHER_AGE_DIFF})"),
+    'US12-father': ('US12', ('Family ID', 'Father ID', 'Father Name', 'Child ID', 'Child Name', 'Father Birthday',
+                             'Child Birthday', 'Age Difference'),
+                    f"US12: Father {{2}} is {{7}} years older than his child {{4}} (should be less than {MAX_FATHER_AGE_DIFF})"),
+    'US15': ('US15', None, "ERROR: US15: Family {0} has {1} children (should be fewer than 15)"),
+    'US18': ('US18', SPOUSE_ERROR_KEYS, 'US18: Siblings should not marry each other'),
+    'US19': ('US19', SPOUSE_ERROR_KEYS, 'US19: First cousins should not marry each other'),
+    'US18-related': ('US18', SPOUSE_ERROR_KEYS + ('Degree', 'Relation'), 'Spouses are {6}'),
+    'US19-related': ('US19', SPOUSE_ERROR_KEYS + ('Degree', 'Relation'), 'Spouses are {6}'),
+    'US21-husband': ('US21', None, "ERROR: US21: Husband {0} ({1}) in family {2} is not male (Gender: {3})"),
+    'US21-wife': ('US21', None, "ERROR: US21: Wife {0} ({1}) in family {2} is not female (Gender: {3})"),
+    'US23': ('US23', None, "ERROR: US23: Individual {0} ({1}) has the same name and birth date ({2}) as {3}"),
+    'US24': ('US24', None, "ERROR: US24: Family {0} has the same spouses ({1} and {2}) and marriage date ({3}) as family {4}"),
+}
 
-def validate_marriage_before_death(family_list, individual_list):
-    """US05: Marriage should occur before death of either spouse"""
-    errors = []
-    
-    for fam in family_list:
-        married = fam.get('Married', 'NA')
-        husb_id = fam.get('Husband ID', 'NA')
-        wife_id = fam.get('Wife ID', 'NA')
-        
-        if married == 'NA':
-            continue
-        
-        try:
-            marry_date = datetime.strptime(married, "%d %b %Y")
-            
-            # Check husband's death
-            for ind in individual_list:
-                if ind.get('ID') == husb_id:
-                    death = ind.get('Death', 'NA')
-                    if death != 'NA':
-                        death_date = datetime.strptime(death, "%d %b %Y")
-                        if marry_date >= death_date:
-                            errors.append({
-                                'Family ID': fam.get('ID'),
-                                'Spouse ID': husb_id,
-                                'Spouse Name': ind.get('Name', 'NA'),
-                                'Role': 'Husband',
-                                'Marriage Date': married,
-                                'Death Date': death,
-                                'Error': 'Marriage date must be before death date'
-                            })
-                    break
-            
-            # Check wife's death
-            for ind in individual_list:
-                if ind.get('ID') == wife_id:
-                    death = ind.get('Death', 'NA')
-                    if death != 'NA':
-                        death_date = datetime.strptime(death, "%d %b %Y")
-                        if marry_date >= death_date:
-                            errors.append({
-                                'Family ID': fam.get('ID'),
-                                'Spouse ID': wife_id,
-                                'Spouse Name': ind.get('Name', 'NA'),
-                                'Role': 'Wife',
-                                'Marriage Date': married,
-                                'Death Date': death,
-                                'Error': 'Marriage date must be before death date'
-                            })
-                    break
-                    
-        except ValueError:
-            pass
-    
-    return errors
 
+class ValidationError:
+    """
+    One finding of a rule: the kind of finding (a key of ERROR_FORMATS), its rule and severity,
+    the IDs of the records involved and the values its message is made of. Nothing is formatted
+    until message() or row() is asked for, so sinks that only count or store findings never pay for it
+    """
+    __slots__ = ('kind', 'rule', 'severity', 'record_ids', 'args')
+
+    def __init__(self, kind, record_ids, args):
+        self.kind = kind
+        self.rule = ERROR_FORMATS[kind][0]
+        self.severity = RULES[self.rule].severity
+        self.record_ids = record_ids
+        self.args = args
+
+    def values(self):
+        """args with dates formatted the way the reports show them"""
+        return [format_gedcom_date(arg) if isinstance(arg, GedcomDate) else arg for arg in self.args]
+
+    def message(self):
+        return ERROR_FORMATS[self.kind][2].format(*self.values())
+
+    def row(self):
+        """The error the way the rule's validate_* function reports it, a row dict or a message"""
+        keys = ERROR_FORMATS[self.kind][1]
+        if keys is None:
+            return self.message()
+        row = dict(zip(keys, self.values()))
+        row['Error'] = self.message()
+        return row
+
+    def __eq__(self, other):
+        if not isinstance(other, ValidationError):
+            return NotImplemented
+        return (self.kind, self.record_ids, self.args) == (other.kind, other.record_ids, other.args)
+
+    def __hash__(self):
+        return hash((self.kind, self.record_ids))
+
+    def __getstate__(self):
+        return self.kind, self.record_ids, self.args
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def __repr__(self):
+        return f"ValidationError({self.kind!r}, {self.record_ids!r}, {self.args!r})"
+
+
+def error_rows(found):
+    """{rule: ValidationErrors} as {rule: rows}, what validate_all and the display functions work with"""
+    return {rule: [error.row() for error in errors] for rule, errors in found.items()}
+
+
+class ErrorSink:
+    """
+    Where stream_validation sends each ValidationError as soon as it is found: append(error)
+    takes one, close() finishes the report. Sinks are context managers that close on exit
+    """
+
+    def append(self, error):
+        raise NotImplementedError
+
+    def extend(self, errors):
+        for error in errors:
+            self.append(error)
+
+    def report_coverage(self, coverage):
+        """Called once before close with the {rule ID: RuleCoverage} of a budgeted run"""
+        self.coverage = coverage
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class MemorySink(ErrorSink):
+    """Keeps every error, in the order they were found"""
+
+    def __init__(self):
+        self.errors = []
+        self.coverage = {}
+
+    def append(self, error):
+        self.errors.append(error)
+
+    def by_rule(self):
+        found = {}
+        for error in self.errors:
+            found.setdefault(error.rule, []).append(error)
+        return found
+
+
+class CountingSink(ErrorSink):
+    """Only counts the errors of each rule, nothing is kept or formatted"""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.coverage = {}
+
+    def append(self, error):
+        self.counts[error.rule] += 1
+
+
+class JsonlSink(ErrorSink):
+    """
+    Writes one JSON object per error (rule, severity, kind, record IDs, args and, unless
+    messages is False, the message) to file, a path or an open text file
+    """
+
+    def __init__(self, file, messages=True):
+        self.owned = isinstance(file, (str, os.PathLike))
+        self.file = open(file, 'w', encoding='utf-8') if self.owned else file
+        self.messages = messages
+
+    def append(self, error):
+        record = {'rule': error.rule, 'severity': error.severity, 'kind': error.kind,
+                  'records': list(error.record_ids), 'args': error.values()}
+        if self.messages:
+            record['message'] = error.message()
+        self.file.write(json.dumps(record, default=str) + '\n')
+
+    def report_coverage(self, coverage):
+        """One {"coverage": ...} object per rule after the errors"""
+        for rule_coverage in coverage.values():
+            self.file.write(json.dumps({'coverage': dict(rule_coverage._asdict(), partial=rule_coverage.partial)}) + '\n')
+
+    def close(self):
+        if self.owned:
+            self.file.close()
+        else:
+            self.file.flush()
+
+
+class TableSink(ErrorSink):
+    """Collects the errors and prints one table per kind of error when closed"""
+
+    def __init__(self, file=None):
+        self.file = file
+        self.errors = {}
+        self.coverage = {}
+
+    def append(self, error):
+        self.errors.setdefault(error.kind, []).append(error)
+
+    def close(self):
+        for kind, errors in self.errors.items():
+            rule, keys, message = ERROR_FORMATS[kind]
+            table = PrettyTable()
+            if keys is None:
+                table.field_names = ["Record IDs", "Message"]
+                for error in errors:
+                    table.add_row([', '.join(error.record_ids), error.message()])
+            else:
+                table.field_names = list(keys) + ["Error"]
+                for error in errors:
+                    table.add_row(error.values() + [error.message()])
+            print(f"\n{rule} {errors[0].severity} ({len(errors)} found):", file=self.file)
+            print(table, file=self.file)
+        partial = [coverage for coverage in self.coverage.values() if coverage.partial]
+        if partial:
+            print("\nPartial results:", file=self.file)
+            for coverage in partial:
+                print(f"  {coverage.describe()}", file=self.file)
+        self.errors = {}
+
+
+class RuleCoverage(namedtuple('RuleCoverage', ['rule', 'checked', 'total', 'records', 'errors', 'stopped'])):
+    """
+    How much of the tree a budgeted run checked for one rule: checked of total records
+    ('families' or 'people'), the errors it kept, and why it stopped early ('max_errors', 'time'
+    or 'sample'), None when the rule saw every record and kept every error
+    """
+    __slots__ = ()
+
+    @property
+    def partial(self):
+        return self.stopped is not None
+
+    def describe(self):
+        """e.g. 'US08: partial (max_errors), 1,234 of 153,175 families checked (0.8%), 200 errors'"""
+        share = self.checked / self.total if self.total else 1
+        state = f"partial ({self.stopped})" if self.partial else "complete"
+        return f"{self.rule}: {state}, {self.checked:,} of {self.total:,} {self.records} checked ({share:.1%}), {self.errors:,} errors"
+
+
+class BudgetedErrors:
+    """Stands in for a rule's error list or sink in a budgeted pass and stops taking errors once the rule's limit is reached"""
+    __slots__ = ('target', 'left', 'kept', 'budget')
+
+    def __init__(self, target, limit, budget):
+        self.target = target
+        self.left = limit
+        self.kept = 0
+        self.budget = budget
+
+    def append(self, error):
+        if self.left <= 0:
+            return
+        self.target.append(error)
+        self.kept += 1
+        self.left -= 1
+        if self.left <= 0:
+            self.budget.exhausted = True
+
+
+class ValidationBudget:
+    """
+    Limits for one validation run, so a broken import can be triaged without a full scan.
+    max_errors stops a rule once it has found that many errors (an int for every rule, or
+    {rule ID: int} for some of them), seconds stops every rule once the run has taken that long,
+    and sample checks only that fraction of the families and people, drawn with seed so a rerun
+    checks the same records. The clock starts with the first pass; what each rule covered is kept
+    in coverage as {rule ID: RuleCoverage}. Use a new budget for every run
+    """
+    CLOCK_EVERY = 256  # records between two looks at the clock
+
+    def __init__(self, max_errors=None, seconds=None, sample=None, seed=0):
+        limits = max_errors.values() if isinstance(max_errors, dict) else [] if max_errors is None else [max_errors]
+        if any(limit < 0 for limit in limits):
+            raise ValueError(f"max_errors must not be negative, got {max_errors!r}")
+        if seconds is not None and seconds <= 0:
+            raise ValueError(f"seconds must be positive, got {seconds!r}")
+        if sample is not None and not 0 < sample <= 1:
+            raise ValueError(f"sample must be a fraction in (0, 1], got {sample!r}")
+        self.max_errors = max_errors
+        self.seconds = seconds
+        self.sample = sample
+        self.seed = seed
+        self.deadline = None
+        self.exhausted = False
+        self.coverage = {}
+
+    @property
+    def partial(self):
+        return any(coverage.partial for coverage in self.coverage.values())
+
+    def limit(self, rule):
+        if isinstance(self.max_errors, dict):
+            return self.max_errors.get(rule, float('inf'))
+        return float('inf') if self.max_errors is None else self.max_errors
+
+    def out_of_time(self):
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+
+    def select(self, records):
+        """The sampled records, in their original order"""
+        if self.sample is None or self.sample >= 1:
+            return records
+        picked = random.Random(self.seed).sample(range(len(records)), round(len(records) * self.sample))
+        return [records[position] for position in sorted(picked)]
+
+    def run(self, records, checks, found, check_record, records_name, collecting=()):
+        """
+        Call check_record(record, active) on each selected record in order, where active holds
+        (rule ID, check, errors) for the rules still running and errors takes their errors into
+        found[rule ID]. A rule drops out when its max_errors is reached, all of them when the time
+        is up. The rules in collecting only gather facts during the pass (US11), their errors are
+        limited afterwards with admit
+        """
+        if self.deadline is None and self.seconds is not None:
+            self.deadline = time.perf_counter() + self.seconds
+        selected = self.select(records)
+        stopped = {}
+        active = []
+        for rule, check in checks:
+            errors = found[rule] if rule in collecting else BudgetedErrors(found[rule], self.limit(rule), self)
+            if rule in collecting or errors.left > 0:
+                active.append((rule, check, errors))
+            else:
+                stopped[rule] = (0, 'max_errors')
+        budgeted = [(rule, errors) for rule, check, errors in active if rule not in collecting]
+
+        checked = 0
+        for record in selected:
+            if not active:
+                break
+            if checked % self.CLOCK_EVERY == 0 and self.out_of_time():
+                stopped.update((rule, (checked, 'time')) for rule, check, errors in active)
+                active = []
+                break
+            check_record(record, active)
+            checked += 1
+            if self.exhausted:
+                self.exhausted = False
+                stopped.update((rule, (checked, 'max_errors')) for rule, check, errors in active
+                               if rule not in collecting and errors.left <= 0)
+                active = [entry for entry in active if entry[0] not in stopped]
+
+        sampled = 'sample' if len(selected) < len(records) else None
+        kept = dict(budgeted)
+        for rule, check in checks:
+            rule_checked, reason = stopped.get(rule, (checked, sampled))
+            self.coverage[rule] = RuleCoverage(rule, rule_checked, len(records), records_name,
+                                               kept[rule].kept if rule in kept else 0, reason)
+
+    def admit(self, rule, errors):
+        """The first errors of a collecting rule that fit its max_errors, counted in its coverage"""
+        limit = self.limit(rule)
+        coverage = self.coverage[rule]
+        if len(errors) > limit:
+            errors = errors[:int(limit)]
+            coverage = coverage._replace(stopped='max_errors')
+        self.coverage[rule] = coverage._replace(errors=len(errors))
+        return errors
+
+
+def validate_rule(rule, family_list, individual_list, index=None):
+    """The rows validate_all finds for one FAMILY_RULES rule, what each legacy validate_* function returns"""
+    return validate_all(family_list, individual_list, index, [rule])[rule]
+
+
+def validate_marriage_before_death(family_list, individual_list, index=None):
+    """US05: Marriage should occur before death of either spouse; the US05 rows of validate_all"""
+    return validate_rule('US05', family_list, individual_list, index)
+
+
+def validate__divorce_before_death(family_list, individual_list, index=None):
+    """US06: Divorce can only occur before death of both spouses; the US06 rows of validate_all"""
+    return validate_rule('US06', family_list, individual_list, index)
+
+def validate__death(individual_list, as_of=None):
+    """US07: Less than 150 years old, dead or alive on the day as_of (default today). Returns the error rows"""
+    return [error.row() for error in check_people(individual_list, None, ['US07'], today=as_of)['US07']]
+
+def validate_birth_before_marriage(individual_list, family_list, index=None):
+    """
+    US02: Birth before marriage. Returns the error messages, one per person and marriage
+    they were born after, and never raises; an empty list when everyone was born first
+    """
+    if index is None:
+        index = GedcomIndex(individual_list, family_list)
+
+    return [error.row() for error in check_people(individual_list, index, ['US02'])['US02']]
+
+def validate_birth_before_marriage_of_parents(families_data, individuals_data):
+    """
+    US08: Birth before marriage of parents
+    Child should be born after marriage of parents and not more than 9 months after their divorce
+    Returns the US08 rows of validate_all
+    """
+    return validate_rule('US08', families_data, individuals_data, None)
+
+
+def validate_birth_before_death_of_parents(families_data, individuals_data):
+    """
+    US09: Birth before death of parents
+    Child should be born before death of mother and before 9 months after death of father
+    Returns the US09 rows of validate_all
+    """
+    return validate_rule('US09', families_data, individuals_data, None)
+
+def validate_fewer_than_15_siblings(families_data, individuals_data):
+    """
+    US15: Fewer than 15 siblings
+    There should be fewer than 15 siblings in a family
+    Returns the US15 rows of validate_all
+    """
+    return validate_rule('US15', families_data, individuals_data, None)
+
+
+def validate_correct_gender_for_role(families_data, individuals_data):
+    """
+    US21: Correct gender for role
+    Husband in family should be male and wife in family should be female
+    Returns the US21 rows of validate_all
+    """
+    return validate_rule('US21', families_data, individuals_data, None)
+
+
+class Duplicate(namedtuple('Duplicate', ['kept_id', 'duplicate_id', 'score', 'exact', 'kept', 'duplicate'])):
+    """
+    One result of find_duplicate_people / find_duplicate_families: the later record looks like the kept one.
+    kept and duplicate are the positions of the two records in the list searched, IDs can be repeated
+    """
+    __slots__ = ()
+
+    def describe(self):
+        return f"{self.duplicate_id} duplicates {self.kept_id} ({'exact' if self.exact else f'{self.score:.2f}'})"
+
+
+@lru_cache(maxsize=DUPLICATE_NAME_CACHE)
+def name_words(name):
+    """The folded (given words, surname words) of a name as written, see split_name and fold_name"""
+    return tuple(tuple(fold_name(part).split()) for part in split_name(name))
+
+
+def word_similarity(first, second):
+    """How alike two folded words are, from 0 to 1: 0.8 the Dice overlap of their trigrams, 0.2 when they share a phonetic code"""
+    if first == second:
+        return 1.0
+    first_trigrams, second_trigrams = word_trigrams(first), word_trigrams(second)
+    shared = len(first_trigrams & second_trigrams)
+    return 1.6 * shared / (len(first_trigrams) + len(second_trigrams)) + 0.2 * (not word_codes(first).isdisjoint(word_codes(second)))
+
+
+def words_similarity(first, second):
+    """
+    How alike two lists of folded words are, from 0 to 1: the best match of each word among the other
+    words, averaged both ways; 0.5 when only one of them is empty
+    """
+    if first == second:
+        return 1.0
+    if not first or not second:
+        return 0.5
+    if len(first) == len(second) == 1:
+        return word_similarity(first[0], second[0])
+
+    def best(words, others):
+        return sum(max(word_similarity(word, other) for other in others) for word in words) / len(words)
+    return (best(first, second) + best(second, first)) / 2
+
+
+def date_similarity(first, second):
+    """
+    How alike two GedcomDates are, from 0 to 1: 1 for the same day, 0.8 for another day of the same month,
+    0.7 for day and month swapped, 0.6 for the same day of another year, 0.4 for the same year; 0.5 when one is unknown
+    """
+    if first is None or second is None:
+        return 0.5
+    if first == second:
+        return 1.0
+    if first.year == second.year:
+        if first.month == second.month:
+            return 0.8
+        return 0.7 if (first.month, first.day) == (second.day, second.month) else 0.4
+    return 0.6 if (first.month, first.day) == (second.month, second.day) else 0.0
+
+
+@lru_cache(maxsize=DUPLICATE_NAME_CACHE)
+def first_soundex(words):
+    """The Soundex code of the first of some folded words, empty without words"""
+    return soundex(words[0]) if words else ''
+
+
+class PersonMatching:
+    """
+    How find_duplicate_people compares people. Each record is read once into its features
+    (gender, birth date, given words, surname words), which the keys and the similarity work on
+    """
+
+    @staticmethod
+    def features(ind):
+        given, surname = name_words(ind.get('Name'))
+        return ind.get('Gender', 'NA'), parse_known_date(ind.get('Birthday')), given, surname
+
+    @staticmethod
+    def exact_key(features):
+        """US23: the folded name and the birth date, None without a name or a readable birthday"""
+        gender, born, given, surname = features
+        if born is None or not (given or surname):
+            return None
+        return given, surname, born.ordinal
+
+    @staticmethod
+    def block_keys(features):
+        """The sound of the surname and of the first given name each with the birth year, and the two sounds together"""
+        gender, born, given, surname = features
+        year = born.year if born is not None else None
+        surname_code, given_code = first_soundex(surname), first_soundex(given)
+        return ('surname', surname_code, year), ('given', given_code, year), ('names', surname_code, given_code)
+
+    @staticmethod
+    def sort_key(features):
+        gender, born, given, surname = features
+        return surname, given, born.ordinal if born is not None else 0
 
-def validate__divorce_before_death(family_list, individual_list):
-    """US06: Divorce can only occur before death of both spouses"""
-    errors = []
-    
-    for fam in family_list:
-        divorced = fam.get('Divorced', 'NA')
-        husb_id = fam.get('Husband ID', 'NA')
-        wife_id = fam.get('Wife ID', 'NA')
-        
-        if divorced == 'NA':
-            continue
-        
-        try:
-            divorce_date = datetime.strptime(divorced, "%d %b %Y")
-            
-            # Check husband's death
-            for ind in individual_list:
-                if ind.get('ID') == husb_id:
-                    death = ind.get('Death', 'NA')
-                    if death != 'NA':
-                        death_date = datetime.strptime(death, "%d %b %Y")
-                        if divorce_date >= death_date:
-                            errors.append({
-                                'Family ID': fam.get('ID'),
-                                'Spouse ID': husb_id,
-                                'Spouse Name': ind.get('Name', 'NA'),
-                                'Role': 'Husband',
-                                'Divorce Date': divorced,
-                                'Death Date': death,
-                                'Error': 'Divorce date must be before death date'
-                            })
-                    break
-            
-            # Check wife's death
-            for ind in individual_list:
-                if ind.get('ID') == wife_id:
-                    death = ind.get('Death', 'NA')
-                    if death != 'NA':
-                        death_date = datetime.strptime(death, "%d %b %Y")
-                        if divorce_date >= death_date:
-                            errors.append({
-                                'Family ID': fam.get('ID'),
-                                'Spouse ID': wife_id,
-                                'Spouse Name': ind.get('Name', 'NA'),
-                                'Role': 'Wife',
-                                'Divorce Date': divorced,
-                                'Death Date': death,
-                                'Error': 'Divorce date must be before death date'
-                            })
-                    break
-                    
-        except ValueError:
-            pass
-    
-    return errors
+    @staticmethod
+    def similarity(first, second, min_score=0.0):
+        """
+        From 0 to 1: 0.3 birth date, 0.35 surname and 0.35 given names similarity; 0 when both genders
+        are known and differ, or as soon as the score can no longer reach min_score
+        """
+        if first[0] != second[0] and first[0] in ('M', 'F') and second[0] in ('M', 'F'):
+            return 0.0
+        # The cheap part first: each part lowers the best score the rest could still make
+        score = 0.3 * date_similarity(first[1], second[1])
+        if score + 0.7 < min_score:
+            return 0.0
+        score += 0.35 * words_similarity(first[3], second[3])
+        if score + 0.35 < min_score:
+            return 0.0
+        return score + 0.35 * words_similarity(first[2], second[2])
 
-def validate__death(individual_list):
 
-    errors = []
-    
-    for ind in individual_list:
+class FamilyMatching:
+    """
+    How find_duplicate_families compares families, on the features (husband (given words, surname words),
+    wife (given words, surname words), marriage date) of each record
+    """
 
-        try:
-        
-            death = ind.get('Death', 'NA')
-            birthday = ind.get('Birthday', 'NA')
-            if death != 'NA' and birthday != 'NA':
-                death_date = datetime.strptime(death, "%d %b %Y")
-                birth_date = datetime.strptime(birthday, "%d %b %Y")
-                delta = death_date - birth_date
-                years = delta.days / 365.25
-                if years >= MAX_AGE_YEARS:
-                    errors.append({
-                        'Name': ind.get('Name'),
-                        'Birth Date': birthday,
-                        'Death Date': death,
-                        'Error': 'Death happened after more than 150 years'
-                    })
-            else:
-                today = datetime.today()
-                birth_date = datetime.strptime(birthday, "%d %b %Y")
-                delta = today - birth_date
-                years = delta.days / 365.25
-                if years >= MAX_AGE_YEARS:
-                    errors.append({
-                        'Name': ind.get('Name'),
-                        'Birth Date': birthday,
-                        'Current Date': today,
-                        'Error': 'Individual is more than 150 years old'
-                    })
-                    
-        except ValueError:
-            pass
-        
-    for error in errors:
-        print(error)
-    
-    return errors
+    @staticmethod
+    def features(fam):
+        return name_words(fam.get('Husband Name')), name_words(fam.get('Wife Name')), parse_known_date(fam.get('Married'))
 
-def validate_birth_before_marriage(individual_list, family_list):
-    """Check that birth date precedes marriage date, otherwise throw error"""
+    @staticmethod
+    def exact_key(features):
+        """US24: the folded names of both spouses and the marriage date, None without a spouse name or a readable marriage date"""
+        husband, wife, married = features
+        if married is None or husband == wife == ((), ()):
+            return None
+        return husband, wife, married.ordinal
 
-    for ind in individual_list:
-        
-        spouse = ind.get('Spouse')
-        birthday = ind.get('Birthday')
+    @staticmethod
+    def block_keys(features):
+        """The sound of each spouse's surname with the marriage year, and the two sounds together"""
+        husband, wife, married = features
+        year = married.year if married is not None else None
+        husband_code, wife_code = first_soundex(husband[1]), first_soundex(wife[1])
+        return ('husband', husband_code, year), ('wife', wife_code, year), ('couple', husband_code, wife_code)
 
-        if spouse == 'NA' or birthday == 'NA' or birthday is None:
-            continue
+    @staticmethod
+    def sort_key(features):
+        husband, wife, married = features
+        return husband, wife, married.ordinal if married is not None else 0
 
-        birth_date = datetime.strptime(birthday, "%d %b %Y")
+    @staticmethod
+    def similarity(first, second, min_score=0.0):
+        """
+        From 0 to 1: 0.3 marriage date similarity and 0.35 for each spouse's name, given names and
+        surname alike; 0 as soon as the score can no longer reach min_score
+        """
+        score = 0.3 * date_similarity(first[2], second[2])
+        rest = 0.7
+        for (first_given, first_surname), (second_given, second_surname) in zip(first[:2], second[:2]):
+            if score + rest < min_score:
+                return 0.0
+            score += 0.175 * (words_similarity(first_given, second_given) + words_similarity(first_surname, second_surname))
+            rest -= 0.35
+        return score
 
-        for fam in family_list:
-            if fam.get('Husband ID') == ind.get('ID') or fam.get('Wife ID') == ind.get('ID'):
-                married = fam.get('Married')
-                
-                if married == 'NA' or married is None:
-                    continue
 
-                marriage_date = datetime.strptime(married, "%d %b %Y")
+def person_similarity(first, second):
+    """How likely two people records are the same person, from 0 to 1, see PersonMatching.similarity"""
+    return PersonMatching.similarity(PersonMatching.features(first), PersonMatching.features(second))
 
-                if birth_date > marriage_date:
-                    raise ValueError(
-                        f"ERROR: Individual {ind.get('ID')} ({ind.get('Name')}) "
-                        f"was born ({ind.get('Birthday')}) after marriage ({fam.get('Married')})"
-                    )
-    return True
 
-def validate_birth_before_marriage_of_parents(families_data, individuals_data):
+def family_similarity(first, second):
+    """How likely two family records are the same family, from 0 to 1, see FamilyMatching.similarity"""
+    return FamilyMatching.similarity(FamilyMatching.features(first), FamilyMatching.features(second))
+
+
+def candidate_pairs(sort_keys, block_keys, window=DUPLICATE_WINDOW):
     """
-    US08: Birth before marriage of parents
-    Child should be born after marriage of parents and not more than 9 months after their divorce
-    Returns list of errors found
+    The pairs (i, j), i < j, of records sharing one of their blocking keys (block_keys[i]). A block of up
+    to window + 1 records gives all its pairs, a larger one is sorted by sort_keys and each record is
+    paired with the next window (sorted neighbourhood), so there are at most window pairs per record and key
     """
-    errors = []
-    
-    
-    ind_dict = {ind['ID']: ind for ind in individuals_data}
-    
-    for family in families_data:
-        marriage_date = family.get('Married')
-        divorce_date = family.get('Divorced')
-        children = family.get('Children', [])
-        
-        
-        if marriage_date == 'NA' or not children:
-            continue
-            
-        marriage_dt = datetime.strptime(marriage_date, '%d %b %Y')
-        
-        
-        divorce_plus_9_months = None
-        if divorce_date != 'NA':
-            divorce_dt = datetime.strptime(divorce_date, '%d %b %Y')
-            divorce_plus_9_months = divorce_dt + timedelta(days=NINE_MONTHS_DAYS)  # approximately 9 months
-        
-        for child_id in children:
-            if child_id not in ind_dict:
-                continue
-                
-            child = ind_dict[child_id]
-            birth_date = child.get('Birthday')
-            
-            if birth_date == 'NA':
-                continue
-                
-            birth_dt = datetime.strptime(birth_date, '%d %b %Y')
-            
-            
-            if birth_dt < marriage_dt:
-                errors.append(f"ERROR: US08: Child {child['Name']} ({child_id}) born {birth_date} before parents' marriage {marriage_date} in family {family['ID']}")
-            
-            
-            if divorce_plus_9_months and birth_dt > divorce_plus_9_months:
-                errors.append(f"ERROR: US08: Child {child['Name']} ({child_id}) born {birth_date} more than 9 months after parents' divorce {divorce_date} in family {family['ID']}")
-    
-    
-    for error in errors:
-        print(error)
-    
-    return errors
+    blocks = {}
+    for number, keys in enumerate(block_keys):
+        for key in keys:
+            blocks.setdefault(key, []).append(number)
+    pairs = set()
+    for members in blocks.values():
+        if len(members) > window + 1:
+            members.sort(key=sort_keys.__getitem__)
+        for offset, first in enumerate(members):
+            for second in members[offset + 1:offset + 1 + window]:
+                pairs.add((first, second) if first < second else (second, first))
+    return pairs
 
 
-def validate_birth_before_death_of_parents(families_data, individuals_data):
+def find_duplicates(records, matching, fuzzy, min_score, window):
     """
-    US09: Birth before death of parents
-    Child should be born before death of mother and before 9 months after death of father
-    Returns list of errors found
+    The Duplicates of records under matching (PersonMatching or FamilyMatching): every record with the
+    exact key of an earlier one, in list order, then with fuzzy the pairs of the remaining records
+    sharing a block key that score at least min_score, best first
     """
-    errors = []
-    
-    
-    ind_dict = {ind['ID']: ind for ind in individuals_data}
-    
-    for family in families_data:
-        husband_id = family.get('Husband ID')
-        wife_id = family.get('Wife ID')
-        children = family.get('Children', [])
-        
-        if not children:
-            continue
-        
-        
-        mother_death = None
-        father_death = None
-        father_death_plus_9_months = None
-        
-        if wife_id and wife_id in ind_dict:
-            mother = ind_dict[wife_id]
-            if mother.get('Death') != 'NA':
-                mother_death = datetime.strptime(mother['Death'], '%d %b %Y')
-        
-        if husband_id and husband_id in ind_dict:
-            father = ind_dict[husband_id]
-            if father.get('Death') != 'NA':
-                father_death = datetime.strptime(father['Death'], '%d %b %Y')
-                father_death_plus_9_months = father_death + timedelta(days=NINE_MONTHS_DAYS)  # approximately 9 months
-        
-        
-        for child_id in children:
-            if child_id not in ind_dict:
-                continue
-                
-            child = ind_dict[child_id]
-            birth_date = child.get('Birthday')
-            
-            if birth_date == 'NA':
+    found = []
+    groups = {}  # exact key -> representative number
+    representatives = []
+    positions = []  # position in records of each representative
+    features = []
+    for position, record in enumerate(records):
+        record_features = matching.features(record)
+        key = matching.exact_key(record_features)
+        if key is not None:
+            number = groups.get(key)
+            if number is not None:
+                found.append(Duplicate(representatives[number].get('ID'), record.get('ID'), 1.0, True,
+                                       positions[number], position))
                 continue
-                
-            birth_dt = datetime.strptime(birth_date, '%d %b %Y')
-            
-            
-            if mother_death and birth_dt > mother_death:
-                errors.append(f"ERROR: US09: Child {child['Name']} ({child_id}) born {birth_date} after mother's death {mother['Death']} in family {family['ID']}")
-            
-            
-            if father_death_plus_9_months and birth_dt > father_death_plus_9_months:
-                errors.append(f"ERROR: US09: Child {child['Name']} ({child_id}) born {birth_date} more than 9 months after father's death {father['Death']} in family {family['ID']}")
-    
-    for error in errors:
-        print(error)
-    
-    return errors
+            groups[key] = len(representatives)
+        representatives.append(record)
+        positions.append(position)
+        features.append(record_features)
+    if not fuzzy:
+        return found
 
-def validate_fewer_than_15_siblings(families_data, individuals_data):
+    # Records with the same exact key were matched already, so only their first one is compared
+    near = []
+    similarity = matching.similarity
+    for first, second in candidate_pairs(list(map(matching.sort_key, features)), map(matching.block_keys, features), window):
+        score = similarity(features[first], features[second], min_score)
+        if score >= min_score:
+            near.append((-score, first, second))
+    near.sort()
+    found.extend(Duplicate(representatives[first].get('ID'), representatives[second].get('ID'), round(-negated, 4), False,
+                           positions[first], positions[second])
+                 for negated, first, second in near)
+    return found
+
+
+def find_duplicate_people(individual_list, fuzzy=False, min_score=DUPLICATE_MIN_SCORE, window=DUPLICATE_WINDOW):
     """
-    US15: Fewer than 15 siblings
-    There should be fewer than 15 siblings in a family
+    [Duplicate] for every person with the same name and birth date as an earlier one (US23, score 1),
+    in list order; names match whatever their case, accents and spacing. With fuzzy, then the near
+    duplicates scoring at least min_score (PersonMatching.similarity), best first. Only people sharing
+    a blocking key (PersonMatching.block_keys) are compared, each with at most window others per key
+    """
+    return find_duplicates(individual_list, PersonMatching, fuzzy, min_score, window)
+
+
+def find_duplicate_families(family_list, fuzzy=False, min_score=DUPLICATE_MIN_SCORE, window=DUPLICATE_WINDOW):
+    """
+    [Duplicate] for every family with the same spouse names and marriage date as an earlier one (US24,
+    score 1), in list order. With fuzzy, then the near duplicates scoring at least min_score
+    (FamilyMatching.similarity), best first, among families sharing a blocking key (FamilyMatching.block_keys)
+    """
+    return find_duplicates(family_list, FamilyMatching, fuzzy, min_score, window)
+
+
+def validate_unique_name_and_birth_date(individuals_data):
+    """
+    US23: Unique name and birth date
+    No more than one individual with the same name and birth date should appear in a GEDCOM file
     Returns list of errors found
     """
     errors = []
-    
-    for family in families_data:
-        children = family.get('Children', [])
-        
-        if len(children) >= 15:
-            errors.append(f"ERROR: US15: Family {family['ID']} has {len(children)} children (should be fewer than 15)")
-    
-    for error in errors:
-        print(error)
-    
+    for duplicate in find_duplicate_people(individuals_data):
+        ind = individuals_data[duplicate.duplicate]
+        errors.append(ValidationError('US23', (duplicate.duplicate_id, duplicate.kept_id), (
+            ind.get('Name'), duplicate.duplicate_id, ind.get('Birthday'), duplicate.kept_id)).row())
     return errors
 
 
-def validate_correct_gender_for_role(families_data, individuals_data):
+def validate_unique_families_by_spouses(families_data, individuals_data):
     """
-    US21: Correct gender for role
-    Husband in family should be male and wife in family should be female
+    US24: Unique families by spouses
+    No more than one family with the same spouses by name and the same marriage date should appear in a GEDCOM file
     Returns list of errors found
     """
     errors = []
-    
-    ind_dict = {ind['ID']: ind for ind in individuals_data}
-    
-    for family in families_data:
-        husband_id = family.get('Husband ID')
-        wife_id = family.get('Wife ID')
-        
-        if husband_id and husband_id != 'NA' and husband_id in ind_dict:
-            husband = ind_dict[husband_id]
-            gender = husband.get('Gender', 'NA')
-            if gender != 'M':
-                errors.append(f"ERROR: US21: Husband {husband.get('Name')} ({husband_id}) in family {family['ID']} is not male (Gender: {gender})")
-
-        if wife_id and wife_id != 'NA' and wife_id in ind_dict:
-            wife = ind_dict[wife_id]
-            gender = wife.get('Gender', 'NA')
-            if gender != 'F':
-                errors.append(f"ERROR: US21: Wife {wife.get('Name')} ({wife_id}) in family {family['ID']} is not female (Gender: {gender})")
-    
-    for error in errors:
-        print(error)
-    
+    for duplicate in find_duplicate_families(families_data):
+        fam = families_data[duplicate.duplicate]
+        errors.append(ValidationError('US24', (duplicate.duplicate_id, duplicate.kept_id), (
+            duplicate.duplicate_id, fam.get('Husband Name'), fam.get('Wife Name'), fam.get('Married'), duplicate.kept_id)).row())
     return errors
 
 
+def menu_choices():
+    """The numbered menu entries, one per registered rule in RULES order, then the name search, the one pass run and Exit"""
+    choices = {str(number): rule.menu_title() for number, rule in enumerate(RULES.values(), 1)}
+    choices[str(len(choices) + 1)] = "Search Individuals by Name"
+    choices[str(len(choices) + 1)] = "Run All Family Validations (one pass)"
+    choices[str(len(choices) + 1)] = "Exit"
+    return choices
+
+
 def display_menu():
     """Display the main menu options"""
     print("\n" + "="*60)
     print(" GEDCOM Analysis Menu")
     print("="*60)
-    print("1. Display All Individuals and Families")
-    print("2. List Deceased Individuals")
-    print("3. List Living Married Individuals")
-    print("4. Validate Marriage Before Death (US05)")
-    print("5. Validate Divorce Before Death (US06)")
-    print("6. Validate Marriage After 14 (US10)")
-    print("7. Validate No Bigamy (US11)")
-    print("8. Validate Parent Age Limits (US12)")
-    print("9. List All Single Individuals Over 30 Years Old")
-    print("10. List Upcoming Birthdays ")
-    print("11. List Individuals with the Same Birthday")
-    print("12. Validate Fewer Than 15 Siblings (US15)")
-    print("13. Validate Correct Gender for Role (US21)")
-    print("14. List Orphaned Individuals (US33)")
-    print("15. List Individuals with Younger Spouses (US34)")
-    print("16. List Recent Births - Last 30 Days (US35)")
-    print("17. Siblings Should Not Marry (US18)")
-    print("18. First Cousins Should not Marry (US19)")
-    print("19. Exit")
+    for number, title in menu_choices().items():
+        print(f"{number}. {title}")
     print("="*60)
 
 
-def display_deceased_table(individual_list):
+def display_deceased_table(individual_list, deceased=None):
     """Display deceased individuals in a formatted table"""
-    deceased = list_deceased(individual_list)
+    if deceased is None:
+        deceased = list_deceased(individual_list)
     
     if not deceased:
         print("\nNo deceased individuals found.")
@@ -826,9 +4209,10 @@ def display_deceased_table(individual_list):
     print(table)
 
 
-def display_living_married_table(individual_list):
+def display_living_married_table(individual_list, living_married=None):
     """Display living married individuals in a formatted table"""
-    living_married = list_living_married(individual_list)
+    if living_married is None:
+        living_married = list_living_married(individual_list)
     
     if not living_married:
         print("\nNo living married individuals found.")
@@ -866,9 +4250,10 @@ def display_living_married_table(individual_list):
     print(table)
 
 
-def display_upcoming_birthdays(individual_list, days=30):
-    """Display living individuals with birthdays in the next `days` days (US38)"""
-    upcoming = list_upcoming_birthdays(individual_list, days=days)
+def display_upcoming_birthdays(individual_list, days=30, upcoming=None, as_of=None):
+    """Display living individuals with birthdays in the next `days` days after as_of, default today (US38)"""
+    if upcoming is None:
+        upcoming = list_upcoming_birthdays(individual_list, days=days, as_of=as_of)
     
     if not upcoming:
         print(f"\nNo living individuals have birthdays in the next {days} days.")
@@ -877,17 +4262,12 @@ def display_upcoming_birthdays(individual_list, days=30):
     table = PrettyTable()
     table.field_names = ["ID", "Name", "Birthday", "Days Until Birthday"]
     
-    from datetime import datetime
-    today = datetime.today()
+    today = as_of_date(as_of)
     
     for ind in upcoming:
         bday_str = ind.get('Birthday', 'NA')
         try:
-            birth_date = datetime.strptime(bday_str, "%d %b %Y")
-            next_bday = birth_date.replace(year=today.year)
-            if next_bday < today.replace(hour=0, minute=0, second=0, microsecond=0):
-                next_bday = next_bday.replace(year=today.year + 1)
-            delta_days = (next_bday - today).days
+            delta_days = days_until_birthday(parse_gedcom_date(bday_str), today)
         except ValueError:
             delta_days = 'NA'
         
@@ -902,9 +4282,10 @@ def display_upcoming_birthdays(individual_list, days=30):
     print(table)
 
 
-def display_marriage_validation_errors(family_list, individual_list):
+def display_marriage_validation_errors(family_list, individual_list, index=None, errors=None):
     """Display marriage before death validation errors"""
-    errors = validate_marriage_before_death(family_list, individual_list)
+    if errors is None:
+        errors = validate_marriage_before_death(family_list, individual_list, index)
     
     if not errors:
         print("\nUS05 Validation: No errors found! All marriages occurred before death.")
@@ -928,9 +4309,10 @@ def display_marriage_validation_errors(family_list, individual_list):
     print(table)
 
 
-def display_divorce_validation_errors(family_list, individual_list):
+def display_divorce_validation_errors(family_list, individual_list, index=None, errors=None):
     """Display divorce before death validation errors"""
-    errors = validate__divorce_before_death(family_list, individual_list)
+    if errors is None:
+        errors = validate__divorce_before_death(family_list, individual_list, index)
     
     if not errors:
         print("\nUS06 Validation: No errors found! All divorces occurred before death.")
@@ -954,9 +4336,10 @@ def display_divorce_validation_errors(family_list, individual_list):
     print(table)
 
 
-def display_bigamy_validation_errors(family_list, individual_list):
+def display_bigamy_validation_errors(family_list, individual_list, index=None, errors=None):
     """Display bigamy validation errors"""
-    errors = validate_bigamy(family_list, individual_list)
+    if errors is None:
+        errors = validate_bigamy(family_list, individual_list, index)
     
     if not errors:
         print("\nUS11 Validation: No errors found! No cases of bigamy detected.")
@@ -985,9 +4368,10 @@ def display_bigamy_validation_errors(family_list, individual_list):
     print(table)
 
 
-def display_parent_age_validation_errors(family_list, individual_list):
+def display_parent_age_validation_errors(family_list, individual_list, errors=None):
     """Display parent age limits validation errors"""
-    errors = validate_parent_age_limits(family_list, individual_list)
+    if errors is None:
+        errors = validate_parent_age_limits(family_list, individual_list)
     
     if not errors:
         print("\nUS12 Validation: No errors found! All parents are within acceptable age limits.")
@@ -1028,9 +4412,10 @@ def display_parent_age_validation_errors(family_list, individual_list):
     print(table)
 
 
-def display_marriage_age_validation_errors(family_list, individual_list):
+def display_marriage_age_validation_errors(family_list, individual_list, index=None, errors=None):
     """Display marriage after 14 validation errors"""
-    errors = validate_US10_marriage_after_14(family_list, individual_list)
+    if errors is None:
+        errors = validate_US10_marriage_after_14(family_list, individual_list, index)
     
     if not errors:
         print("\nUS10 Validation: No errors found! All marriages occurred after both spouses were 14 years old.")
@@ -1054,433 +4439,156 @@ def display_marriage_age_validation_errors(family_list, individual_list):
     
     print(f"\nUS10 Validation Errors ({len(errors)} found):")
     print(table)
-def validate_US10_marriage_after_14(family_list, individual_list):
+def validate_US10_marriage_after_14(family_list, individual_list, index=None):
     """
     US10: Marriage after 14
     Marriage should be at least 14 years after birth of both spouses
+    Returns the US10 rows of validate_all
     """
-    errors = []
-    
-    for fam in family_list:
-        married = fam.get('Married', 'NA')
-        husb_id = fam.get('Husband ID', 'NA')
-        wife_id = fam.get('Wife ID', 'NA')
-        
-        if married == 'NA':
-            continue
-        
-        try:
-            marry_date = datetime.strptime(married, "%d %b %Y")
-            
-            # Check husband's age at marriage
-            for ind in individual_list:
-                if ind.get('ID') == husb_id:
-                    birth = ind.get('Birthday', 'NA')
-                    if birth != 'NA':
-                        birth_date = datetime.strptime(birth, "%d %b %Y")
-                        age_at_marriage = (marry_date - birth_date).days / 365.25
-                        if age_at_marriage < MIN_MARRIAGE_AGE:
-                            errors.append({
-                                'Family ID': fam.get('ID'),
-                                'Spouse ID': husb_id,
-                                'Spouse Name': ind.get('Name', 'NA'),
-                                'Role': 'Husband',
-                                'Birth Date': birth,
-                                'Marriage Date': married,
-                                'Age at Marriage': round(age_at_marriage, 1),
-                                'Error': 'Marriage occurred before spouse was 14 years old'
-                            })
-                    break
-            
-            # Check wife's age at marriage
-            for ind in individual_list:
-                if ind.get('ID') == wife_id:
-                    birth = ind.get('Birthday', 'NA')
-                    if birth != 'NA':
-                        birth_date = datetime.strptime(birth, "%d %b %Y")
-                        age_at_marriage = (marry_date - birth_date).days / 365.25
-                        if age_at_marriage < MIN_MARRIAGE_AGE:
-                            errors.append({
-                                'Family ID': fam.get('ID'),
-                                'Spouse ID': wife_id,
-                                'Spouse Name': ind.get('Name', 'NA'),
-                                'Role': 'Wife',
-                                'Birth Date': birth,
-                                'Marriage Date': married,
-                                'Age at Marriage': round(age_at_marriage, 1),
-                                'Error': 'Marriage occurred before spouse was 14 years old'
-                            })
-                    break
-        except ValueError:
-            pass
-    
-    return errors
+    return validate_rule('US10', family_list, individual_list, index)
 
-def validate_bigamy(family_list, individual_list):
+def validate_bigamy(family_list, individual_list, index=None):
     """
     US11: No bigamy
     Marriage should not occur during marriage to another spouse
+    Returns the US11 rows of validate_all
+    """
+    return validate_rule('US11', family_list, individual_list, index)
+
+
+def find_bigamy(individual_marriages, index):
+    """
+    US11 overlap check over each person's marriages, {person ID: [marriage, ...]} in family order.
+    A marriage lasts until the divorce, the person's death or the spouse's death, whichever comes first.
+    Each person's marriages are swept in date order keeping a heap of the ones that have not ended yet,
+    so every overlapping pair is found in O(m log m) plus one step per pair reported. Returns ValidationErrors
     """
     errors = []
-    
-    # Group families by each individual (both husbands and wives)
-    individual_marriages = {}
-    
-    # Collect all marriages for each individual
-    for fam in family_list:
-        fam_id = fam.get('ID', 'NA')
-        married = fam.get('Married', 'NA')
-        divorced = fam.get('Divorced', 'NA')
-        husb_id = fam.get('Husband ID', 'NA')
-        wife_id = fam.get('Wife ID', 'NA')
-        
-        if married == 'NA':
-            continue
-        
-        try:
-            marry_date = datetime.strptime(married, "%d %b %Y")
-            divorce_date = None
-            if divorced != 'NA':
-                divorce_date = datetime.strptime(divorced, "%d %b %Y")
-            
-            # Add marriage for husband
-            if husb_id != 'NA':
-                if husb_id not in individual_marriages:
-                    individual_marriages[husb_id] = []
-                individual_marriages[husb_id].append({
-                    'Family ID': fam_id,
-                    'Marriage Date': marry_date,
-                    'Divorce Date': divorce_date,
-                    'Spouse ID': wife_id,
-                    'Role': 'Husband'
-                })
-            
-            # Add marriage for wife
-            if wife_id != 'NA':
-                if wife_id not in individual_marriages:
-                    individual_marriages[wife_id] = []
-                individual_marriages[wife_id].append({
-                    'Family ID': fam_id,
-                    'Marriage Date': marry_date,
-                    'Divorce Date': divorce_date,
-                    'Spouse ID': husb_id,
-                    'Role': 'Wife'
-                })
-                
-        except ValueError:
-            continue
-    
-    # Check for overlapping marriages for each individual
+    deaths = {}  # person ID -> parsed death date or None, resolved once through the index
+
+    def death_of(person_id):
+        if person_id not in deaths:
+            person = index.person(person_id)
+            deaths[person_id] = None if person is None else parse_known_date(person.get('Death', 'NA'))
+        return deaths[person_id]
+
     for person_id, marriages in individual_marriages.items():
         if len(marriages) < 2:
             continue
-        
+
         # Sort marriages by marriage date
         marriages.sort(key=lambda x: x['Marriage Date'])
-        
-        # Get person's name
-        person_name = 'NA'
-        for ind in individual_list:
-            if ind.get('ID') == person_id:
-                person_name = ind.get('Name', 'NA')
-                break
-        
-        # Check for overlapping marriage periods
-        for i in range(len(marriages)):
-            for j in range(i + 1, len(marriages)):
-                marriage1 = marriages[i]
-                marriage2 = marriages[j]
-                
-                # Determine end date of first marriage
-                end_date1 = marriage1['Divorce Date']
-                if end_date1 is None:
-                    # If no divorce, check if person is deceased
-                    for ind in individual_list:
-                        if ind.get('ID') == person_id and ind.get('Death', 'NA') != 'NA':
-                            try:
-                                end_date1 = datetime.strptime(ind.get('Death'), "%d %b %Y")
-                            except ValueError:
-                                pass
-                            break
-                
-                # If first marriage has no end date (still married or alive), 
-                # any subsequent marriage is bigamy
-                if end_date1 is None:
-                    if marriage2['Marriage Date'] > marriage1['Marriage Date']:
-                        errors.append({
-                            'Person ID': person_id,
-                            'Person Name': person_name,
-                            'Role': marriage1['Role'],
-                            'First Family ID': marriage1['Family ID'],
-                            'First Marriage Date': marriage1['Marriage Date'].strftime("%d %b %Y"),
-                            'Second Family ID': marriage2['Family ID'],
-                            'Second Marriage Date': marriage2['Marriage Date'].strftime("%d %b %Y"),
-                            'Error': 'Bigamy - married while still married to another spouse'
-                        })
-                
-                # If first marriage ended after second marriage started, it's bigamy
-                elif marriage2['Marriage Date'] < end_date1:
-                    errors.append({
-                        'Person ID': person_id,
-                        'Person Name': person_name,
-                        'Role': marriage1['Role'],
-                        'First Family ID': marriage1['Family ID'],
-                        'First Marriage Date': marriage1['Marriage Date'].strftime("%d %b %Y"),
-                        'First End Date': end_date1.strftime("%d %b %Y"),
-                        'Second Family ID': marriage2['Family ID'],
-                        'Second Marriage Date': marriage2['Marriage Date'].strftime("%d %b %Y"),
-                        'Error': 'Bigamy - married before previous marriage ended'
-                    })
-    
-    return errors
 
+        person = index.person(person_id)
+        person_name = 'NA' if person is None else person.get('Name', 'NA')
+        person_death = death_of(person_id)
 
-def validate_parent_age_limits(families_data, individuals_data):
-    """
-    US12: Parents too old
-    Mother should be less than 60 years older than her children and father should be less than 80 years older than his children
-    Returns list of errors found
-    """
-    errors = []
-    
-    # Create dictionary for individuals
-    ind_dict = {ind['ID']: ind for ind in individuals_data}
-    
-    for family in families_data:
-        husband_id = family.get('Husband ID')
-        wife_id = family.get('Wife ID')
-        children = family.get('Children', [])
-        
-        if not children:
-            continue
-        
-        # Get father
-        father = None
-        father_birth = None
-        if husband_id and husband_id in ind_dict:
-            father = ind_dict[husband_id]
-            if father.get('Birthday') != 'NA':
-                father_birth = datetime.strptime(father['Birthday'], '%d %b %Y')
-        
-        # Get mother
-        mother = None
-        mother_birth = None
-        if wife_id and wife_id in ind_dict:
-            mother = ind_dict[wife_id]
-            if mother.get('Birthday') != 'NA':
-                mother_birth = datetime.strptime(mother['Birthday'], '%d %b %Y')
-        
-        # Check each child
-        for child_id in children:
-            if child_id not in ind_dict:
-                continue
-                
-            child = ind_dict[child_id]
-            child_birth_date = child.get('Birthday')
-            
-            if child_birth_date == 'NA':
-                continue
-                
-            child_birth = datetime.strptime(child_birth_date, '%d %b %Y')
-            
-            # Check mother's age
-            if mother_birth:
-                age_diff_mother = (child_birth.year - mother_birth.year - 
-                                  ((child_birth.month, child_birth.day) < (mother_birth.month, mother_birth.day)))
-                if age_diff_mother >= MAX_MOTHER_AGE_DIFF:
-                    errors.append({
-                        'Family ID': family.get('ID'),
-                        'Mother ID': wife_id,
-                        'Mother Name': mother.get('Name', 'NA'),
-                        'Child ID': child_id,
-                        'Child Name': child.get('Name', 'NA'),
-                        'Mother Birthday': mother['Birthday'],
-                        'Child Birthday': child_birth_date,
-                        'Age Difference': age_diff_mother,
-                        'Error': f"US12: Mother {mother.get('Name', 'NA')} is {age_diff_mother} years older than her child {child.get('Name', 'NA')} (should be less than 60)"
-                    })
-            
-            # Check father's age
-            if father_birth:
-                age_diff_father = (child_birth.year - father_birth.year - 
-                                  ((child_birth.month, child_birth.day) < (father_birth.month, father_birth.day)))
-                if age_diff_father >= MAX_FATHER_AGE_DIFF:
-                    errors.append({
-                        'Family ID': family.get('ID'),
-                        'Father ID': husband_id,
-                        'Father Name': father.get('Name', 'NA'),
-                        'Child ID': child_id,
-                        'Child Name': child.get('Name', 'NA'),
-                        'Father Birthday': father['Birthday'],
-                        'Child Birthday': child_birth_date,
-                        'Age Difference': age_diff_father,
-                        'Error': f"US12: Father {father.get('Name', 'NA')} is {age_diff_father} years older than his child {child.get('Name', 'NA')} (should be less than 80)"
-                    })
-    
-    return errors
-def validate_US18_siblings_should_not_marry(family_list, individual_list):
-    """
-    US18: Siblings should not marry one another
-    
-    How it works:
-    1. Build a map of siblings (people who share same parents)
-    2. Check if any married couple are in each other's sibling list
-    3. Report errors for sibling marriages
-    """
-    errors = []
-    
-    # Step 1: Build sibling map - Key: person_id, Value: list of sibling IDs
-    sibling_map = {}
-    
-    for fam in family_list:
-        children = fam.get('Children', [])
-        
-        # Need at least 2 children to have siblings
-        if not children or len(children) < 2:
-            continue
-        
-        # For each child, add all other children as siblings
-        for child_id in children:
-            if child_id not in sibling_map:
-                sibling_map[child_id] = []
-            
-            for other_child in children:
-                if other_child != child_id and other_child not in sibling_map[child_id]:
-                    sibling_map[child_id].append(other_child)
-    
-    # Step 2: Check each family for sibling marriages
-    for fam in family_list:
-        husb_id = fam.get('Husband ID', 'NA')
-        wife_id = fam.get('Wife ID', 'NA')
-        
-        if husb_id == 'NA' or wife_id == 'NA':
-            continue
-        
-        # Check if husband and wife are siblings
-        if husb_id in sibling_map and wife_id in sibling_map[husb_id]:
-            # Get names
-            husb_name = 'Unknown'
-            wife_name = 'Unknown'
-            
-            for ind in individual_list:
-                if ind.get('ID') == husb_id:
-                    husb_name = ind.get('Name', 'Unknown')
-                elif ind.get('ID') == wife_id:
-                    wife_name = ind.get('Name', 'Unknown')
-            
-            errors.append({
-                'Family ID': fam.get('ID'),
-                'Husband ID': husb_id,
-                'Husband Name': husb_name,
-                'Wife ID': wife_id,
-                'Wife Name': wife_name,
-                'Error': 'US18: Siblings should not marry each other'
-            })
-    
-    return errors
+        pairs = []
+        ended_later = []  # heap of (end ordinal, position) of marriages that end at some point
+        ongoing = []      # positions of marriages that never ended
+        for position, marriage in enumerate(marriages):
+            start = marriage['Marriage Date']
+            while ended_later and ended_later[0][0] <= start.ordinal:
+                heappop(ended_later)
 
+            # Still open when this one starts. A marriage that never ended only counts from the next day on
+            pairs.extend((first, position) for end, first in ended_later)
+            pairs.extend((first, position) for first in ongoing if marriages[first]['Marriage Date'] < start)
+
+            ends = [end for end in (marriage['Divorce Date'], person_death, death_of(marriage['Spouse ID'])) if end is not None]
+            if ends:
+                end = min(ends)
+                marriage['End Date'] = end
+                heappush(ended_later, (end.ordinal, position))
+            else:
+                marriage['End Date'] = None
+                ongoing.append(position)
+
+        # Report in the order of the pairwise check this replaced
+        pairs.sort()
+        for first, second in pairs:
+            marriage1 = marriages[first]
+            marriage2 = marriages[second]
+            args = (person_id, person_name, marriage1['Role'], marriage1['Family ID'], marriage1['Marriage Date'],
+                    marriage2['Family ID'], marriage2['Marriage Date'])
+            record_ids = (person_id, marriage1['Family ID'], marriage2['Family ID'])
+            if marriage1['End Date'] is None:
+                errors.append(ValidationError('US11-ongoing', record_ids, args))
+            else:
+                errors.append(ValidationError('US11-ended', record_ids, args + (marriage1['End Date'],)))
+
+    return errors
+
+
+def validate_parent_age_limits(families_data, individuals_data):
+    """
+    US12: Parents too old
+    Mother should be less than 60 years older than her children and father should be less than 80 years older than his children
+    Returns the US12 rows of validate_all
+    """
+    return validate_rule('US12', families_data, individuals_data, None)
+
+
+def validate_US18_siblings_should_not_marry(family_list, individual_list, index=None):
+    """
+    US18: Siblings should not marry one another
+    Siblings share a family as children, or one parent (half siblings); see Ancestry
+    Returns the US18 rows of validate_all
+    """
+    return validate_rule('US18', family_list, individual_list, index)
+
+
+def validate_US19_first_cousins_should_not_marry(family_list, individual_list, index=None):
+    """
+    US19: First cousins should not marry one another
+    First cousins share grandparents (or a grandparents' family) without being siblings; see Ancestry
+    Returns the US19 rows of validate_all
+    """
+    return validate_rule('US19', family_list, individual_list, index)
+
+
+def validate_related_spouses(family_list, individual_list, index=None, degree=3):
+    """
+    Couples related within degree (1 siblings, 2 first cousins, 3 second cousins, ...),
+    each reported once at their closest degree, siblings as US18 and cousins as US19
+    """
+    errors = []
+    if index is None:
+        index = GedcomIndex(individual_list, family_list)
+    ancestry = index.ancestry()
+
+    # The ancestor sets stay memoized on the index, the collector would only rescan them
+    with paused_gc():
+        for fam in family_list:
+            husb_id = fam.get('Husband ID', 'NA')
+            wife_id = fam.get('Wife ID', 'NA')
+
+            if husb_id == 'NA' or wife_id == 'NA':
+                continue
+
+            closest = ancestry.relation_degree(husb_id, wife_id, degree)
+            if closest is not None:
+                kind = 'US18-related' if closest == 1 else 'US19-related'
+                args = spouse_relation_args(fam, index) + (closest, ancestry.relation_name(closest))
+                errors.append(ValidationError(kind, (fam.get('ID'), husb_id, wife_id), args).row())
 
-def validate_US19_first_cousins_should_not_marry(family_list, individual_list):
-   
-    errors = []
-    
-    # Step 1: Build parent map - Key: child_id, Value: {'father': id, 'mother': id, 'family': id}
-    parent_map = {}
-    
-    for fam in family_list:
-        fam_id = fam.get('ID')
-        father_id = fam.get('Husband ID', 'NA')
-        mother_id = fam.get('Wife ID', 'NA')
-        children = fam.get('Children', [])
-        
-        for child_id in children:
-            parent_map[child_id] = {
-                'father': father_id,
-                'mother': mother_id,
-                'family': fam_id
-            }
-    
-    # Step 2: Build sibling map (from US18 logic)
-    sibling_map = {}
-    
-    for fam in family_list:
-        children = fam.get('Children', [])
-        
-        if not children or len(children) < 2:
-            continue
-        
-        for child_id in children:
-            if child_id not in sibling_map:
-                sibling_map[child_id] = []
-            
-            for other_child in children:
-                if other_child != child_id and other_child not in sibling_map[child_id]:
-                    sibling_map[child_id].append(other_child)
-    
-    # Step 3: Build cousin map - Key: person_id, Value: list of cousin IDs
-    cousin_map = {}
-    
-    for person_id, parents in parent_map.items():
-        father_id = parents['father']
-        mother_id = parents['mother']
-        
-        if person_id not in cousin_map:
-            cousin_map[person_id] = []
-        
-        # Find father's siblings
-        father_siblings = sibling_map.get(father_id, [])
-        
-        # Find mother's siblings
-        mother_siblings = sibling_map.get(mother_id, [])
-        
-        # Combine all aunts/uncles
-        aunts_uncles = father_siblings + mother_siblings
-        
-        # Find all children of aunts/uncles (these are cousins)
-        for aunt_uncle_id in aunts_uncles:
-            # Find families where this aunt/uncle is a parent
-            for fam in family_list:
-                if (fam.get('Husband ID') == aunt_uncle_id or 
-                    fam.get('Wife ID') == aunt_uncle_id):
-                    # All children of this aunt/uncle are cousins
-                    for cousin_id in fam.get('Children', []):
-                        if cousin_id != person_id and cousin_id not in cousin_map[person_id]:
-                            cousin_map[person_id].append(cousin_id)
-    
-    # Step 4: Check each family for cousin marriages
-    for fam in family_list:
-        husb_id = fam.get('Husband ID', 'NA')
-        wife_id = fam.get('Wife ID', 'NA')
-        
-        if husb_id == 'NA' or wife_id == 'NA':
-            continue
-        
-        # Check if husband and wife are cousins
-        if husb_id in cousin_map and wife_id in cousin_map[husb_id]:
-            # Get names
-            husb_name = 'Unknown'
-            wife_name = 'Unknown'
-            
-            for ind in individual_list:
-                if ind.get('ID') == husb_id:
-                    husb_name = ind.get('Name', 'Unknown')
-                elif ind.get('ID') == wife_id:
-                    wife_name = ind.get('Name', 'Unknown')
-            
-            errors.append({
-                'Family ID': fam.get('ID'),
-                'Husband ID': husb_id,
-                'Husband Name': husb_name,
-                'Wife ID': wife_id,
-                'Wife Name': wife_name,
-                'Error': 'US19: First cousins should not marry each other'
-            })
-    
     return errors
 
-def display_us18_validation_errors(family_list, individual_list):
+
+def spouse_relation_args(fam, index):
+    """The SPOUSE_ERROR_KEYS values for the couple in fam"""
+    husb_id = fam.get('Husband ID', 'NA')
+    wife_id = fam.get('Wife ID', 'NA')
+    husband = index.person(husb_id)
+    wife = index.person(wife_id)
+    return (fam.get('ID'), husb_id, 'Unknown' if husband is None else husband.get('Name', 'Unknown'),
+            wife_id, 'Unknown' if wife is None else wife.get('Name', 'Unknown'))
+
+
+def display_us18_validation_errors(family_list, individual_list, index=None, errors=None):
     """Display US18 (sibling marriage) validation errors"""
-    errors = validate_US18_siblings_should_not_marry(family_list, individual_list)
+    if errors is None:
+        errors = validate_US18_siblings_should_not_marry(family_list, individual_list, index)
     
     if not errors:
         print("\nUS18 Validation: No errors found! No siblings married each other.")
@@ -1503,9 +4611,10 @@ def display_us18_validation_errors(family_list, individual_list):
     print(table)
 
 
-def display_us19_validation_errors(family_list, individual_list):
+def display_us19_validation_errors(family_list, individual_list, index=None, errors=None):
     """Display US19 (cousin marriage) validation errors"""
-    errors = validate_US19_first_cousins_should_not_marry(family_list, individual_list)
+    if errors is None:
+        errors = validate_US19_first_cousins_should_not_marry(family_list, individual_list, index)
     
     if not errors:
         print("\nUS19 Validation: No errors found! No first cousins married each other.")
@@ -1527,171 +4636,984 @@ def display_us19_validation_errors(family_list, individual_list):
     print(f"\nUS19 Validation Errors ({len(errors)} found):")
     print(table)
 
-def run_menu(individuals, families):
-    """Run the interactive menu"""
+def parse_known_date(text):
+    """The parsed date, or None when text is missing, 'NA' or not a GEDCOM date"""
+    if text is None or text == 'NA':
+        return None
+    try:
+        return parse_gedcom_date(text)
+    except ValueError:
+        return None
+
+
+def person_facts(person_id, index, people):
+    """(record, parsed birthday, parsed death) for person_id, or three Nones; people caches them for the run"""
+    facts = people.get(person_id)
+    if facts is None:
+        person = index.person(person_id)
+        if person is None:
+            facts = (None, None, None)
+        else:
+            facts = (person, parse_known_date(person.get('Birthday', 'NA')), parse_known_date(person.get('Death', 'NA')))
+        people[person_id] = facts
+    return facts
+
+
+class FamilyContext:
+    """
+    One family with its spouses, children and dates looked up and parsed once, shared by
+    every rule validate_all runs on it. children only holds the children that are in the
+    tree and have a birthday, the only ones the child rules can check; it is left empty
+    when with_children is False because none of the rules being run reads it
+    """
+    __slots__ = ('family', 'family_id', 'husband_id', 'wife_id', 'husband', 'wife', 'married', 'divorced',
+                 'divorced_text', 'husband_birth', 'husband_death', 'wife_birth', 'wife_death', 'spouses',
+                 'child_ids', 'children', 'relation')
+
+    def __init__(self, fam, index, people, with_children=True):
+        self.family = fam
+        self.family_id = fam.get('ID')
+        self.husband_id = husband_id = fam.get('Husband ID', 'NA')
+        self.wife_id = wife_id = fam.get('Wife ID', 'NA')
+        self.married = parse_known_date(fam.get('Married', 'NA'))
+        self.divorced_text = fam.get('Divorced', 'NA')
+        self.divorced = parse_known_date(self.divorced_text)
+        self.husband, self.husband_birth, self.husband_death = person_facts(husband_id, index, people)
+        self.wife, self.wife_birth, self.wife_death = person_facts(wife_id, index, people)
+
+        # (role, ID, record, birth, death) for each spouse in the tree, husband first
+        self.spouses = []
+        if self.husband is not None:
+            self.spouses.append(('Husband', husband_id, self.husband, self.husband_birth, self.husband_death))
+        if self.wife is not None:
+            self.spouses.append(('Wife', wife_id, self.wife, self.wife_birth, self.wife_death))
+
+        self.relation = False  # not looked up yet, see spouse_relation
+        self.child_ids = fam.get('Children', [])
+        self.children = []  # (child ID, record, parsed birthday)
+        for child_id in self.child_ids if with_children else ():
+            child, birth, death = person_facts(child_id, index, people)
+            if birth is not None:
+                self.children.append((child_id, child, birth))
+
+    def spouse_relation(self, index):
+        """How closely the spouses are related, up to first cousins (Ancestry.relation_degree), looked up once for US18 and US19"""
+        if self.relation is False:
+            self.relation = None
+            if self.husband_id != 'NA' and self.wife_id != 'NA':
+                self.relation = index.ancestry().relation_degree(self.husband_id, self.wife_id, 2)
+        return self.relation
+
+
+def check_marriage_before_death(context, index, errors):
+    """US05 for one family"""
+    if context.married is None:
+        return
+    fam = context.family
+    for role, spouse_id, spouse, birth, death in context.spouses:
+        if death is not None and context.married >= death:
+            errors.append(ValidationError('US05', (context.family_id, spouse_id), (
+                context.family_id, spouse_id, spouse.get('Name', 'NA'), role, fam.get('Married'), spouse.get('Death'))))
+
+
+def check_divorce_before_death(context, index, errors):
+    """US06 for one family"""
+    if context.divorced is None:
+        return
+    fam = context.family
+    for role, spouse_id, spouse, birth, death in context.spouses:
+        if death is not None and context.divorced >= death:
+            errors.append(ValidationError('US06', (context.family_id, spouse_id), (
+                context.family_id, spouse_id, spouse.get('Name', 'NA'), role, fam.get('Divorced'), spouse.get('Death'))))
+
+
+def check_birth_before_marriage_of_parents(context, index, errors):
+    """US08 for one family"""
+    if context.married is None:
+        return
+    fam = context.family
+    divorce_plus_9_months = None
+    if context.divorced is not None:
+        divorce_plus_9_months = context.divorced.ordinal + NINE_MONTHS_DAYS
+
+    for child_id, child, birth in context.children:
+        if birth < context.married:
+            errors.append(ValidationError('US08-marriage', (fam['ID'], child_id), (
+                child['Name'], child_id, child.get('Birthday'), fam.get('Married'), fam['ID'])))
+        if divorce_plus_9_months and birth.ordinal > divorce_plus_9_months:
+            errors.append(ValidationError('US08-divorce', (fam['ID'], child_id), (
+                child['Name'], child_id, child.get('Birthday'), fam.get('Divorced'), fam['ID'])))
+
+
+def check_birth_before_death_of_parents(context, index, errors):
+    """US09 for one family"""
+    mother_death = context.wife_death
+    father_death = context.husband_death
+    if mother_death is None and father_death is None:
+        return
+    fam = context.family
+
+    for child_id, child, birth in context.children:
+        if mother_death is not None and birth > mother_death:
+            errors.append(ValidationError('US09-mother', (fam['ID'], child_id, context.wife_id), (
+                child['Name'], child_id, child.get('Birthday'), context.wife['Death'], fam['ID'])))
+        if father_death is not None and birth.ordinal > father_death.ordinal + NINE_MONTHS_DAYS:
+            errors.append(ValidationError('US09-father', (fam['ID'], child_id, context.husband_id), (
+                child['Name'], child_id, child.get('Birthday'), context.husband['Death'], fam['ID'])))
+
+
+def check_marriage_after_14(context, index, errors):
+    """US10 for one family"""
+    if context.married is None:
+        return
+    fam = context.family
+    for role, spouse_id, spouse, birth, death in context.spouses:
+        if birth is None:
+            continue
+        age_at_marriage = (context.married.ordinal - birth.ordinal) / 365.25
+        if age_at_marriage < MIN_MARRIAGE_AGE:
+            errors.append(ValidationError('US10', (context.family_id, spouse_id), (
+                context.family_id, spouse_id, spouse.get('Name', 'NA'), role, spouse.get('Birthday'),
+                fam.get('Married'), round(age_at_marriage, 1))))
+
+
+def collect_marriages(context, index, individual_marriages):
+    """US11 first half: add the family's marriage to both spouses, find_bigamy checks them once all families are seen"""
+    fam = context.family
+    if context.married is None or (context.divorced is None and context.divorced_text != 'NA'):
+        return
+    for role, spouse_id, other_id in (('Husband', context.husband_id, context.wife_id),
+                                      ('Wife', context.wife_id, context.husband_id)):
+        if spouse_id != 'NA':
+            individual_marriages.setdefault(spouse_id, []).append({
+                'Family ID': context.family_id if context.family_id is not None else 'NA',
+                'Marriage Date': context.married,
+                'Divorce Date': context.divorced,
+                'Spouse ID': other_id,
+                'Role': role
+            })
+
+
+def check_parent_age_limits(context, index, errors):
+    """US12 for one family"""
+    fam = context.family
+    for child_id, child, birth in context.children:
+        for parent, parent_id, parent_birth, limit, kind in (
+                (context.wife, context.wife_id, context.wife_birth, MAX_MOTHER_AGE_DIFF, 'US12-mother'),
+                (context.husband, context.husband_id, context.husband_birth, MAX_FATHER_AGE_DIFF, 'US12-father')):
+            if parent_birth is None:
+                continue
+            age_diff = birth.year - parent_birth.year - ((birth.month, birth.day) < (parent_birth.month, parent_birth.day))
+            if age_diff >= limit:
+                errors.append(ValidationError(kind, (fam.get('ID'), parent_id, child_id), (
+                    fam.get('ID'), parent_id, parent.get('Name', 'NA'), child_id, child.get('Name', 'NA'),
+                    parent['Birthday'], child.get('Birthday'), age_diff)))
+
+
+def check_fewer_than_15_siblings(context, index, errors):
+    """US15 for one family"""
+    if len(context.child_ids) >= 15:
+        errors.append(ValidationError('US15', (context.family_id,), (context.family_id, len(context.child_ids))))
+
+
+def check_siblings_should_not_marry(context, index, errors):
+    """US18 for one family"""
+    if context.spouse_relation(index) == 1:
+        errors.append(ValidationError('US18', (context.family_id, context.husband_id, context.wife_id),
+                                      spouse_relation_args(context.family, index)))
+
+
+def check_first_cousins_should_not_marry(context, index, errors):
+    """US19 for one family"""
+    if context.spouse_relation(index) == 2:
+        errors.append(ValidationError('US19', (context.family_id, context.husband_id, context.wife_id),
+                                      spouse_relation_args(context.family, index)))
+
+
+def check_correct_gender_for_role(context, index, errors):
+    """US21 for one family"""
+    fam = context.family
+    for role, spouse_id, spouse, birth, death in context.spouses:
+        gender = spouse.get('Gender', 'NA')
+        if role == 'Husband' and gender != 'M':
+            errors.append(ValidationError('US21-husband', (fam['ID'], spouse_id), (spouse.get('Name'), spouse_id, fam['ID'], gender)))
+        elif role == 'Wife' and gender != 'F':
+            errors.append(ValidationError('US21-wife', (fam['ID'], spouse_id), (spouse.get('Name'), spouse_id, fam['ID'], gender)))
+
+
+# The rules validate_all runs, each called once per family with that family's FamilyContext
+FAMILY_RULES = {
+    'US05': check_marriage_before_death,
+    'US06': check_divorce_before_death,
+    'US08': check_birth_before_marriage_of_parents,
+    'US09': check_birth_before_death_of_parents,
+    'US10': check_marriage_after_14,
+    'US11': collect_marriages,
+    'US12': check_parent_age_limits,
+    'US15': check_fewer_than_15_siblings,
+    'US18': check_siblings_should_not_marry,
+    'US19': check_first_cousins_should_not_marry,
+    'US21': check_correct_gender_for_role,
+}
+
+
+def check_born_before_marriage(ind, index, today, errors):
+    """US02 for one person: born before each of their marriages"""
+    if ind.get('Spouse') == 'NA':
+        return
+    born = parse_known_date(ind.get('Birthday'))
+    if born is None:
+        return
+    for fam in index.families_as_spouse(ind.get('ID')):
+        married = parse_known_date(fam.get('Married'))
+        if married is not None and born > married:
+            errors.append(ValidationError('US02', (ind.get('ID'), fam.get('ID')), (
+                ind.get('ID'), ind.get('Name'), ind.get('Birthday'), fam.get('Married'))))
+
+
+def check_less_than_150_years(ind, index, today, errors):
+    """US07 for one person: the dead lived less than 150 years, the living are younger than 150 on today"""
+    birthday = ind.get('Birthday', 'NA')
+    death = ind.get('Death', 'NA')
+    born = parse_known_date(birthday)
+    if born is None:
+        return
+    if death != 'NA':
+        died = parse_known_date(death)
+        if died is not None and (died.ordinal - born.ordinal) / 365.25 >= MAX_AGE_YEARS:
+            errors.append(ValidationError('US07-dead', (ind.get('ID'),), (ind.get('Name'), birthday, death)))
+    elif (today.toordinal() - born.ordinal) / 365.25 >= MAX_AGE_YEARS:
+        errors.append(ValidationError('US07-alive', (ind.get('ID'),), (ind.get('Name'), birthday, today)))
+
+
+# The rules checked once per person, the way FAMILY_RULES are checked once per family
+PERSON_RULES = {
+    'US02': check_born_before_marriage,
+    'US07': check_less_than_150_years,
+}
+
+
+def check_people(individual_list, index, rules=None, sink=None, today=None, budget=None):
+    """
+    The PERSON_RULES (or the IDs in rules) in one pass over individual_list, as of the day today
+    (default the index's as-of day, or today without an index), within budget (a ValidationBudget)
+    when given. Returns {rule ID: ValidationErrors}; when sink is given every error goes there instead
+    """
+    if today is None:
+        today = index.today() if index is not None else date.today()
+    elif isinstance(today, str):
+        today = as_of_date(today)
+    checks = [(rule, check) for rule, check in PERSON_RULES.items() if rules is None or rule in rules]
+    found = {rule: [] if sink is None else sink for rule, check in checks}
+    if budget is not None:
+        def check_person(ind, active):
+            for rule, check, errors in active:
+                check(ind, index, today, errors)
+        budget.run(individual_list, checks, found, check_person, 'people')
+        return found
+    for ind in individual_list:
+        for rule, check in checks:
+            check(ind, index, today, found[rule])
+    return found
+
+
+def check_families(family_list, index, rules=None, sink=None, budget=None):
+    """
+    The single pass of validate_all over family_list, within budget (a ValidationBudget) when
+    given. Returns {rule ID: ValidationErrors}; when sink is given every error goes there instead.
+    US11 is left as the {person ID: marriages} validate_all hands to find_bigamy once every
+    family has been seen
+    """
+    checks = [(rule, check) for rule, check in FAMILY_RULES.items() if rules is None or rule in rules]
+    found = {rule: {} if rule == 'US11' else [] if sink is None else sink for rule, check in checks}
+    if not checks:
+        return {}
+    with_children = any('children' in RULES[rule].needs for rule, check in checks)
+    people = {}
+
+    # The per person cache and the errors stay alive until the end, so the collector would only rescan them
+    with paused_gc():
+        if budget is not None:
+            def check_family(fam, active):
+                context = FamilyContext(fam, index, people, with_children)
+                for rule, check, errors in active:
+                    check(context, index, errors)
+            budget.run(family_list, checks, found, check_family, 'families', collecting=('US11',))
+            return found
+        for fam in family_list:
+            context = FamilyContext(fam, index, people, with_children)
+            for rule, check in checks:
+                check(context, index, found[rule])
+    return found
+
+
+def validate_all(family_list, individual_list, index=None, rules=None, backend='python', budget=None):
+    """
+    Run the family rules (all of FAMILY_RULES, or the IDs in rules) in one pass over family_list.
+    Each family's spouses, children and dates are looked up once and shared by every rule.
+    With backend='numpy' the DATE_RULES among them run over DateColumns instead (see validate_dates).
+    With a ValidationBudget the run stops early or samples as it says, and budget.coverage tells
+    which results are partial.
+    Returns {rule ID: errors} with the same errors the single rule validators return, without printing
+    """
+    return error_rows(validate_all_errors(family_list, individual_list, index, rules, backend, budget))
+
+
+def validate_all_errors(family_list, individual_list, index=None, rules=None, backend='python', budget=None):
+    """validate_all with the errors left as ValidationErrors"""
+    if index is None:
+        index = GedcomIndex(individual_list, family_list)
+    dated, rules = split_date_rules(family_list, index, rules, backend, budget)
+    found = check_families(family_list, index, rules, budget=budget)
+
+    if 'US11' in found:
+        found['US11'] = find_bigamy(found['US11'], index)
+        if budget is not None:
+            found['US11'] = budget.admit('US11', found['US11'])
+    return merge_date_rules(found, dated)
+
+
+def stream_validation(sink, family_list, individual_list, index=None, rules=None, backend='python', today=None,
+                      budget=None):
+    """
+    Run the family and person rules (all of FAMILY_RULES and PERSON_RULES, or the IDs in rules)
+    and hand every ValidationError to sink as soon as it is found, without keeping them.
+    Family errors arrive in family order, US11 once all families are seen, then the person rules.
+    With backend='numpy' the DATE_RULES errors come first, rule by rule and each in family order,
+    and the other family rules follow family by family.
+    With a ValidationBudget, sink.report_coverage gets budget.coverage at the end.
+    Returns sink, which the caller closes
+    """
+    if index is None:
+        index = GedcomIndex(individual_list, family_list)
+    family_rules = [rule for rule in FAMILY_RULES if rules is None or rule in rules]
+    person_rules = [rule for rule in PERSON_RULES if rules is None or rule in rules]
+
+    dated, family_rules = split_date_rules(family_list, index, family_rules, backend, budget)
+    for errors in dated.values():
+        sink.extend(errors)
+    found = check_families(family_list, index, family_rules, sink, budget)
+    if 'US11' in found:
+        bigamy = find_bigamy(found['US11'], index)
+        sink.extend(bigamy if budget is None else budget.admit('US11', bigamy))
+    if person_rules:
+        check_people(individual_list, index, person_rules, sink, today, budget)
+    if budget is not None:
+        sink.report_coverage(budget.coverage)
+    return sink
+
+
+# The rules DateColumns can evaluate as array comparisons
+DATE_RULES = ('US05', 'US06', 'US08', 'US09', 'US10', 'US12')
+BACKENDS = ('python', 'numpy')
+
+
+class DateColumns:
+    """
+    The dates the chronology rules compare, as NumPy int32 day ordinal columns with NO_DAY for
+    missing dates: birth and death (plus birth year and month * 32 + day, for US12) per person row,
+    married, divorced, husband row and wife row per family in family_list order, and a
+    (family position, child row) pair for every child in the tree with a birthday, the children
+    FamilyContext keeps. IDs that are not in the tree point at an extra last row without dates
+    """
+    __slots__ = ('family_list', 'birth', 'death', 'birth_year', 'birth_day', 'married', 'divorced',
+                 'husband', 'wife', 'child_family', 'child')
+
+    def __init__(self, family_list, index):
+        if numpy is None:
+            raise ImportError("the numpy validation backend needs NumPy (pip install numpy)")
+        self.family_list = family_list
+
+        people = list(index.individuals.values())
+        rows = dict(zip(index.individuals, range(len(people))))
+        absent = len(people)
+        births = [person.get('Birthday', 'NA') for person in people]
+        deaths = [person.get('Death', 'NA') for person in people]
+        marriages = [fam.get('Married', 'NA') for fam in family_list]
+        divorces = [fam.get('Divorced', 'NA') for fam in family_list]
+
+        # Each distinct date string is parsed once; trees repeat the same dates a lot
+        days = {}
+        for text in set(chain(births, deaths, marriages, divorces)):
+            day = parse_known_date(text)
+            days[text] = (NO_DAY, 0, 0) if day is None else (day.ordinal, day.year, day.month * 32 + day.day)
+        birth_days = [days[text] for text in births]
+        birth_days.append((NO_DAY, 0, 0))
+
+        self.birth = self.column(day[0] for day in birth_days)
+        self.birth_year = self.column(day[1] for day in birth_days)
+        self.birth_day = self.column(day[2] for day in birth_days)
+        self.death = self.column(chain((days[text][0] for text in deaths), [NO_DAY]))
+        self.married = self.column(days[text][0] for text in marriages)
+        self.divorced = self.column(days[text][0] for text in divorces)
+        self.husband = self.column(rows.get(fam.get('Husband ID', 'NA'), absent) for fam in family_list)
+        self.wife = self.column(rows.get(fam.get('Wife ID', 'NA'), absent) for fam in family_list)
+
+        child_family, child = array('i'), array('i')
+        for position, fam in enumerate(family_list):
+            for child_id in fam.get('Children', []):
+                row = rows.get(child_id)
+                if row is not None and birth_days[row][0] != NO_DAY:
+                    child_family.append(position)
+                    child.append(row)
+        self.child_family = self.column(child_family)
+        self.child = self.column(child)
+
+    @staticmethod
+    def column(values):
+        return numpy.array(values if isinstance(values, array) else array('i', values), dtype=numpy.int32)
+
+    def flagged_families(self, rule):
+        """The family_list positions, in order, of the families where rule (one of DATE_RULES) has something to report"""
+        birth, death, husband, wife = self.birth, self.death, self.husband, self.wife
+        if rule in ('US05', 'US06', 'US10'):
+            day = self.divorced if rule == 'US06' else self.married
+            hits = numpy.zeros(len(day), dtype=bool)
+            for spouse in (husband, wife):
+                if rule == 'US10':
+                    born = birth[spouse]
+                    hits |= (born != NO_DAY) & ((day - born) / 365.25 < MIN_MARRIAGE_AGE)
+                else:
+                    died = death[spouse]
+                    hits |= (died != NO_DAY) & (day >= died)
+            return numpy.flatnonzero(hits & (day != NO_DAY))
+
+        families = self.child_family
+        born = birth[self.child]
+        if rule == 'US08':
+            married, divorced = self.married[families], self.divorced[families]
+            hits = (married != NO_DAY) & ((born < married) | ((divorced != NO_DAY) & (born > divorced + NINE_MONTHS_DAYS)))
+        elif rule == 'US09':
+            mother, father = death[wife[families]], death[husband[families]]
+            hits = ((mother != NO_DAY) & (born > mother)) | ((father != NO_DAY) & (born > father + NINE_MONTHS_DAYS))
+        elif rule == 'US12':
+            year, day = self.birth_year[self.child], self.birth_day[self.child]
+            hits = numpy.zeros(len(families), dtype=bool)
+            for parents, limit in ((wife, MAX_MOTHER_AGE_DIFF), (husband, MAX_FATHER_AGE_DIFF)):
+                parent = parents[families]
+                age_diff = year - self.birth_year[parent] - (day < self.birth_day[parent])
+                hits |= (birth[parent] != NO_DAY) & (age_diff >= limit)
+        else:
+            raise ValueError(f"{rule} is not one of the date rules {', '.join(DATE_RULES)}")
+        return numpy.unique(families[hits])
+
+
+def validate_dates(columns, index, rules=DATE_RULES):
+    """
+    The chronology rules over DateColumns. The array comparisons only pick the families with
+    something to report; the rule's own check then builds the error records for those families,
+    so the errors are the same as validate_all_errors'. Returns {rule ID: ValidationErrors}
+    """
+    found = {}
+    contexts = {}
+    people = {}
+    with paused_gc():
+        for rule in rules:
+            check = FAMILY_RULES[rule]
+            errors = found[rule] = []
+            for position in columns.flagged_families(rule).tolist():
+                context = contexts.get(position)
+                if context is None:
+                    context = contexts[position] = FamilyContext(columns.family_list[position], index, people)
+                check(context, index, errors)
+    return found
+
+
+def split_date_rules(family_list, index, rules, backend, budget=None):
+    """
+    For backend='numpy', run the DATE_RULES among rules with validate_dates. Returns their
+    {rule ID: errors} and the rules that are left for check_families. A budgeted run leaves
+    them all to check_families, the array pass always covers the whole tree
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown validation backend {backend!r}, choose from {', '.join(BACKENDS)}")
+    if backend == 'python' or budget is not None:
+        return {}, rules
+    selected = [rule for rule in FAMILY_RULES if rules is None or rule in rules]
+    with paused_gc():
+        columns = DateColumns(family_list, index)
+    dated = validate_dates(columns, index, [rule for rule in selected if rule in DATE_RULES])
+    return dated, [rule for rule in selected if rule not in dated]
+
+
+def merge_date_rules(found, dated):
+    """found and the validate_dates results in one dict, in FAMILY_RULES order"""
+    if not dated:
+        return found
+    return {rule: dated[rule] if rule in dated else found[rule] for rule in FAMILY_RULES if rule in dated or rule in found}
+
+
+# The tree the validation workers check, set once in each worker process by startValidationWorker
+worker_tree = None
+
+
+def startValidationWorker(family_list, index):
+    """
+    Pool initializer: keep the tree for checkFamilyShard. Each worker gets it once, inherited
+    under fork and pickled once per worker under spawn or forkserver; the shards only send bounds
+    """
+    global worker_tree
+    worker_tree = (family_list, index)
+
+
+def checkFamilyShard(start, end, rules):
+    """check_families on family_list[start:end] of the worker's tree (runs inside a worker process)"""
+    family_list, index = worker_tree
+    found = check_families(family_list[start:end], index, rules)
+    if 'US11' in found:
+        # Only people with two or more families can be bigamists, so leave the rest out of the reply
+        found['US11'] = {person_id: marriages for person_id, marriages in found['US11'].items()
+                         if len(index.families_as_spouse(person_id)) > 1 or len(marriages) > 1}
+    return found
+
+
+def validate_all_parallel(family_list, individual_list, index=None, rules=None, jobs=None,
+                          min_shard_families=PARALLEL_MIN_SHARD_FAMILIES, backend='python', mp_context=None):
+    """
+    validate_all with the families split into contiguous shards checked in a pool of worker processes.
+    Every worker sees the whole index, so the per family rules (US18 and US19 included) only need
+    their shard. The shards come back in order and are concatenated; US11 marriages are merged in
+    family order too and find_bigamy runs over them once all shards are in. The result is the same as validate_all.
+    With backend='numpy' the date rules run vectorized in this process and only the others are sharded.
+    mp_context is the multiprocessing context of the pool (the platform's default start method when None),
+    any start method gives the same result
+    """
+    jobs = jobs or os.cpu_count() or 1
+    shards = min(jobs, len(family_list) // max(min_shard_families, 1))
+
+    if shards < 2:
+        return validate_all(family_list, individual_list, index, rules, backend)
+
+    if index is None:
+        index = GedcomIndex(individual_list, family_list)
+    dated, rules = split_date_rules(family_list, index, rules, backend)
+    if rules is not None and not rules:
+        return error_rows(dated)
+    bounds = [len(family_list) * shard // shards for shard in range(shards + 1)]
+
+    found = {}
+    with ProcessPoolExecutor(max_workers=shards, mp_context=mp_context, initializer=startValidationWorker,
+                             initargs=(family_list, index)) as executor:
+        parts = executor.map(checkFamilyShard, bounds[:-1], bounds[1:], [rules] * shards)
+        for part in parts:
+            for rule, errors in part.items():
+                if rule == 'US11':
+                    marriages = found.setdefault(rule, {})
+                    for person_id, person_marriages in errors.items():
+                        marriages.setdefault(person_id, []).extend(person_marriages)
+                else:
+                    found.setdefault(rule, []).extend(errors)
+
+    if 'US11' in found:
+        found['US11'] = find_bigamy(found['US11'], index)
+    return error_rows(merge_date_rules(found, dated))
+
+
+def display_rule_errors(rule_id, errors, passed):
+    """Display the message errors of a rule one per line, or the passed message when there are none"""
+    if not errors:
+        print(f"\n{rule_id} Validation: No errors found! {passed}")
+        return
+    print(f"\n{rule_id} Validation Errors ({len(errors)} found):")
+    for error in errors:
+        print(error)
+
+
+def display_single_individuals(individual_list, single_individuals=None):
+    """Display living single individuals over 30 (US31)"""
+    if single_individuals is None:
+        single_individuals = listAllSingleIndividuals(individual_list)
+    if not single_individuals:
+        print("No single individuals found.")
+        return
+    print("\nList of Single Individuals (Age > 30):")
+    for ind in single_individuals:
+        print(f" - {ind.get('Name')} (ID: {ind.get('ID')}, Age: {ind.get('Age')})")
+
+
+def display_shared_birthdays(individual_list, shared=None):
+    """Display the individuals that share a birthday with someone else"""
+    if shared is None:
+        shared = listMultipleBdays(individual_list)
+    print("\nList of Individuals That Have The Same Birthday:" )
+    if not shared:
+        print("No individuals share the same birthday.")
+    for ind in shared:
+        print(f" - {ind.get('Name')} (ID: {ind.get('ID')}, Birthday: {ind.get('Birthday')})")
+
+
+def display_orphans(individual_list, family_list, index=None, orphans=None):
+    """Display individuals under 18 with no family (US33)"""
+    if orphans is None:
+        orphans = list_orphans(individual_list, family_list, index)
+    if not orphans:
+        print("No orphaned individuals found.")
+        return
+    print("\nList of Orphaned Individuals:")
+    for ind in orphans:
+        print(f" - {ind.get('Name')} (ID: {ind.get('ID')})")
+
+
+def display_younger_spouses(family_list, individual_list, index=None, younger_spouses=None):
+    """Display the families where one spouse is younger than the other (US34)"""
+    if younger_spouses is None:
+        younger_spouses = list_younger_spouse(family_list, individual_list, index)
+    if not younger_spouses:
+        print("No families with age differences found.")
+        return
+    print("\nFamilies with Younger Spouses:")
+    for fam_id, younger_id, older_id, description in younger_spouses:
+        print(f"Family {fam_id}: {description} ({younger_id} < {older_id})")
+
+
+def display_recent_births(individual_list, recent_births=None):
+    """Display individuals born in the last 30 days (US35)"""
+    if recent_births is None:
+        recent_births = list_recent_births(individual_list)
+    if not recent_births:
+        print("No recent births found.")
+        return
+    print("\nList of Recent Births (Last 30 Days):")
+    for ind in recent_births:
+        print(f" - {ind.get('Name')} (ID: {ind.get('ID')}, Birthday: {ind.get('Birthday')})")
+
+
+def display_duplicates(title, duplicates, labels):
+    """Display Duplicate records as a table, with labels (record ID -> name) for both records of each"""
+    if not duplicates:
+        print(f"\nNo {title.lower()} found.")
+        return
+    table = PrettyTable()
+    table.field_names = ["Kept", "Kept Name", "Duplicate", "Duplicate Name", "Score"]
+    for duplicate in duplicates:
+        table.add_row([duplicate.kept_id, labels.get(duplicate.kept_id, ''), duplicate.duplicate_id,
+                       labels.get(duplicate.duplicate_id, ''), 'exact' if duplicate.exact else f"{duplicate.score:.2f}"])
+    print(f"\n{title} ({len(duplicates)} found):")
+    print(table)
+
+
+def display_name_matches(names, query, limit=10):
+    """Display the people of a NameIndex whose names are most like query, best first"""
+    matches = names.search(query, limit) if query else []
+    if not matches:
+        print(f"\nNo individuals found with a name like {query!r}.")
+        return matches
+    table = PrettyTable()
+    table.field_names = ["ID", "Name", "Gender", "Birthday", "Score"]
+    for match in matches:
+        ind = names.individuals[match.position]
+        table.add_row([match.person_id, match.name, ind.get('Gender', ''), ind.get('Birthday', ''), f"{match.score:.2f}"])
+    print(f"\nIndividuals with a Name like {query!r} ({len(matches)} found):")
+    print(table)
+    return matches
+
+
+class Rule:
+    """
+    One user story in the rule registry (RULES). Every rule has the same two callables:
+    find(family_list, individual_list, index) returns its findings without printing, and
+    show(found, family_list, individual_list, index) displays them. severity is 'ERROR' for the
+    checks and 'INFO' for the listings, fields names the record columns find reads, and needs
+    the lookups it relies on: 'index' (a GedcomIndex), 'children' (the children's records and
+    birthdays in FamilyContext) and 'ancestry' (index.ancestry()). Rules that are in FAMILY_RULES
+    are found together in one validate_all pass instead of through find
+    """
+    __slots__ = ('rule_id', 'title', 'severity', 'fields', 'needs', 'find', 'show')
+
+    def __init__(self, rule_id, title, severity, fields, needs, find, show):
+        self.rule_id = rule_id
+        self.title = title
+        self.severity = severity
+        self.fields = fields
+        self.needs = frozenset(needs)
+        self.find = find
+        self.show = show
+
+    def menu_title(self):
+        return f"{self.title} ({self.rule_id})" if self.rule_id.startswith('US') else self.title
+
+    def __repr__(self):
+        return f"Rule({self.rule_id!r}, {self.title!r})"
+
+
+def family_rule(rule_id):
+    """find for a rule of FAMILY_RULES: validate_all with only that rule"""
+    return lambda family_list, individual_list, index: validate_all(family_list, individual_list, index, (rule_id,))[rule_id]
+
+
+def person_rule(rule_id):
+    """find for a rule of PERSON_RULES: the rows of check_people with only that rule"""
+    return lambda family_list, individual_list, index: error_rows(check_people(individual_list, index, (rule_id,)))[rule_id]
+
+
+# Every rule the menu and the command line can run, in menu order
+RULES = {rule.rule_id: rule for rule in (
+    Rule('TABLES', "Display All Individuals and Families", 'INFO', tuple(dict.fromkeys([*Individual.KEYS, *Family.KEYS])), (),
+         lambda families, individuals, index: individuals,
+         lambda found, families, individuals, index: createTable(families, individuals)),
+    Rule('US29', "List Deceased Individuals", 'INFO', ('Alive',), ('index',),
+         lambda families, individuals, index: list_deceased(individuals, as_of=index.today()),
+         lambda found, families, individuals, index: display_deceased_table(individuals, found)),
+    Rule('US30', "List Living Married Individuals", 'INFO', ('Alive', 'Spouse'), ('index',),
+         lambda families, individuals, index: list_living_married(individuals, as_of=index.today()),
+         lambda found, families, individuals, index: display_living_married_table(individuals, found)),
+    Rule('US05', "Validate Marriage Before Death", 'ERROR', ('Married', 'Death'), ('index',),
+         family_rule('US05'),
+         lambda found, families, individuals, index: display_marriage_validation_errors(families, individuals, index, found)),
+    Rule('US06', "Validate Divorce Before Death", 'ERROR', ('Divorced', 'Death'), ('index',),
+         family_rule('US06'),
+         lambda found, families, individuals, index: display_divorce_validation_errors(families, individuals, index, found)),
+    Rule('US10', "Validate Marriage After 14", 'ERROR', ('Married', 'Birthday'), ('index',),
+         family_rule('US10'),
+         lambda found, families, individuals, index: display_marriage_age_validation_errors(families, individuals, index, found)),
+    Rule('US11', "Validate No Bigamy", 'ERROR', ('Married', 'Divorced', 'Death'), ('index',),
+         family_rule('US11'),
+         lambda found, families, individuals, index: display_bigamy_validation_errors(families, individuals, index, found)),
+    Rule('US12', "Validate Parent Age Limits", 'ERROR', ('Birthday', 'Children'), ('index', 'children'),
+         family_rule('US12'),
+         lambda found, families, individuals, index: display_parent_age_validation_errors(families, individuals, found)),
+    Rule('US31', "List All Single Individuals Over 30 Years Old", 'INFO', ('Alive', 'Spouse', 'Age'), ('index',),
+         lambda families, individuals, index: listAllSingleIndividuals(individuals, as_of=index.today()),
+         lambda found, families, individuals, index: display_single_individuals(individuals, found)),
+    Rule('US38', "List Upcoming Birthdays", 'INFO', ('Alive', 'Birthday'), ('index',),
+         lambda families, individuals, index: list_upcoming_birthdays(individuals, calendar=index.calendar(), as_of=index.today()),
+         lambda found, families, individuals, index: display_upcoming_birthdays(individuals, upcoming=found, as_of=index.today())),
+    Rule('BDAYS', "List Individuals with the Same Birthday", 'INFO', ('Birthday',), (),
+         lambda families, individuals, index: listMultipleBdays(individuals),
+         lambda found, families, individuals, index: display_shared_birthdays(individuals, found)),
+    Rule('US15', "Validate Fewer Than 15 Siblings", 'ERROR', ('Children',), ('index',),
+         family_rule('US15'),
+         lambda found, families, individuals, index: display_rule_errors('US15', found, "All families have fewer than 15 siblings.")),
+    Rule('US21', "Validate Correct Gender for Role", 'ERROR', ('Gender',), ('index',),
+         family_rule('US21'),
+         lambda found, families, individuals, index: display_rule_errors('US21', found, "All gender roles are correct.")),
+    Rule('US33', "List Orphaned Individuals", 'INFO', ('Age',), ('index',),
+         lambda families, individuals, index: list_orphans(individuals, families, index),
+         lambda found, families, individuals, index: display_orphans(individuals, families, index, found)),
+    Rule('US34', "List Individuals with Younger Spouses", 'INFO', ('Age',), ('index',),
+         lambda families, individuals, index: list_younger_spouse(families, individuals, index),
+         lambda found, families, individuals, index: display_younger_spouses(families, individuals, index, found)),
+    Rule('US35', "List Recent Births - Last 30 Days", 'INFO', ('Birthday',), ('index',),
+         lambda families, individuals, index: list_recent_births(individuals, index.calendar(), index.today()),
+         lambda found, families, individuals, index: display_recent_births(individuals, found)),
+    Rule('US18', "Siblings Should Not Marry", 'ERROR', ('Children',), ('index', 'ancestry'),
+         family_rule('US18'),
+         lambda found, families, individuals, index: display_us18_validation_errors(families, individuals, index, found)),
+    Rule('US19', "First Cousins Should not Marry", 'ERROR', ('Children',), ('index', 'ancestry'),
+         family_rule('US19'),
+         lambda found, families, individuals, index: display_us19_validation_errors(families, individuals, index, found)),
+    Rule('US08', "Validate Birth Before Marriage of Parents", 'ERROR', ('Married', 'Divorced', 'Birthday'), ('index', 'children'),
+         family_rule('US08'),
+         lambda found, families, individuals, index: display_rule_errors(
+             'US08', found, "All children were born after their parents married and within 9 months of a divorce.")),
+    Rule('US09', "Validate Birth Before Death of Parents", 'ERROR', ('Birthday', 'Death'), ('index', 'children'),
+         family_rule('US09'),
+         lambda found, families, individuals, index: display_rule_errors(
+             'US09', found, "All children were born before their mother died and within 9 months of their father's death.")),
+    Rule('US02', "Validate Birth Before Marriage", 'ERROR', ('Birthday', 'Spouse', 'Married'), ('index',),
+         person_rule('US02'),
+         lambda found, families, individuals, index: display_rule_errors('US02', found, "Everyone was born before they married.")),
+    Rule('US07', "Validate Less Than 150 Years Old", 'ERROR', ('Birthday', 'Death'), (),
+         person_rule('US07'),
+         lambda found, families, individuals, index: display_rule_errors('US07', found, "Everyone is younger than 150 and no one died at 150 or older.")),
+    Rule('US23', "Validate Unique Name and Birth Date", 'ERROR', ('Name', 'Birthday'), (),
+         lambda families, individuals, index: validate_unique_name_and_birth_date(individuals),
+         lambda found, families, individuals, index: display_rule_errors('US23', found, "No two individuals share a name and birth date.")),
+    Rule('US24', "Validate Unique Families by Spouses", 'ERROR', ('Husband Name', 'Wife Name', 'Married'), (),
+         lambda families, individuals, index: validate_unique_families_by_spouses(families, individuals),
+         lambda found, families, individuals, index: display_rule_errors('US24', found, "No two families share both spouses and a marriage date.")),
+)}
+
+
+def run_rules(rule_ids, family_list, individual_list, index=None, jobs=1, backend='python', budget=None):
+    """
+    Find the results of the rules in rule_ids (a KeyError names an unknown one). The index is only
+    built when a rule needs it, the rules of FAMILY_RULES among them share one validate_all pass
+    (split over jobs processes, date rules on backend), those of PERSON_RULES one check_people pass,
+    and every other rule runs its own find afterwards. With a ValidationBudget both passes run
+    in this process within it and budget.coverage tells which results are partial.
+    Returns {rule ID: found} in rule_ids order
+    """
+    rules = [RULES[rule_id] for rule_id in rule_ids]
+    if index is None and any('index' in rule.needs for rule in rules):
+        index = GedcomIndex(individual_list, family_list)
+
+    fused = [rule.rule_id for rule in rules if rule.rule_id in FAMILY_RULES]
+    if not fused:
+        found = {}
+    elif budget is not None:
+        found = validate_all(family_list, individual_list, index, fused, budget=budget)
+    else:
+        found = validate_all_parallel(family_list, individual_list, index, fused, jobs, backend=backend)
+    people = [rule.rule_id for rule in rules if rule.rule_id in PERSON_RULES]
+    if people:
+        found.update(error_rows(check_people(individual_list, index, people, budget=budget)))
+    for rule in rules:
+        if rule.rule_id not in found:
+            found[rule.rule_id] = rule.find(family_list, individual_list, index)
+    return {rule.rule_id: found[rule.rule_id] for rule in rules}
+
+
+def display_rules(rule_ids, family_list, individual_list, index=None, jobs=1, backend='python', budget=None):
+    """run_rules, then display the results of each rule in rule_ids order, noting the partial ones of a budgeted run"""
+    if index is None and any('index' in RULES[rule_id].needs for rule_id in rule_ids):
+        index = GedcomIndex(individual_list, family_list)
+    found = run_rules(rule_ids, family_list, individual_list, index, jobs, backend, budget)
+    for rule_id, result in found.items():
+        RULES[rule_id].show(result, family_list, individual_list, index)
+        coverage = budget.coverage.get(rule_id) if budget is not None else None
+        if coverage is not None and coverage.partial:
+            print(f"Partial result, {coverage.describe()}")
+    return found
+
+
+def display_all_validation_errors(family_list, individual_list, index=None, jobs=1, backend='python'):
+    """Run every family rule in one pass (split over jobs processes) and display the results of each, in rule order"""
+    return display_rules(list(FAMILY_RULES), family_list, individual_list, index, jobs, backend)
+
+
+def rule_list(text):
+    """The rule IDs of a comma separated --rules value, checked against RULES"""
+    rule_ids = [rule_id.strip().upper() for rule_id in text.split(',') if rule_id.strip()]
+    unknown = [rule_id for rule_id in rule_ids if rule_id not in RULES]
+    if unknown or not rule_ids:
+        raise argparse.ArgumentTypeError(f"unknown rule {', '.join(unknown) or text!r}, choose from {', '.join(RULES)}")
+    return rule_ids
+
+
+def error_limits(text):
+    """A --max-errors value: one limit for every rule ('200') or limits for some rules ('US08=50,US21=10')"""
+    try:
+        if '=' not in text:
+            return int(text)
+        limits = {}
+        for item in text.split(','):
+            rule_id, limit = item.split('=')
+            limits[rule_id.strip().upper()] = int(limit)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected N or ID=N[,ID=N...], got {text!r}")
+    unknown = [rule_id for rule_id in limits if rule_id not in RULES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown rule {', '.join(unknown)}")
+    return limits
+
+
+def as_of_value(text):
+    """An --as-of value, a day as 'YYYY-MM-DD' or 'D MMM YYYY'"""
+    try:
+        return as_of_date(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a date such as 2024-05-01 or 1 MAY 2024, got {text!r}")
+
+
+def id_pair(text):
+    """A --relate value, two person IDs separated by a comma or spaces"""
+    ids = text.replace(',', ' ').split()
+    if len(ids) != 2:
+        raise argparse.ArgumentTypeError(f"expected two person IDs such as I1,I2, got {text!r}")
+    return tuple(ids)
+
+
+def read_id_pairs(filename):
+    """The person ID pairs of a --relate-file, one per line; blank lines and # comments are skipped"""
+    with open(filename, encoding='utf-8') as pairs_file:
+        return [id_pair(line) for line in pairs_file if line.strip() and not line.lstrip().startswith('#')]
+
+
+def display_rule_registry():
+    """Display the registered rules with what each one reads"""
+    table = PrettyTable()
+    table.field_names = ["ID", "Title", "Severity", "Needs", "Fields", "One Pass"]
+    table.align = 'l'
+    for rule in RULES.values():
+        table.add_row([rule.rule_id, rule.title, rule.severity, ', '.join(sorted(rule.needs)) or '-',
+                       ', '.join(rule.fields), 'yes' if rule.rule_id in FAMILY_RULES else ''])
+    print(table)
+
+
+def run_menu(individuals, families, index=None):
+    """Run the interactive menu, one entry per rule of RULES"""
+    choices = menu_choices()
+    rule_ids = list(RULES)
+    search = str(len(rule_ids) + 1)
+    last = len(choices)
     while True:
         display_menu()
-        choice = input("\nEnter your choice (1-19): ").strip()
-        
-        if choice == '1':
-            createTable(families, individuals)
-        elif choice == '2':
-            display_deceased_table(individuals)
-        elif choice == '3':
-            display_living_married_table(individuals)
-        elif choice == '4':
-            display_marriage_validation_errors(families, individuals)
-        elif choice == '5':
-            display_divorce_validation_errors(families, individuals)
-        elif choice == '6':
-            display_marriage_age_validation_errors(families, individuals)
-        elif choice == '7':
-            display_bigamy_validation_errors(families, individuals)
-        elif choice == '8':
-            display_parent_age_validation_errors(families, individuals)
-        elif choice == '9':
-            single_individuals = listAllSingleIndividuals(individuals)
-            if not single_individuals:
-                print("No single individuals found.")
-            else:
-                print("\nList of Single Individuals (Age > 30):")
-                for ind in single_individuals:
-                    print(f" - {ind.get('Name')} (ID: {ind.get('ID')}, Age: {ind.get('Age')})")
-        elif choice == '10':
-            display_upcoming_birthdays(individuals)
-        elif choice == '11':
-            print("\nList of Individuals That Have The Same Birthday:" )
-            bday_list = listMultipleBdays(individuals)
-            for ind in bday_list:
-                print(f" - {ind.get('Name')} (ID: {ind.get('ID')}, Birthday: {ind.get('Birthday')})")
-        elif choice == '12':
-            errors = validate_fewer_than_15_siblings(families, individuals)
-            if not errors:
-                print("\nUS15 Validation: No errors found! All families have fewer than 15 siblings.")
-        elif choice == '13':
-            errors = validate_correct_gender_for_role(families, individuals)
-            if not errors:
-                print("\nUS21 Validation: No errors found! All gender roles are correct.")
-        elif choice == '14':
-            orphaned_individuals = list_orphans(individuals, families)
-            if not orphaned_individuals:
-                print("No orphaned individuals found.")
-            else:
-                print("\nList of Orphaned Individuals:")
-                for ind in orphaned_individuals:
-                    print(f" - {ind.get('Name')} (ID: {ind.get('ID')})")
-        elif choice == '15':
-            younger_spouses = list_younger_spouse(families, individuals)
-            if not younger_spouses:
-                print("No families with age differences found.")
-            else:
-                print("\nFamilies with Younger Spouses:")
-                for record in younger_spouses:
-                    fam_id, younger_id, older_id, description = record
-                    print(f"Family {fam_id}: {description} ({younger_id} < {older_id})")
-        elif choice == '16':
-            recent_births = list_recent_births(individuals)
-            if not recent_births:
-                print("No recent births found.")
-            else:
-                print("\nList of Recent Births (Last 30 Days):")
-                for ind in recent_births:
-                    print(f" - {ind.get('Name')} (ID: {ind.get('ID')}, Birthday: {ind.get('Birthday')})")
-        elif choice == '17':
-            display_us18_validation_errors(families, individuals)
-        elif choice == '18':
-            display_us19_validation_errors(families, individuals)
-        elif choice == '19':
+        choice = input(f"\nEnter your choice (1-{last}): ").strip()
+
+        if choice == str(last):
             print("\nExiting program. Goodbye!")
             break
+        elif choice == search:
+            query = input("Name to search for: ").strip()
+            if index is None:
+                index = GedcomIndex(individuals, families)
+            display_name_matches(index.names(), query)
+        elif choice in choices:
+            number = int(choice)
+            selected = rule_ids[number - 1:number] or list(FAMILY_RULES)
+            # The index is built the first time a chosen rule needs it and kept for the later ones
+            if index is None and any('index' in RULES[rule_id].needs for rule_id in selected):
+                index = GedcomIndex(individuals, families)
+            display_rules(selected, families, individuals, index)
         else:
-            print("\nInvalid choice! Please enter a number between 1 and 19.")
+            print(f"\nInvalid choice! Please enter a number between 1 and {last}.")
 
         input("\nPress Enter to continue...")
   
-def listAllSingleIndividuals(individual_list):
-    single_individuals = []
-    for ind in individual_list:
-        if ind.get('Spouse') == 'NA' and ind.get('Alive') == 'True' and ind.get('Age', 0) > 30:
-            single_individuals.append(ind)
-    return single_individuals
+def listAllSingleIndividuals(individual_list, as_of=None):
+    return PersonQuery(individual_list, as_of=as_of, indexed=False).select(Q.no_spouse & Q.alive & (Q.age > 30))
 
-def listRecentDeaths(individual_list):
+def listRecentDeaths(individual_list, calendar=None, as_of=None):
     list = []
 
-    for ind in individual_list:
-
-        try:   
-            death = ind.get('Death', 'NA')
-            if death != 'NA':
-                death_date = datetime.strptime(death, "%d %b %Y").date()
-                today = datetime.today().date()
-                delta = today - death_date
-                if delta.days <= 30:
-                    list.append({
-                        'Name': ind.get('Name'),
-                        'Death Date': death,
-                    })
-                           
-        except ValueError:
-            pass
+    for ind in list_recent_deaths(individual_list, 30, calendar, as_of):
+        list.append({
+            'Name': ind.get('Name'),
+            'Death Date': ind.get('Death'),
+        })
 
     print("\nRecent Deaths:")    
     for item in list:
         print(item)
 
-def listUpcomingBirthdays(individual_list):
+def listUpcomingBirthdays(individual_list, calendar=None, as_of=None):
     list = []
+    if calendar is None or not calendar.covers(individual_list):
+        calendar = CalendarIndex(individual_list)
 
-    for ind in individual_list:
-
-        try:   
-            birthday = ind.get('Birthday', 'NA')
-            if birthday != 'NA':
-                today = datetime.today().date()
-                birth_date = datetime.strptime(birthday, "%d %b %Y").date()
-                this_birthday = birth_date.replace(year=today.year)
-                delta = today + timedelta(days=30)
-                if today <= this_birthday <= delta:
-                    list.append({
-                        'Name': ind.get('Name'),
-                        'Birth Date': this_birthday.strftime('%Y-%m-%d'),
-                    })
-                           
-        except ValueError:
-            pass
+    # Birthdays from as_of (default today) to 30 days on, into the next year when the window crosses it
+    today = as_of_date(as_of)
+    found = calendar.occurrences(calendar.birthdays, today, today + timedelta(days=30))
+    for this_birthday, position in sorted(found, key=lambda occurrence: occurrence[1]):
+        list.append({
+            'Name': calendar.individuals[position].get('Name'),
+            'Birth Date': this_birthday.strftime('%Y-%m-%d'),
+        })
     
     print("\nUpcomming Birthdays:")
     for item in list:
         print(item)
     
-def listUpcomingAnniversary(family_list, individual_list):
+def listUpcomingAnniversary(family_list, individual_list, index=None, calendar=None, as_of=None):
     list = []
+    if calendar is None or not calendar.covers(individual_list, family_list):
+        calendar = CalendarIndex(individual_list, family_list)
 
-    for ind in individual_list:
-        spouse = ind.get('Spouse')
-
-        if spouse == 'NA':
-            continue
-
-        for fam in family_list:
-            if fam.get('Husband ID') == ind.get('ID') or fam.get('Wife ID') == ind.get('ID'):
+    # Each married spouse of a family whose anniversary is in the 30 days from as_of, by person and then family
+    today = as_of_date(as_of if as_of is not None or index is None else index.as_of)
+    found = []
+    for this_anniversary, family_position in calendar.occurrences(calendar.anniversaries, today, today + timedelta(days=30)):
+        for spouse_id in GedcomIndex.spouse_ids(calendar.families[family_position]):
+            position = calendar.person_positions.get(spouse_id)
+            if position is not None and calendar.individuals[position].get('Spouse') != 'NA':
+                found.append((position, family_position, this_anniversary))
 
-                married = fam.get('Married')
-            
-                if married == 'NA' or married is None:
-                    continue
-                
-                today = datetime.today().date()
-                marriage_date = datetime.strptime(married, "%d %b %Y").date()
-                this_anniversary = marriage_date.replace(year=today.year)
-                delta = today + timedelta(days=30)
-
-                if today <= this_anniversary <= delta:
-                    list.append({
-                        'Name': ind.get('Name'),
-                        'Birth Date': this_anniversary.strftime('%Y-%m-%d'),
-                    })
+    for position, family_position, this_anniversary in sorted(found):
+        list.append({
+            'Name': calendar.individuals[position].get('Name'),
+            'Birth Date': this_anniversary.strftime('%Y-%m-%d'),
+        })
                            
     print("\nUpcomming Anniversaries:")
     for item in list:
@@ -1716,8 +5638,6 @@ def listMultipleBdays(individual_list):
                 shared_bdays.append(first_person)
         else:
             bday_map[bday_key] = ind
-    if not shared_bdays:
-        print("No individuals share the same birthday.")
     
     return shared_bdays
             
@@ -1725,18 +5645,119 @@ def listMultipleBdays(individual_list):
 
 
 if __name__ == "__main__":
-    #readGedFile
-    individuals, families = readGedcomFile("Gedcom-file.ged")
-    
-    #organize fam data
-    families = organizeFamilyData(families, individuals)
-    
-    #organize individual
-    individuals = organizeIndividualData(families, individuals)
-    verifyAge(individuals)
-    listRecentDeaths(individuals)
-    listUpcomingBirthdays(individuals)
-    listUpcomingAnniversary(families, individuals)
+    parser = argparse.ArgumentParser(description="Print the GEDCOM tables and run the validation menu")
+    parser.add_argument('file', nargs='?', default="Gedcom-file.ged", help="GEDCOM file to read")
+    parser.add_argument('--rebuild-cache', action='store_true', help="parse the file, rewrite its snapshot and exit")
+    parser.add_argument('--check-cache', action='store_true', help="report whether the snapshot matches the file and exit")
+    parser.add_argument('--no-cache', action='store_true', help="parse the file without reading or writing a snapshot")
+    parser.add_argument('--validate', action='store_true', help="run every family validation in one pass and exit")
+    parser.add_argument('--rules', type=rule_list, metavar='ID[,ID...]',
+                        help=f"run the given rules and exit ({', '.join(RULES)})")
+    parser.add_argument('--list-rules', action='store_true', help="list the registered rules and exit")
+    parser.add_argument('--report', choices=('display', 'table', 'jsonl', 'count'), default='display',
+                        help="how --validate and --rules report errors: the per rule displays, streamed into one table per "
+                             "kind of error, one JSON object per line, or only counted per rule")
+    parser.add_argument('--output', help="file to write the table, jsonl or count report to (default standard output)")
+    parser.add_argument('--backend', choices=BACKENDS, default='python',
+                        help=f"how --validate and --rules check {', '.join(DATE_RULES)} (numpy needs NumPy installed)")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="worker processes for --validate and --rules (0 for one per CPU); the output does not depend on it")
+    parser.add_argument('--max-errors', type=error_limits, metavar='N|ID=N[,ID=N...]',
+                        help="stop each check rule (or the given ones) after that many errors")
+    parser.add_argument('--time-budget', type=float, metavar='SECONDS', help="stop the checks after that many seconds")
+    parser.add_argument('--sample', type=float, metavar='FRACTION', help="check only that fraction of the families and people")
+    parser.add_argument('--seed', type=int, default=0, help="random seed for --sample (default 0)")
+    parser.add_argument('--relate', type=id_pair, action='append', metavar='ID,ID',
+                        help="print how the first person is related to the second and exit (can be repeated)")
+    parser.add_argument('--relate-file', metavar='PATH', help="answer every ID pair in PATH, one pair per line, and exit")
+    parser.add_argument('--as-of', type=as_of_value, metavar='DATE',
+                        help="compute ages, living people and the recent and upcoming listings for DATE instead of today")
+    parser.add_argument('--duplicates', type=float, nargs='?', const=DUPLICATE_MIN_SCORE, metavar='MIN_SCORE',
+                        help="print the duplicate people (US23) and families (US24) and their near duplicates scoring at "
+                             f"least MIN_SCORE (0 to 1, default {DUPLICATE_MIN_SCORE}) and exit")
+    parser.add_argument('--find-name', action='append', metavar='NAME',
+                        help="print the people whose names are most like NAME, spelling variants included, and exit "
+                             "(can be repeated; 'Given /Surname/' matches each part on its own)")
+    args = parser.parse_args()
+
+    if args.list_rules:
+        display_rule_registry()
+        sys.exit(0)
+
+    checks = [rule_id for rule_id in (args.rules or FAMILY_RULES) if rule_id in FAMILY_RULES or rule_id in PERSON_RULES]
+    budget = None
+    if args.max_errors is not None or args.time_budget is not None or args.sample is not None:
+        # A budgeted run is one pass in this process, --jobs and --backend numpy do not apply to it
+        try:
+            budget = ValidationBudget(args.max_errors, args.time_budget, args.sample, args.seed)
+        except ValueError as error:
+            parser.error(str(error))
+    if args.report != 'display' and args.rules and len(checks) < len(args.rules):
+        parser.error(f"--report {args.report} only reports the check rules {', '.join([*FAMILY_RULES, *PERSON_RULES])}")
+
+    if args.check_cache:
+        up_to_date, reason = checkSnapshot(args.file)
+        print(f"{snapshot_path(args.file)}: {reason}")
+        sys.exit(0 if up_to_date else 1)
+
+    if args.rebuild_cache:
+        individuals, families, index = loadGedcomTree(args.file, rebuild=True, as_of=args.as_of)
+        print(f"Wrote {snapshot_path(args.file)} ({len(individuals)} individuals, {len(families)} families)")
+        sys.exit(0)
+
+    #readGedFile, organize fam data, organize individual and index them, or load all of it from the snapshot
+    individuals, families, index = loadGedcomTree(args.file, use_snapshot=not args.no_cache, as_of=args.as_of)
+    # One as-of day for the whole run, even when it crosses midnight
+    today = index.today()
+    index.as_of = today
+    if args.relate or args.relate_file:
+        try:
+            pairs = (args.relate or []) + (read_id_pairs(args.relate_file) if args.relate_file else [])
+            for relationship in RelationshipCalculator(index).relate_many(pairs):
+                print(relationship.describe())
+        except (OSError, KeyError, argparse.ArgumentTypeError) as error:
+            parser.error(error.args[0] if isinstance(error, KeyError) else str(error))
+        sys.exit(0)
+    if args.duplicates is not None:
+        display_duplicates("Duplicate Individuals", find_duplicate_people(individuals, True, args.duplicates),
+                           {ind.get('ID'): ind.get('Name') for ind in individuals})
+        display_duplicates("Duplicate Families", find_duplicate_families(families, True, args.duplicates),
+                           {fam.get('ID'): f"{fam.get('Husband Name')} & {fam.get('Wife Name')}" for fam in families})
+        sys.exit(0)
+    if args.find_name:
+        names = index.names()
+        for query in args.find_name:
+            display_name_matches(names, query)
+        sys.exit(0)
+    if args.validate or args.rules:
+        jobs = args.jobs or os.cpu_count() or 1
+        started = time.perf_counter()
+        if args.report == 'display':
+            display_rules(args.rules or list(FAMILY_RULES), families, individuals, index, jobs, args.backend, budget)
+        else:
+            output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+            sink = {'table': TableSink, 'jsonl': JsonlSink, 'count': lambda file: CountingSink()}[args.report](output)
+            with sink:
+                stream_validation(sink, families, individuals, index, checks, args.backend, budget=budget)
+            if args.report == 'count':
+                for rule_id in checks:
+                    coverage = sink.coverage.get(rule_id)
+                    if coverage is not None and coverage.partial:
+                        print(coverage.describe(), file=output)
+                    else:
+                        print(f"{rule_id}: {sink.counts[rule_id]}", file=output)
+            if args.output:
+                output.close()
+        # Timing goes to stderr so the report itself is the same for any --jobs
+        print(f"Checked {len(individuals)} individuals and {len(families)} families in {time.perf_counter() - started:.2f} s "
+              f"with {jobs} process(es)", file=sys.stderr)
+        sys.exit(0)
+
+    verifyAge(individuals, today)
+    calendar = index.calendar()
+    listRecentDeaths(individuals, calendar, today)
+    listUpcomingBirthdays(individuals, calendar, today)
+    listUpcomingAnniversary(families, individuals, index, calendar, today)
     
     # Run the interactive menu
-    run_menu(individuals, families)
\ No newline at end of file
+    run_menu(individuals, families, index)
\ No newline at end of file
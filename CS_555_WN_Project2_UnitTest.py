@@ -1,6 +1,23 @@
 import unittest
 from CS_555_WN_Project2_Code import readGedcomFile, organizeFamilyData, organizeIndividualData, validate__divorce_before_death, validate_marriage_before_death, createTable, validate_birth_before_marriage, validate_birth_before_death_of_parents, validate_birth_before_marriage_of_parents, validate_bigamy, validate_US10_marriage_after_14, validate_parent_age_limits, list_upcoming_birthdays, validate_US18_siblings_should_not_marry, validate_US19_first_cousins_should_not_marry
 
+
+def person(person_id, birthday='NA', death='NA', **fields):
+    """A person record for the tests, named after their ID, with any other columns as keywords"""
+    return {'ID': person_id, 'Name': f'{person_id} /Test/', 'Birthday': birthday, 'Death': death, **fields}
+
+
+def family(family_id, husband_id, wife_id, children=(), married='NA', divorced='NA'):
+    """A family record for the tests with the organized table keys; spouse names are left unknown"""
+    return {'ID': family_id, 'Married': married, 'Divorced': divorced, 'Husband ID': husband_id, 'Husband Name': 'NA',
+            'Wife ID': wife_id, 'Wife Name': 'NA', 'Children': list(children)}
+
+
+def rows(records):
+    """The records as plain dicts, to compare records of any mapping type"""
+    return [dict(record.items()) for record in records]
+
+
 class Test_CS_555_WN_Project2_Code(unittest.TestCase):
     
     def setUp(self):
@@ -58,11 +75,13 @@ class Test_CS_555_WN_Project2_Code(unittest.TestCase):
     
     def test_birth_before_marriage_validation(self):
         """Test that no individual is born after their marriage date"""
-        try:
-            result = validate_birth_before_marriage(self.individuals_data, self.families_data)
-            self.assertTrue(result)
-        except ValueError as e:
-            self.fail(f"Birth before marriage validation failed: {e}")        
+        errors = validate_birth_before_marriage(self.individuals_data, self.families_data)
+        self.assertEqual(errors, [], f"Birth before marriage validation failed: {errors}")
+
+        # A violation is reported, not raised
+        people = [person('I1', '1 JAN 1990', Spouse="{'F1'}"), person('I2', '1 JAN 1950', Spouse="{'F1'}")]
+        self.assertEqual(validate_birth_before_marriage(people, [family('F1', 'I1', 'I2', married='1 JAN 1980')]),
+                         ["ERROR: Individual I1 (I1 /Test/) was born (1 JAN 1990) after marriage (1 JAN 1980)"])
 
     def test_birth_before_marriage_of_parents(self):
         """Test US08: Child born after marriage of parents and within 9 months of divorce"""
@@ -661,6 +680,1010 @@ class Test_CS_555_WN_Project2_Code(unittest.TestCase):
         self.assertIn("Cousin One", errors[0]['Husband Name'])
         self.assertIn("Cousin Two", errors[0]['Wife Name'])
 
+    def test_iter_gedcom_records_streams_records(self):
+        """Test that the streaming reader yields the same records readGedcomFile collects"""
+        from CS_555_WN_Project2_Code import iter_gedcom_records
+
+        records = iter_gedcom_records("Gedcom-file.ged")
+        record_type, first = next(records)
+        self.assertEqual(record_type, 'INDI')
+        self.assertEqual(first['ID'], 'I1')
+
+        individuals, families = readGedcomFile("Gedcom-file.ged")
+        streamed = [first] + [record for _, record in records]
+        self.assertEqual(streamed, individuals + families)
+
+    def test_tokenizer_handles_line_endings_and_bom(self):
+        """Test that the bytes tokenizer reads an LF file with a UTF-8 BOM the same as the CRLF original"""
+        import os
+        import tempfile
+
+        with open("Gedcom-file.ged", 'rb') as file:
+            data = file.read()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'lf.ged')
+            with open(path, 'wb') as file:
+                file.write(b'\xef\xbb\xbf' + data.replace(b'\r\n', b'\n'))
+            self.assertEqual(readGedcomFile(path), readGedcomFile("Gedcom-file.ged"))
+
+    def test_organized_records_are_slotted(self):
+        """Test that organized rows are compact slotted records that still read like the table dicts"""
+        from CS_555_WN_Project2_Code import Individual, Family
+
+        ind = self.individuals_data[0]
+        fam = self.families_data[0]
+        self.assertIsInstance(ind, Individual)
+        self.assertIsInstance(fam, Family)
+        self.assertFalse(hasattr(ind, '__dict__'))
+        self.assertEqual(ind['Name'], ind.name)
+        self.assertEqual(ind.get('Spouse'), ind.spouse)
+        self.assertEqual(ind.get('NAME', 'NA'), 'NA')
+        self.assertEqual(list(fam.keys()), ['ID', 'Married', 'Divorced', 'Husband ID', 'Husband Name',
+                                            'Wife ID', 'Wife Name', 'Children'])
+        husband = next(i for i in self.individuals_data if i['ID'] == fam['Husband ID'])
+        self.assertIs(husband.id, fam.husband_id)
+
+    def test_parallel_parse_matches_serial(self):
+        """Test that parsing byte ranges in worker processes gives the serial result in file order"""
+        from CS_555_WN_Project2_Code import readGedcomFileParallel, split_at_records
+
+        with open("Gedcom-file.ged", 'rb') as file:
+            data = file.read()
+        ranges = split_at_records(data, 4)
+        self.assertEqual(len(ranges), 4)
+        for start, end in ranges[1:]:
+            self.assertEqual(data[start:start + 2], b'0 ')
+
+        serial = readGedcomFile("Gedcom-file.ged")
+        parallel = readGedcomFileParallel("Gedcom-file.ged", workers=4, min_chunk_bytes=500)
+        self.assertEqual(parallel, serial)
+
+    def test_parse_gedcom_date_matches_strptime(self):
+        """Test that the cached date parser agrees with strptime and rejects the same strings"""
+        from datetime import datetime
+        from CS_555_WN_Project2_Code import DATE_CACHE, parse_gedcom_date, format_gedcom_date
+
+        for ind in self.individuals_data:
+            parsed = parse_gedcom_date(ind['Birthday'])
+            expected = datetime.strptime(ind['Birthday'], "%d %b %Y").date()
+            self.assertEqual(parsed.ordinal, expected.toordinal())
+            self.assertEqual((parsed.year, parsed.month, parsed.day), (expected.year, expected.month, expected.day))
+            self.assertEqual(format_gedcom_date(parsed), expected.strftime("%d %b %Y"))
+
+        self.assertIs(parse_gedcom_date('10 OCT 1995'), parse_gedcom_date('10 OCT 1995'))
+        self.assertEqual(parse_gedcom_date.cache_info().maxsize, DATE_CACHE)
+        self.assertLess(parse_gedcom_date('31 DEC 1994'), parse_gedcom_date('1 JAN 1995'))
+        for bad in ('NA', '30 FEB 2001', '10 10 1995', '1995'):
+            with self.assertRaises(ValueError):
+                parse_gedcom_date(bad)
+
+    def test_gedcom_index_matches_linear_scans(self):
+        """Test that the ID index finds the same records the old list scans did"""
+        from CS_555_WN_Project2_Code import GedcomIndex
+
+        index = GedcomIndex(self.individuals_data, self.families_data)
+        for ind in self.individuals_data:
+            self.assertIs(index.person(ind['ID']), ind)
+            spouse_of = [fam for fam in self.families_data if ind['ID'] in (fam['Husband ID'], fam['Wife ID'])]
+            child_of = [fam for fam in self.families_data if ind['ID'] in fam['Children']]
+            self.assertEqual(index.families_as_spouse(ind['ID']), spouse_of)
+            self.assertEqual(index.families_as_child(ind['ID']), child_of)
+            self.assertIs(index.family_as_child(ind['ID']), child_of[0] if child_of else None)
+        for fam in self.families_data:
+            self.assertIs(index.family(fam['ID']), fam)
+            self.assertEqual(index.children_of(fam['ID']), fam['Children'])
+        self.assertIsNone(index.person('NA'))
+        self.assertEqual(index.families_as_spouse('NA'), [])
+
+        self.assertEqual(validate_bigamy(self.families_data, self.individuals_data, index),
+                         validate_bigamy(self.families_data, self.individuals_data))
+
+    def test_snapshot_round_trip_and_invalidation(self):
+        """Test that the snapshot reloads the organized tree and is ignored once the file changes or is not signed"""
+        import builtins
+        import hashlib
+        import hmac
+        import json
+        import os
+        import pickle
+        import shutil
+        import tempfile
+        from unittest import mock
+        from CS_555_WN_Project2_Code import (PARSER_VERSION, checkSnapshot, loadGedcomTree, loadSnapshot, readSnapshot,
+                                             readSnapshotHeader, saveSnapshot, snapshot_path)
+
+        with tempfile.TemporaryDirectory() as tmp, mock.patch('CS_555_WN_Project2_Code.SNAPSHOT_KEY_FILE', os.path.join(tmp, 'key')):
+            path = os.path.join(tmp, 'tree.ged')
+            shutil.copy("Gedcom-file.ged", path)
+
+            individuals, families, index = loadGedcomTree(path)
+            self.assertTrue(os.path.exists(snapshot_path(path)))
+            self.assertTrue(checkSnapshot(path)[0])
+            self.assertEqual(os.stat(os.path.join(tmp, 'key')).st_mode & 0o777, 0o600)
+            self.assertEqual(rows(individuals), rows(self.individuals_data))
+            self.assertEqual(rows(families), rows(self.families_data))
+
+            loaded_individuals, loaded_families, loaded_index = loadSnapshot(path)
+            self.assertEqual(rows(loaded_individuals), rows(individuals))
+            self.assertEqual(rows(loaded_families), rows(families))
+            self.assertIs(loaded_index.person(loaded_individuals[0]['ID']), loaded_individuals[0])
+
+            # A snapshot written on an earlier day gets its ages recomputed on load
+            header, tree = readSnapshot(path)
+            tree.day -= 1
+            tree.individuals[0]['Age'] = -1
+            saveSnapshot(tree)
+            self.assertEqual(loadSnapshot(path)[0][0]['Age'], individuals[0]['Age'])
+
+            # Nothing is unpickled unless this user's key signed the header and the pickle: not an old
+            # style pickled header, another pickle, an edited header, nor a pickle signed with another key
+            class Payload:
+                def __reduce__(self):
+                    return exec, ("import builtins; builtins.snapshot_payload_ran = True",)
+
+            with open(snapshot_path(path), 'rb') as file:
+                header_line, signature, body = file.readline(), file.readline(), file.read()
+            payload = pickle.dumps(Payload())
+            other_key = hmac.new(b'x' * 32, header_line + payload, hashlib.sha256).hexdigest().encode() + b'\n'
+            for forged in (payload + body, header_line + signature + payload, header_line.replace(b'{', b'{ ', 1) + signature + body,
+                           header_line + other_key + payload):
+                with open(snapshot_path(path), 'wb') as file:
+                    file.write(forged)
+                self.assertIsNone(readSnapshot(path))
+                self.assertIsNone(loadSnapshot(path))
+                self.assertFalse(checkSnapshot(path)[0])
+                self.assertEqual(readSnapshotHeader(path) is None, forged.startswith(payload))
+            self.assertFalse(hasattr(builtins, 'snapshot_payload_ran'))
+            pickle.loads(payload)
+            self.assertTrue(builtins.__dict__.pop('snapshot_payload_ran'))
+            loadGedcomTree(path)
+            self.assertTrue(checkSnapshot(path)[0])
+
+            with open(path, 'a') as file:
+                file.write("0 NOTE edited\n")
+            self.assertEqual(checkSnapshot(path), (False, "source file has changed"))
+            self.assertIsNone(loadSnapshot(path))
+            loadGedcomTree(path)
+            self.assertTrue(checkSnapshot(path)[0])
+
+            header['version'] = PARSER_VERSION + 1
+            header['digest'] = None
+            with open(snapshot_path(path), 'wb') as file:
+                file.write(json.dumps(header).encode() + b'\n')
+            self.assertFalse(checkSnapshot(path)[0])
+            self.assertIsNone(loadSnapshot(path))
+
+    def test_reload_patches_only_changed_records(self):
+        """Test that reload re-reads edited records and ends up with the same tree as a full parse"""
+        import os
+        import shutil
+        import tempfile
+        from CS_555_WN_Project2_Code import (GedcomTree, buildGedcomTree, insert_sorted_individual,
+                                             remove_sorted_individual)
+
+        # The ID ordered list the tree keeps: inserts go after the records with the same ID
+        people = [person('I1'), person('I3'), person('I3')]
+        repeated = person('I3')
+        insert_sorted_individual(people, repeated)
+        insert_sorted_individual(people, person('I2'))
+        insert_sorted_individual(people, person('I4'))
+        self.assertEqual([ind['ID'] for ind in people], ['I1', 'I2', 'I3', 'I3', 'I3', 'I4'])
+        self.assertIs(people[4], repeated)
+        remove_sorted_individual(people, repeated)
+        self.assertFalse(any(ind is repeated for ind in people))
+        self.assertEqual(len(people), 5)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'tree.ged')
+            shutil.copy("Gedcom-file.ged", path)
+            tree = GedcomTree(path).build()
+            self.assertEqual(tree.reload(), (0, 0))
+
+            with open(path, 'rb') as file:
+                data = file.read()
+            newline = b'\r\n' if b'\r\n' in data else b'\n'
+            husband = self.families_data[0]['Husband ID'].encode()
+            # Rename a husband, drop the last family and add a new person with a family of their own
+            data = data.replace(b'@' + husband + b'@ INDI' + newline + b'1 NAME ', b'@' + husband + b'@ INDI' + newline + b'1 NAME Renamed ', 1)
+            last_family = data.rindex(newline + b'0 @', 0, data.rindex(b'FAM'))
+            end = data.index(newline + b'0 ', last_family + 1)
+            data = data[:last_family] + data[end:]
+            data = data.replace(newline + b'0 TRLR', newline.join([b'', b'0 @INEW@ INDI', b'1 NAME New /Person/', b'1 SEX F',
+                                                                   b'1 BIRT', b'2 DATE 1 JAN 1990', b'0 @FNEW@ FAM',
+                                                                   b'1 HUSB @' + husband + b'@', b'1 WIFE @INEW@',
+                                                                   b'0 TRLR']))
+            with open(path, 'wb') as file:
+                file.write(data)
+
+            reread, removed = tree.reload()
+            self.assertEqual((reread, removed), (3, 1))
+            individuals, families, index = buildGedcomTree(path)
+            self.assertEqual(rows(tree.individuals), rows(individuals))
+            self.assertEqual(rows(tree.families), rows(families))
+            self.assertEqual(rows(tree.index.families_as_spouse(husband.decode())), rows(index.families_as_spouse(husband.decode())))
+            self.assertEqual([fam['ID'] for fam in tree.index.families_as_spouse('INEW')], ['FNEW'])
+
+    def test_extended_fields_are_read_on_first_use(self):
+        """Test that extended tags are only parsed when first asked for and follow edits to the file"""
+        import os
+        import shutil
+        import tempfile
+        from CS_555_WN_Project2_Code import GedcomTree, loadSnapshot, saveSnapshot
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'tree.ged')
+            shutil.copy("Gedcom-file.ged", path)
+            tree = GedcomTree(path).build()
+            # The spans come from the scan build() made, nothing is parsed yet
+            self.assertEqual(len(tree.source.spans), len(tree.keys))
+            self.assertEqual(tree.source.structures, {})
+            person = tree.index.person('I1')
+            self.assertEqual(person.extended('OCCU'), 'IT Consultant')
+            self.assertEqual(person.extended('BIRT.PLAC'), 'Rio de Janeiro')
+            self.assertEqual(person.extended('NAME.GIVN'), 'Lorraine Pinheiro')
+            self.assertEqual(person.extended('DEAT.PLAC', 'NA'), 'NA')
+            self.assertEqual(len(tree.source.structures), 1)
+            self.assertEqual([node.value for node in tree.index.family('F1').structure().find_all('CHIL')],
+                             ['@I1@', '@I4@'])
+
+            saveSnapshot(tree)
+            _, _, index = loadSnapshot(path)
+            self.assertEqual(index.person('I1').extended('NAME.SURN'), 'Nunes')
+
+            with open(path, 'rb') as file:
+                data = file.read()
+            with open(path, 'wb') as file:
+                file.write(data.replace(b'IT Consultant', b'Engineer'))
+            tree.reload()
+            self.assertEqual(tree.index.person('I1').extended('OCCU'), 'Engineer')
+
+            # Without a reload the spans are stale: a record in front moves I2, and a same size
+            # edit with the old mtime is caught by the digest
+            with open(path, 'rb') as file:
+                data = file.read()
+            newline = b'\r\n' if b'\r\n' in data else b'\n'
+            with open(path, 'wb') as file:
+                file.write(data.replace(newline + b'0 @I1@ INDI', newline.join([b'', b'0 @INEW@ INDI', b'1 NAME New /Person/',
+                                                                               b'0 @I1@ INDI']), 1))
+            self.assertEqual(tree.index.person('I2').structure().find('NAME').value,
+                             tree.index.person('I2').name)
+            stat = os.stat(path)
+            with open(path, 'rb') as file:
+                data = file.read()
+            with open(path, 'wb') as file:
+                file.write(data.replace(b'Engineer', b'Engineez'))
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            tree.source.structures.clear()
+            self.assertEqual(tree.index.person('I1').extended('OCCU'), 'Engineez')
+
+    def test_validate_all_matches_single_rule_validators(self):
+        """Test that the one pass engine reports exactly what each validator reports on its own"""
+        import contextlib
+        import io
+        from CS_555_WN_Project2_Code import (Family, GedcomIndex, validate_all, validate_fewer_than_15_siblings,
+                                             validate_correct_gender_for_role)
+
+        def single_rules(families, index):
+            with contextlib.redirect_stdout(io.StringIO()):
+                return {
+                    'US05': validate_marriage_before_death(families, self.individuals_data, index),
+                    'US06': validate__divorce_before_death(families, self.individuals_data, index),
+                    'US08': validate_birth_before_marriage_of_parents(families, self.individuals_data),
+                    'US09': validate_birth_before_death_of_parents(families, self.individuals_data),
+                    'US10': validate_US10_marriage_after_14(families, self.individuals_data, index),
+                    'US11': validate_bigamy(families, self.individuals_data, index),
+                    'US12': validate_parent_age_limits(families, self.individuals_data),
+                    'US15': validate_fewer_than_15_siblings(families, self.individuals_data),
+                    'US18': validate_US18_siblings_should_not_marry(families, self.individuals_data, index),
+                    'US19': validate_US19_first_cousins_should_not_marry(families, self.individuals_data, index),
+                    'US21': validate_correct_gender_for_role(families, self.individuals_data),
+                }
+
+        index = GedcomIndex(self.individuals_data, self.families_data)
+        self.assertEqual(validate_all(self.families_data, self.individuals_data, index), single_rules(self.families_data, index))
+
+        # Shuffle spouses and children between families so every rule has something to report
+        ids = sorted(ind['ID'] for ind in self.individuals_data)
+        families = [Family(f"{fam['ID']}X{number}", fam['Married'], ('1 JAN 1960', 'NA', fam['Divorced'])[number % 3],
+                           ids[number % len(ids)], 'NA', ids[(number * 7 + 3) % len(ids)], 'NA',
+                           ids[number % 5:number % 5 + 4] * (5 if number == 1 else 1))
+                    for number, fam in enumerate(self.families_data * 4)]
+        index = GedcomIndex(self.individuals_data, families)
+        expected = single_rules(families, index)
+        self.assertEqual(validate_all(families, self.individuals_data, index), expected)
+        self.assertTrue(expected['US11'] and expected['US15'] and expected['US18'])
+        self.assertEqual(validate_all(families, self.individuals_data, index, rules=['US15']), {'US15': expected['US15']})
+
+    def test_ancestry_relation_degrees(self):
+        """Test siblings, half siblings, first and second cousins found through the memoized ancestor sets"""
+        from CS_555_WN_Project2_Code import Family, GedcomIndex, Individual, validate_related_spouses
+
+        def person(person_id, gender):
+            return Individual(person_id, f"{person_id} /Test/", gender, '1 JAN 1950', 70, 'True', 'NA', 'NA', 'NA')
+
+        def family(family_id, husband_id, wife_id, children):
+            return Family(family_id, 'NA', 'NA', husband_id, 'NA', wife_id, 'NA', children)
+
+        # G1 + G2 have A and B; A's child C marries B's child D; C and D's children E and F marry;
+        # H has S1 with W1 and S2 with W2, and S1 marries S2
+        people = [person(person_id, gender) for person_id, gender in (
+            ('G1', 'M'), ('G2', 'F'), ('A', 'M'), ('B', 'F'), ('X', 'F'), ('Y', 'M'), ('C', 'M'), ('D', 'F'),
+            ('E', 'M'), ('F', 'F'), ('Z1', 'F'), ('Z2', 'M'), ('H', 'M'), ('W1', 'F'), ('W2', 'F'), ('S1', 'M'), ('S2', 'F'))]
+        families = [family('FG', 'G1', 'G2', ['A', 'B']), family('FA', 'A', 'X', ['C']), family('FB', 'Y', 'B', ['D']),
+                    family('FCD', 'C', 'D', []), family('FC', 'C', 'Z1', ['E']), family('FD', 'Z2', 'D', ['F']),
+                    family('FEF', 'E', 'F', []), family('FH1', 'H', 'W1', ['S1']), family('FH2', 'H', 'W2', ['S2']),
+                    family('FS', 'S1', 'S2', [])]
+        index = GedcomIndex(people, families)
+        ancestry = index.ancestry()
+
+        self.assertEqual(ancestry.relation_degree('A', 'B'), 1)
+        self.assertEqual(ancestry.relation_degree('S1', 'S2'), 1)
+        self.assertEqual(ancestry.relation_degree('C', 'D'), 2)
+        self.assertIsNone(ancestry.relation_degree('E', 'F'))
+        self.assertEqual(ancestry.relation_degree('E', 'F', 3), 3)
+        self.assertIsNone(ancestry.relation_degree('G1', 'X', 5))
+        self.assertEqual(ancestry.ancestors('C', 2), {'@FG@', 'G1', 'G2'})
+        # Relatives of different generations (A is D's aunt) are outside the degrees
+        self.assertIsNone(ancestry.relation_degree('A', 'D', 5))
+        self.assertEqual([ancestry.relation_name(degree) for degree in (1, 4, 5, 12, 22, 23)],
+                         ['siblings', 'third cousins', '4th cousins', '11th cousins', '21st cousins', '22nd cousins'])
+
+        self.assertEqual([error['Family ID'] for error in validate_US18_siblings_should_not_marry(families, people, index)], ['FS'])
+        self.assertEqual([error['Family ID'] for error in validate_US19_first_cousins_should_not_marry(families, people, index)], ['FCD'])
+        related = validate_related_spouses(families, people, index, degree=3)
+        self.assertEqual([(error['Family ID'], error['Relation']) for error in related],
+                         [('FCD', 'first cousins'), ('FEF', 'second cousins'), ('FS', 'siblings')])
+        self.assertEqual(related[2], {'Family ID': 'FS', 'Husband ID': 'S1', 'Husband Name': 'S1 /Test/', 'Wife ID': 'S2',
+                                      'Wife Name': 'S2 /Test/', 'Degree': 1, 'Relation': 'siblings',
+                                      'Error': 'Spouses are siblings'})
+
+        # The memoized sets are dropped when the families change
+        index.add_family(family('FN', 'A', 'X', ['Z1']))
+        self.assertIsNot(index.ancestry(), ancestry)
+        self.assertEqual(index.ancestry().relation_degree('C', 'Z1'), 1)
+
+    def test_bigamy_marriages_end_at_divorce_or_either_death(self):
+        """Test that every overlapping pair is reported and that a spouse's death ends the marriage"""
+        from CS_555_WN_Project2_Code import Family, Individual
+
+        def person(person_id, death='NA'):
+            return Individual(person_id, f"{person_id} /Test/", 'M', '1 JAN 1950', 70, 'True' if death == 'NA' else 'False', death, 'NA', 'NA')
+
+        people = [person('P'), person('W1', '1 JUN 1990'), person('W2'), person('W3'), person('W4')]
+        families = [Family('F1', '1 JAN 1980', 'NA', 'P', 'NA', 'W1', 'NA', []),   # ends when W1 dies in 1990
+                    Family('F2', '1 JAN 1995', 'NA', 'P', 'NA', 'W2', 'NA', []),   # never ends
+                    Family('F3', '1 JAN 2000', '1 JAN 2005', 'P', 'NA', 'W3', 'NA', []),
+                    Family('F4', '1 JAN 2003', 'NA', 'P', 'NA', 'W4', 'NA', [])]
+
+        errors = validate_bigamy(families, people)
+        self.assertEqual([(error['First Family ID'], error['Second Family ID']) for error in errors],
+                         [('F2', 'F3'), ('F2', 'F4'), ('F3', 'F4')])
+        self.assertNotIn('First End Date', errors[0])
+        self.assertEqual(errors[2]['First End Date'], '01 Jan 2005')
+
+        # Without her death the first marriage overlaps all the others
+        people[1] = person('W1')
+        self.assertEqual(len(validate_bigamy(families, people)), 6)
+
+    def test_parallel_validation_matches_serial(self):
+        """Test that sharding the families over worker processes gives exactly the serial results"""
+        import multiprocessing
+        from CS_555_WN_Project2_Code import Family, GedcomIndex, validate_all, validate_all_parallel
+
+        ids = sorted(ind['ID'] for ind in self.individuals_data)
+        families = [Family(f"{fam['ID']}X{number}", fam['Married'], ('1 JAN 1960', 'NA', fam['Divorced'])[number % 3],
+                           ids[number % len(ids)], 'NA', ids[(number * 7 + 3) % len(ids)], 'NA',
+                           ids[number % 5:number % 5 + 4] * (5 if number == 1 else 1))
+                    for number, fam in enumerate(self.families_data * 4)]
+        index = GedcomIndex(self.individuals_data, families)
+
+        expected = validate_all(families, self.individuals_data, index)
+        self.assertTrue(expected['US11'] and expected['US18'])
+        for jobs in (2, 3):
+            self.assertEqual(validate_all_parallel(families, self.individuals_data, index, jobs=jobs, min_shard_families=1), expected)
+        # Spawned workers get the tree pickled instead of inherited
+        self.assertEqual(validate_all_parallel(families, self.individuals_data, index, jobs=2, min_shard_families=1,
+                                               mp_context=multiprocessing.get_context('spawn')), expected)
+        # Too few families for a shard each runs serially
+        self.assertEqual(validate_all_parallel(families, self.individuals_data, index, jobs=2), expected)
+
+    def test_edits_revalidate_only_touched_records(self):
+        """Test that revalidating after edits leaves the same findings as validating the edited tree from scratch"""
+        import os
+        import shutil
+        import tempfile
+        from CS_555_WN_Project2_Code import GedcomTree, saveSnapshot, validate_all
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'tree.ged')
+            shutil.copy("Gedcom-file.ged", path)
+            tree = GedcomTree(path).build()
+            tree.validate()
+            self.assertEqual(tree.results(), validate_all(tree.families, tree.individuals, tree.index))
+
+            family = self.families_data[0]
+            husband = family['Husband ID']
+            # A second wife married after the husband's death, with his first wife as her child
+            tree.add_person('INEW', '1 JAN 1990', 'New /Person/', 'F')
+            tree.add_family('FNEW', husband, 'INEW', '1 JAN 2000')
+            tree.link_child('FNEW', family['Wife ID'])
+            tree.set_date(husband, 'DEAT', '1 JAN 1950')
+            checked = tree.revalidate()
+            self.assertTrue(checked['US05'])
+            self.assertEqual(tree.results(), validate_all(tree.families, tree.individuals, tree.index))
+            self.assertFalse(any(tree.revalidate().values()))
+
+            tree.remove_family('FNEW')
+            tree.remove_person('INEW')
+            tree.set_date(husband, 'DEAT', 'NA')
+            tree.revalidate()
+            self.assertEqual(tree.results(), validate_all(tree.families, tree.individuals, tree.index))
+
+            with self.assertRaises(ValueError):
+                tree.add_person(husband, '1 JAN 1990')
+            with self.assertRaises(ValueError):
+                tree.set_date(husband, 'BIRT', 'NA')
+            with self.assertRaises(KeyError):
+                tree.set_date('IMISSING', 'DEAT', '1 JAN 2000')
+            # The edits were never written back, so the tree can no longer stand in for the file
+            with self.assertRaises(ValueError):
+                saveSnapshot(tree)
+
+    def test_rule_registry_runs_menu_rules(self):
+        """Test that the registry drives the menu and that run_rules gives what the rules' own functions give"""
+        import contextlib
+        import io
+        from CS_555_WN_Project2_Code import (FAMILY_RULES, RULES, GedcomIndex, display_rules, list_deceased, list_orphans,
+                                             menu_choices, run_rules, validate_all)
+
+        choices = menu_choices()
+        self.assertEqual(list(choices.values())[:len(RULES)], [rule.menu_title() for rule in RULES.values()])
+        self.assertEqual(choices['4'], "Validate Marriage Before Death (US05)")
+        self.assertEqual(list(choices.values())[-1], "Exit")
+        for rule in RULES.values():
+            self.assertIn(rule.severity, ('ERROR', 'INFO'))
+            self.assertTrue(rule.needs <= {'index', 'children', 'ancestry'})
+
+        index = GedcomIndex(self.individuals_data, self.families_data)
+        found = run_rules(['US29', 'US11', 'US33', 'US05'], self.families_data, self.individuals_data)
+        self.assertEqual(list(found), ['US29', 'US11', 'US33', 'US05'])
+        self.assertEqual(found['US29'], list_deceased(self.individuals_data))
+        self.assertEqual(found['US33'], list_orphans(self.individuals_data, self.families_data))
+        expected = validate_all(self.families_data, self.individuals_data, index)
+        self.assertEqual(found['US11'], expected['US11'])
+        self.assertEqual(run_rules(list(FAMILY_RULES), self.families_data, self.individuals_data, index), expected)
+        for rule_id in FAMILY_RULES:
+            self.assertEqual(RULES[rule_id].find(self.families_data, self.individuals_data, index), expected[rule_id])
+
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            display_rules(['US15'], self.families_data, self.individuals_data)
+        self.assertIn("US15 Validation: No errors found!", output.getvalue())
+        with self.assertRaises(KeyError):
+            run_rules(['US99'], self.families_data, self.individuals_data)
+
+    def test_numpy_date_rules_match_python(self):
+        """Test that the NumPy backend finds exactly what the per family date checks find"""
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("NumPy is not installed")
+        from CS_555_WN_Project2_Code import DATE_RULES, GedcomIndex, validate_all, validate_all_parallel
+
+        people = [person('H1', '1 JAN 1900', '1 JAN 1950'), person('W1', '1 JAN 1945', '1 JAN 1952'),
+                  person('C1', '1 JAN 1953'), person('C2', '1 JAN 1961'), person('C3', '1 JAN 1960'),
+                  person('C4', 'NA'), person('H2', '1 JAN 1880'), person('W2', '1 JAN 1890')]
+        # F1 breaks US05, US06, US08, US09 and US10, F2 breaks US12 for both parents
+        families = [family('F1', 'H1', 'W1', ['C1', 'C2', 'CX', 'C4'], '1 JAN 1955', '1 JAN 1960'),
+                    family('F2', 'H2', 'W2', ['C3'], '1 JAN 1905'),
+                    family('F3', 'NA', 'W1', ['C1']),
+                    family('F4', 'H2', 'NA', [], '1 JAN 1970', '1 JAN 1969')] * 3
+        index = GedcomIndex(people, families)
+
+        expected = validate_all(families, people, index)
+        for rule in DATE_RULES:
+            self.assertTrue(expected[rule], rule)
+        self.assertEqual(validate_all(families, people, index, backend='numpy'), expected)
+        self.assertEqual(validate_all(families, people, index, ['US12', 'US21'], backend='numpy'),
+                         validate_all(families, people, index, ['US12', 'US21']))
+        self.assertEqual(validate_all_parallel(families, people, index, jobs=2, min_shard_families=1, backend='numpy'), expected)
+        with self.assertRaises(ValueError):
+            validate_all(families, people, index, backend='fortran')
+
+    def test_validation_errors_stream_to_sinks(self):
+        """Test that ValidationErrors format like the validators and reach every sink"""
+        import io
+        import json
+        import pickle
+        from datetime import datetime
+        from CS_555_WN_Project2_Code import (CountingSink, FAMILY_RULES, GedcomIndex, JsonlSink, MemorySink,
+                                             TableSink, check_people, stream_validation, validate_all,
+                                             validate_all_errors)
+
+        people = [person('H1', '1 JAN 1900', '1 JAN 1950', Gender='M'), person('W1', '1 JAN 1945', Gender='M'),
+                  person('C1', '1 JAN 1940', Gender='M'), person('O1', '1 JAN 1800', Gender='M'),
+                  person('O2', '1 JAN 1700', '1 JAN 1860', Gender='M')]
+        families = [family('F1', 'H1', 'W1', ['C1'], '1 JAN 1955')]
+        index = GedcomIndex(people, families)
+
+        found = validate_all_errors(families, people, index)
+        rows = validate_all(families, people, index)
+        for rule, errors in found.items():
+            self.assertEqual([error.row() for error in errors], rows[rule])
+        self.assertTrue(found['US21'] and found['US05'])
+        self.assertEqual(found['US21'][0].severity, 'ERROR')
+
+        with MemorySink() as memory:
+            stream_validation(memory, families, people, index, list(FAMILY_RULES))
+        self.assertEqual(memory.by_rule(), {rule: errors for rule, errors in found.items() if errors})
+
+        # Everyone born before a marriage they are in, and everyone 150 or older, is reported without raising
+        today = datetime(2020, 1, 1)
+        people_errors = check_people(people, index, ['US02', 'US07'], today=today)
+        self.assertEqual(sorted(error.record_ids[0] for error in people_errors['US07']), ['O1', 'O2'])
+        self.assertEqual(people_errors['US02'], [])
+
+        counting = stream_validation(CountingSink(), families, people, index, today=today)
+        self.assertEqual(counting.counts['US07'], 2)
+        self.assertEqual(counting.counts['US21'], len(found['US21']))
+
+        output = io.StringIO()
+        with JsonlSink(output) as jsonl:
+            stream_validation(jsonl, families, people, index, ['US05', 'US07'], today=today)
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([record['rule'] for record in records], ['US05', 'US07', 'US07'])
+        self.assertEqual(records[0]['message'], found['US05'][0].message())
+
+        output = io.StringIO()
+        with TableSink(output) as table:
+            table.extend(found['US21'])
+        self.assertIn(found['US21'][0].message(), output.getvalue())
+
+        self.assertEqual(pickle.loads(pickle.dumps(found['US05'])), found['US05'])
+
+    def test_validation_budget_stops_early_and_reports_coverage(self):
+        """Test that max_errors, the time budget and sampling cut a run short and say how much was checked"""
+        import time
+        from CS_555_WN_Project2_Code import CountingSink, GedcomIndex, ValidationBudget, stream_validation, validate_all
+
+        people = [person('H', '1 JAN 1900', Gender='F'), person('W', '1 JAN 1900', Gender='F')]
+        families = [family(f'F{number}', 'H', 'W') for number in range(10)]
+        index = GedcomIndex(people, families)
+        full = validate_all(families, people, index, ['US21', 'US15'])
+        self.assertEqual(len(full['US21']), 10)
+
+        budget = ValidationBudget()
+        self.assertEqual(validate_all(families, people, index, ['US21', 'US15'], budget=budget), full)
+        self.assertFalse(budget.partial)
+
+        budget = ValidationBudget(max_errors=3)
+        found = validate_all(families, people, index, ['US21', 'US15'], budget=budget)
+        self.assertEqual(found['US21'], full['US21'][:3])
+        self.assertEqual(budget.coverage['US21'][:6], ('US21', 3, 10, 'families', 3, 'max_errors'))
+        self.assertFalse(budget.coverage['US15'].partial)
+        self.assertTrue(budget.partial)
+        self.assertIn("3 of 10 families checked (30.0%)", budget.coverage['US21'].describe())
+
+        budget = ValidationBudget(max_errors={'US21': 0})
+        self.assertEqual(validate_all(families, people, index, ['US21'], budget=budget)['US21'], [])
+        self.assertEqual(budget.coverage['US21'].checked, 0)
+
+        sampled = [validate_all(families, people, index, ['US21'], budget=ValidationBudget(sample=0.5, seed=7))['US21']
+                   for attempt in range(2)]
+        self.assertEqual(sampled[0], sampled[1])
+        self.assertEqual(len(sampled[0]), 5)
+        self.assertTrue(all(row in full['US21'] for row in sampled[0]))
+
+        budget = ValidationBudget(seconds=60)
+        budget.deadline = time.perf_counter() - 1
+        counting = stream_validation(CountingSink(), families, people, index, ['US21', 'US07'], budget=budget)
+        self.assertEqual(sum(counting.counts.values()), 0)
+        self.assertEqual({rule: coverage.stopped for rule, coverage in counting.coverage.items()}, {'US21': 'time', 'US07': 'time'})
+
+        with self.assertRaises(ValueError):
+            ValidationBudget(sample=0)
+
+    def test_kinship_graph_traverses_deep_trees_iteratively(self):
+        """Test the CSR kinship graph on a line of generations far deeper than the recursion limit"""
+        import sys
+        from CS_555_WN_Project2_Code import GedcomIndex
+
+        generations = sys.getrecursionlimit() * 3
+        people = [{'ID': f'P{number}'} for number in range(generations)] + [{'ID': 'W'}, {'ID': 'X'}, {'ID': 'Y'}]
+        families = [family(f'F{number}', f'P{number}', 'W' if number == 0 else 'NA', [f'P{number + 1}'])
+                    for number in range(generations - 1)]
+        # X and Y are each other's parent, a cycle off to the side of the line
+        families += [family('FX', 'X', 'NA', ['Y']), family('FY', 'Y', 'NA', ['X'])]
+        index = GedcomIndex(people, families)
+        graph = index.kinship()
+
+        last = f'P{generations - 1}'
+        self.assertEqual(graph.related('P0', 'spouses'), ['W'])
+        self.assertEqual(sorted(graph.related('P1', 'parents')), ['P0', 'W'])
+        self.assertEqual(graph.related('P0', 'children'), ['P1'])
+        ancestors = graph.ancestors(last)
+        self.assertEqual(len(ancestors), generations)
+        self.assertEqual((ancestors[f'P{generations - 2}'], ancestors['P0'], ancestors['W']),
+                         (1, generations - 1, generations - 1))
+        self.assertEqual(graph.ancestors(last, max_depth=2), {f'P{generations - 2}': 1, f'P{generations - 3}': 2})
+        self.assertEqual(len(graph.descendants('W')), generations - 1)
+        self.assertEqual(len(list(graph.walk('P0', ('children',), depth_first=True))), generations - 1)
+
+        self.assertEqual((graph.generation('P0'), graph.generation(last)), (0, generations - 1))
+        self.assertEqual((graph.generation('X'), graph.generation('Y')), (-1, -1))
+        labels, count = graph.component_labels()
+        self.assertEqual(count, 2)
+        self.assertEqual(sorted(graph.component('X')), ['X', 'Y'])
+        with self.assertRaises(KeyError):
+            graph.node('NOBODY')
+
+        index.add_family(family('FZ', 'X', 'W', []))
+        self.assertIsNot(index.kinship(), graph)
+        self.assertEqual(index.kinship().component_labels()[1], 1)
+
+    def test_relationship_calculator_names_relatives(self):
+        """Test named relationships through the closest common ancestors, in single and batch queries"""
+        from CS_555_WN_Project2_Code import GedcomIndex, RelationshipCalculator, relationship_name
+
+        self.assertEqual(relationship_name(1, 3, 'F'), 'great-aunt')
+        self.assertEqual(relationship_name(3, 4), '2nd cousin once removed')
+        self.assertEqual(relationship_name(5, 5), '4th cousin')
+        self.assertEqual(relationship_name(2, 6), '1st cousin 4 times removed')
+        self.assertEqual(relationship_name(0, 6, 'M'), '4x great-grandfather')
+        self.assertEqual(relationship_name(12, 0, 'M'), '10x great-grandson')
+        self.assertEqual(relationship_name(1, 1, 'M', half=True), 'half-brother')
+
+        people = [person(person_id, Gender=gender) for person_id, gender in (
+            ('GF', 'M'), ('GM', 'F'), ('A', 'M'), ('B', 'F'), ('AW', 'F'), ('BH', 'M'), ('C1', 'F'), ('C2', 'M'),
+            ('D1', 'M'), ('D2', 'F'), ('E1', 'F'), ('X', 'M'), ('H', 'M'), ('HW', 'F'), ('HW2', 'F'), ('S1', 'M'), ('S2', 'F'))]
+        families = [family('F1', 'GF', 'GM', ['A', 'B']), family('F2', 'A', 'AW', ['C1']), family('F3', 'BH', 'B', ['C2']),
+                    family('F4', 'NA', 'C1', ['D1']), family('F5', 'C2', 'NA', ['D2']), family('F6', 'D1', 'NA', ['E1']),
+                    family('F7', 'H', 'HW', ['S1']), family('F8', 'H', 'HW2', ['S2'])]
+        calculator = RelationshipCalculator(GedcomIndex(people, families))
+
+        expected = {('A', 'B'): 'brother', ('B', 'D1'): 'great-aunt', ('D1', 'B'): 'great-nephew',
+                    ('C1', 'C2'): '1st cousin', ('E1', 'D2'): '2nd cousin once removed', ('GM', 'E1'): 'great-great-grandmother',
+                    ('E1', 'GF'): 'great-great-granddaughter', ('S1', 'S2'): 'half-brother', ('A', 'AW'): 'husband',
+                    ('X', 'A'): None, ('C1', 'C1'): 'self'}
+        answers = calculator.relate_many(list(expected))
+        self.assertEqual({(answer.person_id, answer.other_id): answer.name for answer in answers}, expected)
+        self.assertEqual([calculator.relate(*pair) for pair in expected], answers)
+
+        cousins = calculator.relate('E1', 'D2')
+        self.assertEqual((cousins.up, cousins.down, cousins.common_ancestors), (4, 3, ('GF', 'GM')))
+        self.assertEqual(cousins.describe(), "E1 is D2's 2nd cousin once removed")
+        self.assertEqual(calculator.relate('S2', 'S1').common_ancestors, ('H',))
+        self.assertEqual(calculator.relate('X', 'A').describe(), "X and A are not related")
+        with self.assertRaises(KeyError):
+            calculator.relate('A', 'NOBODY')
+
+    def test_calendar_index_windows(self):
+        """Test birthday and anniversary windows across new year and around 29 FEB"""
+        from datetime import date
+        from CS_555_WN_Project2_Code import CalendarIndex, GedcomIndex, calendar_day
+
+        self.assertEqual((calendar_day(1, 1), calendar_day(2, 29), calendar_day(3, 1), calendar_day(12, 31)), (1, 60, 61, 366))
+        people = [{'ID': person_id, 'Birthday': birthday, 'Death': death} for person_id, birthday, death in (
+            ('NEWYEAR', '1 JAN 1990', 'NA'), ('LEAP', '29 FEB 2000', 'NA'), ('FEB28', '28 FEB 1970', 'NA'),
+            ('MAR1', '1 MAR 1980', '2 MAR 2020'), ('XMAS', '25 DEC 1950', '1 JAN 2021'), ('NONE', 'NA', 'NA'), ('BAD', '31 FEB 1990', 'NA'))]
+        families = [{'ID': 'F1', 'Husband ID': 'XMAS', 'Wife ID': 'LEAP', 'Married': '30 DEC 1975'}]
+        calendar = CalendarIndex(people, families)
+
+        def birthdays(first, last, leap_day='skip'):
+            return [(day, ind['ID']) for day, ind in calendar.upcoming_birthdays(first, last, leap_day)]
+
+        def window(year):
+            return date(year, 2, 27), date(year, 3, 1)
+
+        # The window crosses the new year
+        self.assertEqual(birthdays(date(2023, 12, 20), date(2024, 1, 5)), [(date(2023, 12, 25), 'XMAS'), (date(2024, 1, 1), 'NEWYEAR')])
+        self.assertEqual(calendar.upcoming_anniversaries(date(2023, 12, 20), date(2024, 1, 5)), [(date(2023, 12, 30), families[0])])
+        # 29 FEB in a leap year, and skipped, moved back or moved on in the others
+        self.assertEqual(birthdays(*window(2024)), [(date(2024, 2, 28), 'FEB28'), (date(2024, 2, 29), 'LEAP'), (date(2024, 3, 1), 'MAR1')])
+        self.assertEqual(birthdays(*window(2023)), [(date(2023, 2, 28), 'FEB28'), (date(2023, 3, 1), 'MAR1')])
+        self.assertEqual(birthdays(*window(2023), 'feb28'), [(date(2023, 2, 28), 'FEB28'), (date(2023, 2, 28), 'LEAP'), (date(2023, 3, 1), 'MAR1')])
+        self.assertEqual(birthdays(date(2023, 3, 1), date(2023, 3, 1), 'mar1'), [(date(2023, 3, 1), 'LEAP'), (date(2023, 3, 1), 'MAR1')])
+        self.assertEqual(birthdays(date(2023, 3, 1), date(2023, 3, 1), 'feb28'), [(date(2023, 3, 1), 'MAR1')])
+        # A window longer than a year sees everyone again
+        self.assertEqual(len(birthdays(date(2023, 1, 1), date(2024, 12, 31))), 9)
+        with self.assertRaises(ValueError):
+            birthdays(date(2023, 1, 1), date(2023, 2, 1), 'never')
+
+        self.assertEqual([ind['ID'] for ind in calendar.born_between(date(1970, 1, 1), date(1990, 1, 1))], ['FEB28', 'MAR1', 'NEWYEAR'])
+        self.assertEqual([ind['ID'] for ind in calendar.died_between(date(2020, 6, 1))], ['XMAS'])
+        self.assertEqual(GedcomIndex(people, families).calendar().upcoming_birthdays(date(2023, 1, 1), date(2023, 1, 1))[0][1], people[0])
+
+    def test_as_of_day_fixes_ages_and_listings(self):
+        """Test that one as-of day drives ages, living people and listings, and that ages follow it in bulk"""
+        from datetime import date, datetime
+        from CS_555_WN_Project2_Code import (AgeTable, GedcomIndex, GedcomTree, as_of_date, buildGedcomTree, calculateAge,
+                                             check_people, list_deceased, list_living_married, list_upcoming_birthdays,
+                                             listAllSingleIndividuals, run_rules)
+
+        day = date(2000, 6, 15)
+        self.assertEqual({as_of_date(value) for value in (day, datetime(2000, 6, 15, 23, 59), '2000-06-15', '15 JUN 2000')}, {day})
+        with self.assertRaises(TypeError):
+            as_of_date(20000615)
+        self.assertEqual(calculateAge('16 JUN 1990', 'NA', day), 9)
+        self.assertEqual(calculateAge('15 JUN 1990', 'NA', '15 JUN 2000'), 10)
+
+        people = [{'ID': person_id, 'Birthday': birthday, 'Alive': alive, 'Death': death} for person_id, birthday, alive, death in (
+            ('LIVING', '1 JUL 1980', 'True', 'NA'), ('DIED', '1 JAN 1900', 'False', '1 JAN 1950'),
+            ('LATER', '1 JAN 1940', 'False', '1 JAN 2010'), ('UNKNOWN', '1 JAN 1940', 'False', 'NA'),
+            ('UNBORN', '1 JAN 2005', 'True', 'NA'))]
+        ages = AgeTable(people, day)
+        self.assertEqual([ages.age(ind['ID']) for ind in people], [19, 50, 60, -1, -1])
+        self.assertEqual([ind['ID'] for ind in ages.living()], ['LIVING', 'LATER'])
+        self.assertFalse(ages.set_day('2000-06-15'))
+        self.assertTrue(ages.set_day(date(2020, 6, 15)))
+        self.assertEqual([ages.age(ind['ID']) for ind in people], [39, 50, 70, -1, 15])
+        self.assertEqual([ind['ID'] for ind in ages.living()], ['LIVING', 'UNBORN'])
+
+        # The index keeps one table per run and moves it to another day on request
+        index = GedcomIndex(people, as_of=day)
+        self.assertIs(index.ages(), index.ages())
+        self.assertEqual(index.ages('2020-06-15').age('UNBORN'), 15)
+        self.assertEqual(index.ages().day, day)
+        self.assertEqual([ind['ID'] for ind in list_upcoming_birthdays(people, as_of=day)], ['LIVING'])
+        self.assertEqual(list_upcoming_birthdays(people, as_of='10 JUL 2000'), [])
+        self.assertEqual(len(check_people([{'ID': 'OLD', 'Birthday': '1 JUL 1850', 'Death': 'NA'}], index, ['US07'])['US07']), 0)
+
+        # A tree built for one day and moved to another matches a tree built for that day
+        tree = GedcomTree("Gedcom-file.ged", as_of='1 JAN 1990').build()
+        earlier = [ind.get('Age') for ind in tree.individuals]
+        tree.refresh('1 JAN 2020')
+        individuals, families, index = buildGedcomTree("Gedcom-file.ged", '1 JAN 2020')
+        self.assertEqual([ind.get('Age') for ind in tree.individuals], [ind.get('Age') for ind in individuals])
+        self.assertNotEqual(earlier, [ind.get('Age') for ind in tree.individuals])
+        self.assertEqual(tree.index.today(), date(2020, 1, 1))
+
+        # The listing rules run for the index's as-of day: in 1950 nobody in the sample tree had died yet
+        individuals, families, index = buildGedcomTree("Gedcom-file.ged", '1950-01-01')
+        found = run_rules(['US29', 'US30', 'US31'], families, individuals, index)
+        self.assertEqual(found['US29'], list_deceased(individuals, as_of='1950-01-01'))
+        self.assertEqual(found['US30'], list_living_married(individuals, as_of='1950-01-01'))
+        self.assertEqual(found['US31'], listAllSingleIndividuals(individuals, as_of='1950-01-01'))
+        self.assertEqual(found['US29'], [])
+        self.assertIn('I6', [ind['ID'] for ind in run_rules(['US29'], families, individuals)['US29']])
+
+    def test_person_query_uses_indexes_and_matches_scans(self):
+        """Test composable predicates, their secondary indexes and the list functions built on them"""
+        from CS_555_WN_Project2_Code import (GedcomIndex, PersonQuery, Q, buildGedcomTree, list_deceased,
+                                             list_living_married, listAllSingleIndividuals)
+
+        individuals, families, index = buildGedcomTree("Gedcom-file.ged", '2020-01-01')
+        query = index.query()
+        scan = PersonQuery(individuals, index, '2020-01-01', indexed=False)
+        predicates = [Q.alive & (Q.age > 30) & Q.no_spouse, Q.dead, Q.married & Q.alive, Q.male | Q.female, ~Q.alive,
+                      Q.spouses >= 1, (Q.age >= 60) & Q.female, Q.born < '1 JAN 1950', Q.died_within(3650),
+                      Q.born_within(365 * 20), (Q.died <= '31 DEC 2019') | (Q.born == '1 JAN 1900'),
+                      Q.where(lambda ind: ind.get('Name', '').startswith('J')), Q.column('Gender') != 'M']
+        for predicate in predicates:
+            self.assertEqual(query.select(predicate), scan.select(predicate), predicate.label)
+            self.assertEqual(query.count(predicate), len(scan.select(predicate)))
+
+        # The smallest index of an & is used, an | of indexed parts unions them, anything with ~ or where scans
+        self.assertTrue(query.explain(Q.alive & (Q.age > 30) & Q.no_spouse).startswith("index Spouse == 'NA'"))
+        self.assertIn(' | ', query.explain(Q.male | Q.female))
+        self.assertTrue(query.explain(~Q.alive).startswith('scan'))
+        self.assertTrue(scan.explain(Q.male).startswith('scan'))
+        # I8 died in JAN 2020, so was alive on the day of the query
+        self.assertEqual(query.select(Q.dead), [ind for ind in individuals if ind.get('Alive') == 'False' and ind.get('ID') != 'I8'])
+        self.assertEqual(query.select(Q.alive), [ind for ind in individuals if ind.get('Alive') == 'True' or ind.get('ID') == 'I8'])
+
+        # age > n uses the birth dates: born exactly n years before the day is n that day
+        people = [{'ID': person_id, 'Birthday': birthday, 'Alive': 'True'} for person_id, birthday in (
+            ('THIRTY', '1 JUN 1990'), ('ALMOST', '2 JUN 1990'), ('LEAP', '29 FEB 1992'))]
+        query = PersonQuery(people, as_of='1 JUN 2020')
+        self.assertEqual([ind['ID'] for ind in query.select(Q.age >= 30)], ['THIRTY'])
+        self.assertEqual([ind['ID'] for ind in query.select(Q.age > 29)], ['THIRTY'])
+        self.assertEqual([ind['ID'] for ind in PersonQuery(people, as_of='28 FEB 2021').select(Q.age >= 29)], ['THIRTY', 'ALMOST'])
+        self.assertEqual([ind['ID'] for ind in PersonQuery(people, as_of='1 MAR 2021').select(Q.age >= 29)], ['THIRTY', 'ALMOST', 'LEAP'])
+
+        # The cached query follows the index
+        index = GedcomIndex(individuals, families)
+        self.assertIs(index.query(), index.query())
+        before = index.query()
+        index.add_individual({'ID': 'NEW', 'Birthday': '1 JAN 2000', 'Alive': 'True'})
+        self.assertIsNot(index.query(), before)
+
+        self.assertEqual(list_deceased(individuals), [ind for ind in individuals if ind.get('Alive') == 'False'])
+        self.assertEqual(list_living_married(individuals),
+                         [ind for ind in individuals if ind.get('Alive') == 'True' and ind.get('Spouse') != 'NA'])
+        self.assertEqual(listAllSingleIndividuals(individuals, '2020-01-01'),
+                         [ind for ind in individuals if ind.get('Alive') == 'True' and ind.get('Spouse') == 'NA' and ind.get('Age') > 30])
+
+        # Like the Alive column they replace, US29 and US30 keep people whose dates cannot be read;
+        # only a readable date after the day moves someone (DIES has not died yet on it, LATER is not yet born)
+        people = [person('NODATES', Alive='True', Spouse='S1'), person('GONE', 'NA', 'NA', Alive='False', Spouse='S2'),
+                  person('NOBIRTH', 'NA', '1 JAN 2000', Alive='False'), person('DIES', '1 JAN 1950', '1 JAN 2021', Alive='False', Spouse='S3'),
+                  person('LATER', '1 JAN 2021', Alive='True', Spouse='S4')]
+        self.assertEqual([ind['ID'] for ind in list_deceased(people, '2020-01-01')], ['GONE', 'NOBIRTH'])
+        self.assertEqual([ind['ID'] for ind in list_living_married(people, '2020-01-01')], ['NODATES', 'DIES'])
+        self.assertEqual([ind['ID'] for ind in list_deceased(people, '2022-01-01')], ['GONE', 'NOBIRTH', 'DIES'])
+        self.assertEqual([ind['ID'] for ind in PersonQuery(people, as_of='2020-01-01').select(Q.alive)], ['NODATES', 'DIES'])
+        self.assertEqual(PersonQuery(people, as_of='2020-01-01').ages().ages.tolist(), [-1, -1, -1, 70, -1])
+
+    def test_listings_scan_when_the_calendar_has_other_records(self):
+        """Test the recent and upcoming listings after verifyAge dropped people the index still has"""
+        import contextlib
+        import io
+        from datetime import date
+        from CS_555_WN_Project2_Code import (CalendarIndex, GedcomIndex, PersonQuery, Q, list_recent_births,
+                                             list_recent_deaths, list_upcoming_birthdays, listUpcomingBirthdays, verifyAge)
+
+        as_of = date(2020, 6, 15)
+        # LATE is born after the as-of day, and the index keeps only the first of the two TWIN records
+        people = [person('LATE', '20 JUN 2020', Age=-1, Alive='True'),
+                  person('OLD', '1 JAN 1950', '10 JUN 2020', Age=70, Alive='False'),
+                  person('TWIN', '1 JAN 1980', Age=40, Alive='True'), person('TWIN', '1 JUL 1981', Age=38, Alive='True'),
+                  person('BABY', '1 JUN 2020', Age=0, Alive='True')]
+        index = GedcomIndex(people, [], as_of)
+        calendar = index.calendar()
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            verifyAge(people, as_of)
+        self.assertIn("LATE /Test/ died before they were born", output.getvalue())
+        self.assertEqual([ind['ID'] for ind in people], ['OLD', 'TWIN', 'TWIN', 'BABY'])
+        self.assertFalse(calendar.covers(people))
+        self.assertTrue(CalendarIndex(people).covers(people))
+
+        self.assertEqual(list_recent_births(people, calendar, as_of), [people[3]])
+        self.assertEqual(list_recent_deaths(people, calendar=calendar, as_of=as_of), [people[0]])
+        upcoming = list_upcoming_birthdays(people, calendar=calendar, as_of=as_of)
+        self.assertEqual(len(upcoming), 1)
+        self.assertIs(upcoming[0], people[2])
+        query = PersonQuery(people, as_of=as_of, calendar=calendar)
+        self.assertEqual(query.select(Q.born_within(29)), [people[3]])
+        self.assertIsNot(query.calendar(), calendar)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            listUpcomingBirthdays(people, calendar, as_of)
+        self.assertIn("'Birth Date': '2020-07-01'", output.getvalue())
+        self.assertNotIn('LATE', output.getvalue())
+
+    def test_name_index_finds_spelling_variants(self):
+        """Test name parsing, folding, the phonetic codes and ranked fuzzy lookups"""
+        from CS_555_WN_Project2_Code import (GedcomIndex, NameIndex, double_metaphone, fold_name, soundex, split_name)
+
+        self.assertEqual(split_name('Rogerio /Neves Da Silveira Nunes/'), ('Rogerio', 'Neves Da Silveira Nunes'))
+        self.assertEqual(split_name('John /Smith/ Jr.'), ('John Jr.', 'Smith'))
+        self.assertEqual(split_name('Plain  Name'), ('Plain Name', ''))
+        self.assertEqual(split_name('NA'), ('', ''))
+        self.assertEqual(fold_name("Maria da Conceição d'Ávila-Øster"), 'maria da conceicao d avila oster')
+
+        for word, code in (('Robert', 'R163'), ('Rupert', 'R163'), ('Ashcraft', 'A261'), ('Tymczak', 'T522'), ('Pfister', 'P236')):
+            self.assertEqual(soundex(word), code, word)
+        for word, codes in (('Smith', ('SM0', 'XMT')), ('Schmidt', ('XMT', 'SMT')), ('Thomas', ('TMS', 'TMS')),
+                            ('Xavier', ('SF', 'SFR')), ('Michael', ('MKL', 'MXL')), ('Cabrillo', ('KPRL', 'KPR')),
+                            ('Filipowicz', ('FLPT', 'FLPF')), ('Peña', ('PN', 'PN')), ('Gonçalves', ('KNSL', 'KNSL'))):
+            self.assertEqual(double_metaphone(word), codes, word)
+
+        names = NameIndex(self.individuals_data)
+        # Misspelt given name and surname still find Rogerio first, and people sharing only Nunes after him
+        matches = names.search('Rojerio Nunez')
+        self.assertEqual(matches[0].person_id, 'I2')
+        self.assertEqual({match.person_id for match in matches[1:]}, {'I1', 'I4', 'I8', 'I11'})
+        self.assertEqual(matches, sorted(matches, key=lambda match: -match.score))
+        # A surname query only looks at surnames: exact ones score 1, the longer surname with Nunes in it less
+        matches = names.search('/Nunes/')
+        self.assertEqual([match.person_id for match in matches], ['I1', 'I11', 'I4', 'I8', 'I2'])
+        self.assertEqual([match.score for match in matches[:4]], [1.0] * 4)
+        self.assertLess(matches[4].score, 1.0)
+        self.assertEqual([match.person_id for match in names.search('Letícia')], ['I11'])
+        self.assertEqual(names.search('Mary Lucy /Fernandez/')[0].person_id, 'I5')
+        self.assertEqual(names.search('/Silva/ Rogerio'), names.search('Rogerio /Silva/'))
+        self.assertEqual(names.search('Qwxz'), [])
+        self.assertEqual(names.search(''), [])
+        self.assertEqual(len(names.search('/Nunes/', limit=2)), 2)
+
+        # People sharing a name are kept once under it, in list order
+        people = [{'ID': f'P{number}', 'Name': name} for number, name in enumerate(
+            ['Ana /Souza/', 'Ana  /Souza/', 'ANA /SOUZA/', 'Anna /Sousa/'])]
+        names = NameIndex(people)
+        self.assertEqual(len(names.names), 2)
+        self.assertEqual([match.person_id for match in names.search('Ana /Souza/', limit=None)], ['P0', 'P1', 'P2', 'P3'])
+        self.assertEqual(names.search('Ana /Souza/', limit=3)[2].describe(), 'P2 ANA /SOUZA/ (1.00)')
+
+        index = GedcomIndex(self.individuals_data, self.families_data)
+        self.assertIs(index.names(), index.names())
+        before = index.names()
+        index.add_individual({'ID': 'NEW', 'Name': 'Rogerio /Nunes/'})
+        self.assertIsNot(index.names(), before)
+        self.assertEqual(index.names().search('Rogerio /Nunes/')[0].person_id, 'NEW')
+
+
+    def test_duplicate_people_and_families(self):
+        """Test US23/US24 exact duplicates, the fuzzy near duplicates and the blocking that limits comparisons"""
+        from CS_555_WN_Project2_Code import (RULES, candidate_pairs, find_duplicate_families, find_duplicate_people,
+                                             person_similarity, run_rules, validate_unique_families_by_spouses,
+                                             validate_unique_name_and_birth_date)
+
+        people = [
+            {'ID': 'I1', 'Name': 'Rogerio /Nunes/', 'Gender': 'M', 'Birthday': '10 OCT 1965'},
+            {'ID': 'I2', 'Name': 'Ana /Souza/', 'Gender': 'F', 'Birthday': '4 APR 1970'},
+            {'ID': 'I3', 'Name': 'ROGÉRIO  /Nunes/', 'Gender': 'M', 'Birthday': '10 OCT 1965'},
+            {'ID': 'I4', 'Name': 'Rojerio /Nunez/', 'Gender': 'M', 'Birthday': '10 OCT 1965'},
+            {'ID': 'I5', 'Name': 'Anna /Sousa/', 'Gender': 'F', 'Birthday': '4 APR 1970'},
+            {'ID': 'I6', 'Name': 'Rogerio /Nunes/', 'Gender': 'M', 'Birthday': '10 OCT 1966'},
+            {'ID': 'I7', 'Name': 'Rogeria /Nunes/', 'Gender': 'F', 'Birthday': '10 OCT 1965'},
+            {'ID': 'I8', 'Name': 'Rogerio /Nunes/', 'Gender': 'M', 'Birthday': 'NA'},
+            {'ID': 'I9', 'Name': 'Rogerio /Nunes/', 'Gender': 'M', 'Birthday': '10 OCT 1965'},
+        ]
+        # Case, accents and spacing do not matter; another birth date or no birth date is not an exact duplicate
+        self.assertEqual([(found.kept_id, found.duplicate_id, found.exact) for found in find_duplicate_people(people)],
+                         [('I1', 'I3', True), ('I1', 'I9', True)])
+        self.assertEqual(validate_unique_name_and_birth_date(people)[0],
+                         "ERROR: US23: Individual ROGÉRIO  /Nunes/ (I3) has the same name and birth date (10 OCT 1965) as I1")
+        # A repeated ID is reported with the record that was found, not the first one with that ID
+        repeated = people[:2] + [dict(people[1], ID='I1', Name='ANA /Souza/')]
+        self.assertEqual([(found.kept, found.duplicate) for found in find_duplicate_people(repeated)], [(1, 2)])
+        self.assertEqual(validate_unique_name_and_birth_date(repeated),
+                         ["ERROR: US23: Individual ANA /Souza/ (I1) has the same name and birth date (4 APR 1970) as I2"])
+
+        fuzzy = find_duplicate_people(people, fuzzy=True)
+        near = [found for found in fuzzy if not found.exact]
+        self.assertEqual(fuzzy[:2], find_duplicate_people(people))
+        self.assertEqual([found.score for found in near], sorted((found.score for found in near), reverse=True))
+        pairs = {(found.kept_id, found.duplicate_id) for found in near}
+        self.assertTrue({('I1', 'I4'), ('I2', 'I5'), ('I1', 'I6'), ('I1', 'I8')} <= pairs)
+        # Rogeria is a woman: however alike the names, a man and a woman are never the same person
+        self.assertFalse(any('I7' in pair for pair in pairs))
+        self.assertEqual(person_similarity(people[0], people[6]), 0.0)
+        self.assertAlmostEqual(person_similarity(people[0], people[2]), 1.0)
+        self.assertLess(person_similarity(people[0], people[3]), person_similarity(people[0], people[2]))
+        self.assertEqual(find_duplicate_people(people, fuzzy=True, min_score=1.01), find_duplicate_people(people))
+
+        families = [
+            {'ID': 'F1', 'Husband Name': 'Rogerio /Nunes/', 'Wife Name': 'Ana /Souza/', 'Married': '1 MAY 1990'},
+            {'ID': 'F2', 'Husband Name': 'rogerio /nunes/', 'Wife Name': 'Ana /Souza/', 'Married': '1 MAY 1990'},
+            {'ID': 'F3', 'Husband Name': 'Rojerio /Nunez/', 'Wife Name': 'Anna /Sousa/', 'Married': '1 MAY 1990'},
+            {'ID': 'F4', 'Husband Name': 'Rogerio /Nunes/', 'Wife Name': 'Ana /Souza/', 'Married': '2 JUN 1995'},
+            {'ID': 'F5', 'Husband Name': 'Paulo /Mendes/', 'Wife Name': 'Lucia /Alves/', 'Married': '1 MAY 1990'},
+        ]
+        self.assertEqual([found.describe() for found in find_duplicate_families(families)], ['F2 duplicates F1 (exact)'])
+        self.assertEqual(validate_unique_families_by_spouses(families, people),
+                         ["ERROR: US24: Family F2 has the same spouses (rogerio /nunes/ and Ana /Souza/) and marriage date (1 MAY 1990) as family F1"])
+        self.assertEqual(validate_unique_families_by_spouses([dict(families[4], ID='F2')] + families[:2], people),
+                         ["ERROR: US24: Family F2 has the same spouses (rogerio /nunes/ and Ana /Souza/) and marriage date (1 MAY 1990) as family F1"])
+        near = [found for found in find_duplicate_families(families, fuzzy=True) if not found.exact]
+        self.assertEqual(near[0][:2], ('F1', 'F3'))
+        self.assertFalse(any('F5' in found[:2] for found in near))
+
+        # Blocks no larger than window + 1 give all their pairs, larger ones only sorted neighbours
+        self.assertEqual(candidate_pairs(list(range(4)), [('a',)] * 4, window=3),
+                         {(0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3)})
+        self.assertEqual(candidate_pairs([3, 2, 1, 0], [('a',)] * 4, window=1), {(2, 3), (1, 2), (0, 1)})
+        self.assertEqual(len(candidate_pairs(list(range(100)), [('a',)] * 100, window=5)), 95 * 5 + 10)
+
+        self.assertEqual(RULES['US23'].fields, ('Name', 'Birthday'))
+        found = run_rules(['US23', 'US24'], families, people)
+        self.assertEqual(found['US23'], validate_unique_name_and_birth_date(people))
+        self.assertEqual(len(found['US24']), 1)
+
+    def test_younger_spouse_compares_recorded_ages(self):
+        """Test that US34 compares the ages the table shows, negative ones included, and skips spouses without one"""
+        from datetime import date
+        from CS_555_WN_Project2_Code import list_younger_spouse, recorded_age
+
+        day = date(2000, 1, 1)
+        # H1 died before he was born, W2's birthday cannot be read and W3 is born after the day
+        people = [person('H1', '1 JAN 1990', '1 JAN 1980'), person('W1', '1 JAN 1950'), person('H2', '1 JAN 1960'),
+                  person('W2'), person('H3', '1 JAN 1960'), person('W3', '1 JAN 2010')]
+        self.assertEqual([recorded_age(ind, day) for ind in people], [-10, 50, 40, 0, 40, None])
+        families = [family('F1', 'H1', 'W1'), family('F2', 'H2', 'W2'), family('F3', 'H3', 'W3')]
+        self.assertEqual(list_younger_spouse(families, people, as_of=day),
+                         [('F1', 'H1', 'W1', "Husband younger"), ('F2', 'W2', 'H2', "Wife younger")])
+
+    def test_orphans_compare_recorded_ages(self):
+        """Test that US33 lists people in no family whose recorded age is under 18, negative ages included"""
+        from datetime import date
+        from CS_555_WN_Project2_Code import list_orphans
+
+        # O1 died before they were born, O4 is born after the day
+        people = [person('O1', '1 JAN 1990', '1 JAN 1980'), person('O2', '1 JAN 1990'), person('O3', '1 JAN 1990'),
+                  person('O4', '1 JAN 2010'), person('O5', '1 JAN 1960'), person('P1', '1 JAN 1960')]
+        families = [family('F1', 'P1', 'NA', ['O3'])]
+        self.assertEqual([ind['ID'] for ind in list_orphans(people, families, as_of=date(2000, 1, 1))], ['O1', 'O2'])
+
         
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file